@@ -1,9 +1,12 @@
 """Command line interface for bis_fetcher"""
-from hyfi import hyfi_main
+from bis_fetcher import initialize
 
 
 def main() -> None:
     """Main function for the CLI"""
+    initialize()
+    from hyfi import hyfi_main
+
     hyfi_main()
 
 
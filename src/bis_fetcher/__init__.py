@@ -1,21 +1,46 @@
 import os
-
-from hyfi import HyFI
+from typing import TYPE_CHECKING, Type
 
 from ._version import __version__
 
+if TYPE_CHECKING:
+    from hyfi import HyFI
+
 # Read the package path from the current directory
 __package_path__ = os.path.dirname(__file__)
 
-# Initialize the global HyFI object
-HyFI.initialize_global_hyfi(
-    package_path=__package_path__,
-    version=__version__,
-    plugins=[],
-)
+_hyfi_initialized = False
+
+
+def initialize() -> "Type[HyFI]":
+    """
+    Initialize the global HyFI object and the logger, once per process.
+
+    Importing HyFI takes seconds, so it is deferred until something needs it:
+    the CLI, the fetchers, or `bis_fetcher.HyFI`. The HTTP, cache, storage
+    and replay modules under `bis_fetcher.fetcher` can be used without it.
+
+    Returns:
+        The HyFI class.
+    """
+    global _hyfi_initialized
+    from hyfi import HyFI
+
+    if not _hyfi_initialized:
+        HyFI.initialize_global_hyfi(
+            package_path=__package_path__,
+            version=__version__,
+            plugins=[],
+        )
+        HyFI.setLogger()
+        _hyfi_initialized = True
+    return HyFI
+
 
-# Initialize the logger
-HyFI.setLogger()
+def __getattr__(name: str) -> "Type[HyFI]":
+    if name == "HyFI":
+        return initialize()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def get_version() -> str:
@@ -23,4 +48,4 @@ def get_version() -> str:
     return __version__
 
 
-__all__ = ["HyFI", "get_version"]
+__all__ = ["HyFI", "get_version", "initialize"]
@@ -0,0 +1,209 @@
+"""Asyncio engine for the article phase"""
+import asyncio
+import logging
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Union
+from urllib.parse import urlparse
+
+from hyfi.main import HyFI
+
+from .index import UrlIndex
+from .metrics import get_metrics
+from .writer import JsonlSink
+
+logger = logging.getLogger(__name__)
+
+
+def resolve_articles(
+    links: Iterable[dict],
+    parse_article_func: Callable,
+    article_urls: Optional[Union[List[str], UrlIndex]] = None,
+    overwrite_existing: bool = False,
+    max_num_articles: Optional[int] = 10,
+    article_filepath: Optional[str] = None,
+    article_sink: Optional[JsonlSink] = None,
+    article_timeout: Optional[float] = None,
+    max_concurrency: int = 32,
+    max_concurrency_per_host: int = 8,
+    on_batch: Optional[Callable[[List[dict]], None]] = None,
+    batch_size: int = 100,
+    print_every: int = 10,
+    verbose: bool = False,
+) -> List[dict]:
+    """Resolve articles for the given links concurrently.
+
+    `parse_article_func` is a blocking function, so it runs in a thread pool
+    while the event loop bounds the number of requests in flight, both
+    overall and per host. Requests are paced by `parse_article_func`
+    itself, e.g. through the fetcher's shared `RateLimiter`. Articles are
+    appended to `article_filepath` as soon as they are parsed. The HTTP
+    session should allow at least `max_concurrency_per_host` connections.
+    An article that takes longer than `article_timeout` seconds is skipped
+    and counted as a timeout; its thread cannot be interrupted, so it runs
+    to completion in the background.
+
+    Links are read from `links` only as requests are started, through a
+    queue of at most `max_concurrency` links, so a stream of links is never
+    held in memory. With `on_batch`, articles are handed over in batches
+    of `batch_size` while the rest are still in flight, instead of being
+    returned.
+
+    Args:
+        links (Iterable[dict]): Links to scrape.
+        parse_article_func (Callable): Function that parses the article at a URL.
+        article_urls (Optional[Union[List[str], UrlIndex]], optional): URLs of existing articles. Defaults to None.
+        overwrite_existing (bool, optional): Overwrite existing articles. Defaults to False.
+        max_num_articles (Optional[int], optional): Maximum number of articles to resolve. Defaults to 10.
+        article_filepath (Optional[str], optional): Filepath to stream the articles to. Defaults to None.
+        article_sink (Optional[JsonlSink], optional): Sink to stream the articles to instead. Defaults to None.
+        article_timeout (Optional[float], optional): Give up on an article after this many seconds. Defaults to None.
+        max_concurrency (int, optional): Maximum number of requests in flight. Defaults to 32.
+        max_concurrency_per_host (int, optional): Maximum number of requests in flight per host. Defaults to 8.
+        on_batch (Optional[Callable[[List[dict]], None]], optional): Called with each batch of articles. Defaults to None.
+        batch_size (int, optional): Number of articles per batch. Defaults to 100.
+        print_every (int, optional): Print progress every n articles. Defaults to 10.
+        verbose (bool, optional): Print progress. Defaults to False.
+
+    Returns:
+        List[dict]: List of articles, empty with `on_batch`.
+    """
+    return asyncio.run(
+        _resolve_articles(
+            links,
+            parse_article_func,
+            article_urls=article_urls,
+            overwrite_existing=overwrite_existing,
+            max_num_articles=max_num_articles,
+            article_filepath=article_filepath,
+            article_sink=article_sink,
+            article_timeout=article_timeout,
+            max_concurrency=max_concurrency,
+            max_concurrency_per_host=max_concurrency_per_host,
+            on_batch=on_batch,
+            batch_size=batch_size,
+            print_every=print_every,
+            verbose=verbose,
+        )
+    )
+
+
+async def _resolve_articles(
+    links: Iterable[dict],
+    parse_article_func: Callable,
+    article_urls: Optional[Union[List[str], UrlIndex]] = None,
+    overwrite_existing: bool = False,
+    max_num_articles: Optional[int] = 10,
+    article_filepath: Optional[str] = None,
+    article_sink: Optional[JsonlSink] = None,
+    article_timeout: Optional[float] = None,
+    max_concurrency: int = 32,
+    max_concurrency_per_host: int = 8,
+    on_batch: Optional[Callable[[List[dict]], None]] = None,
+    batch_size: int = 100,
+    print_every: int = 10,
+    verbose: bool = False,
+) -> List[dict]:
+    existing = article_urls
+    if not isinstance(existing, UrlIndex):
+        existing = UrlIndex(existing or [])
+    num_workers = max(1, max_concurrency)
+    queue: asyncio.Queue = asyncio.Queue(maxsize=num_workers)
+    host_limits: Dict[str, asyncio.Semaphore] = defaultdict(
+        lambda: asyncio.Semaphore(max_concurrency_per_host)
+    )
+    loop = asyncio.get_running_loop()
+    metrics = get_metrics()
+    articles: List[dict] = []
+    batch: List[dict] = []
+    counts = {"links": 0, "queued": 0, "resolved": 0}
+
+    async def producer() -> None:
+        try:
+            for link in links:
+                counts["links"] += 1
+                if not overwrite_existing and link["url"] in existing:
+                    continue
+                if (
+                    max_num_articles is not None
+                    and counts["queued"] >= max_num_articles
+                ):
+                    break
+                counts["queued"] += 1
+                await queue.put(link)
+        finally:
+            for _ in range(num_workers):
+                await queue.put(None)
+
+    async def worker(executor: ThreadPoolExecutor) -> None:
+        nonlocal batch
+        while True:
+            link = await queue.get()
+            if link is None:
+                return
+            url = link["url"]
+            async with host_limits[urlparse(url).netloc]:
+                try:
+                    with metrics.timer("article"):
+                        _article = await asyncio.wait_for(
+                            loop.run_in_executor(executor, parse_article_func, url),
+                            article_timeout,
+                        )
+                except (asyncio.TimeoutError, TimeoutError):
+                    logger.warning(
+                        "Timed out after %ss scraping %s", article_timeout, url
+                    )
+                    metrics.inc("article_timeouts")
+                    continue
+                except Exception as e:
+                    logger.error("Error while scraping the article url: %s", url)
+                    logger.error(e)
+                    _article = None
+            if _article is None:
+                logger.info(
+                    "Article [%s](%s) does not exist, skipping...",
+                    link.get("title"),
+                    url,
+                )
+                continue
+            article = link.copy()
+            article.update(_article)
+            counts["resolved"] += 1
+            if article_sink is not None:
+                article_sink.write(article)
+            elif article_filepath:
+                HyFI.append_to_jsonl(article, article_filepath)
+            if on_batch is None:
+                articles.append(article)
+            else:
+                batch.append(article)
+                if len(batch) >= batch_size:
+                    # The other requests stay in flight in the thread pool meanwhile
+                    full, batch = batch, []
+                    on_batch(full)
+            if verbose and counts["resolved"] % print_every == 0:
+                logger.info(
+                    "Resolved %s articles, last: [%s](%s)",
+                    counts["resolved"],
+                    link.get("title"),
+                    url,
+                )
+
+    executor = ThreadPoolExecutor(max_workers=num_workers)
+    try:
+        await asyncio.gather(
+            producer(), *(worker(executor) for _ in range(num_workers))
+        )
+    finally:
+        # Do not wait for the threads of articles that timed out
+        executor.shutdown(wait=False)
+    if on_batch is not None and batch:
+        on_batch(batch)
+
+    logger.info(
+        "Resolved %s of %s articles queued, %s links read",
+        counts["resolved"],
+        counts["queued"],
+        counts["links"],
+    )
+    return articles
@@ -1,23 +1,123 @@
 """Base Fetcher"""
 import logging
 import multiprocessing as mp
+import os
+import queue
+import signal
+import threading
 import time
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
 from functools import partial
+from itertools import chain
 from pathlib import Path
-from typing import Callable, List, Optional, Tuple
+from types import FrameType
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    ContextManager,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+    TypeVar,
+    Union,
+)
 
 import requests
 from hyfi.composer import BaseModel
 from hyfi.main import HyFI
 
-from .chromedriver import ChromeWebDriver
+from .. import initialize
+from .aio import resolve_articles
+from .cache import HttpCache
+from .content import ContentIndex
+from .download import download_files, url_to_filepath
+from .extract import extract_pdf_texts
+from .index import UrlIndex, get_shared_index, init_shared_indexes
+from .metrics import Profiler, get_metrics
+from .ratelimit import (
+    RateLimiter,
+    get_shared_rate_limiter,
+    init_shared_rate_limiters,
+    shared_rate_limiters,
+)
+from .replay import ResponseRecorder
+from .session import RETRY_STATUS_CODES, get_session, request_with_retries
+from .store import (
+    JsonlStore,
+    ParquetStore,
+    iter_batches,
+    parse_timestamp,
+    select_records,
+)
+from .writer import (
+    JsonlSink,
+    JsonlWriter,
+    get_shared_sink,
+    init_shared_sinks,
+    read_jsonl,
+)
+
+if TYPE_CHECKING:
+    from multiprocessing.sharedctypes import Synchronized
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
+
+class PagePartition(NamedTuple):
+    """Listing pages of one start url that are crawled by one task."""
+
+    shard: int
+    start_url: str
+    start_page: int
+    page_step: int
+    max_num_pages: Optional[int]
+
+
+# Value of a stop page marker while no partition has found the end of the listing
+NO_STOP_PAGE = 2**62
+
+_stop_pages: List["Synchronized[int]"] = []
+
+
+def init_link_worker(
+    indexes: Dict[str, UrlIndex],
+    stop_pages: List["Synchronized[int]"],
+    sinks: Optional[Dict[str, JsonlSink]] = None,
+    rate_limiters: Optional[Dict[Tuple, RateLimiter]] = None,
+) -> None:
+    """Pool initializer for link crawling workers."""
+    global _stop_pages
+    init_shared_indexes(indexes)
+    init_shared_sinks(sinks or {})
+    init_shared_rate_limiters(rate_limiters or {})
+    _stop_pages = stop_pages
+
+
+def init_article_worker(
+    indexes: Dict[str, UrlIndex],
+    sinks: Optional[Dict[str, JsonlSink]] = None,
+    rate_limiters: Optional[Dict[Tuple, RateLimiter]] = None,
+) -> None:
+    """Pool initializer for article scraping workers."""
+    init_shared_indexes(indexes)
+    init_shared_sinks(sinks or {})
+    init_shared_rate_limiters(rate_limiters or {})
+
 
 class Response(BaseModel):
     text: str = ""
     status_code: int = 0
+    transport: str = "http"
+    from_cache: bool = False
 
 
 class By:
@@ -41,35 +141,93 @@ class BaseFetcher(BaseModel):
     _config_name_: str = "base"
     _config_group_: str = "/fetcher"
 
+    adaptive_rate_limit: bool = True
+    article_batch_size: int = 100
+    article_engine: str = "mp"
+    article_chunk_size: int = 10
     article_filename: str = "articles.jsonl"
+    article_timeout: Optional[float] = 60.0
+    backoff_factor: float = 0.5
+    backoff_max: float = 60.0
     base_url: str = ""
+    compact_every: Optional[int] = 1000
+    connect_timeout: float = 10.0
+    content_dedup: bool = True
     delay_between_requests: float = 0.0
+    download_chunk_size: int = 1 << 16
+    download_workers: int = 4
+    extract_per_page: bool = False
+    extract_workers: Optional[int] = None
+    http_cache: bool = False
+    http_cache_dirname: str = "http_cache"
+    http_cache_max_bytes: Optional[int] = 512 * 1024 * 1024
+    http_cache_ttl: Optional[float] = 0.0
+    http_pool_size: int = 10
+    incremental: bool = False
     key_field: str = "url"
     keyword_placeholder: str = "{keyword}"
     link_filename: str = "links.jsonl"
+    max_concurrency: int = 32
+    max_concurrency_per_host: int = 8
     max_num_articles: Optional[int] = 30
     max_num_pages: Optional[int] = 2
+    max_retries: int = 3
+    metrics_filename: str = "metrics"
+    metrics_format: Optional[str] = None
     num_workers: int = 1
     output_dir: str = f"workspace/datasets{_config_group_}/{_config_name_}"
     overwrite_existing: bool = False
+    page_partitioning: bool = True
     page_placeholder: str = "{page}"
+    pdf_dirname: str = "pdfs"
+    pdf_manifest_filename: str = "pdfs.jsonl"
+    pdf_url_field: str = "pdf_url"
     print_every: int = 10
+    profiler: Optional[str] = None
+    rate_limit: Optional[float] = None
+    rate_limit_burst: int = 1
+    rate_limit_max: Optional[float] = None
+    rate_limit_min: float = 0.1
+    rate_limit_target_latency: Optional[float] = 5.0
+    read_timeout: float = 30.0
+    record_dir: Optional[str] = None
+    retry_status_codes: List[int] = list(RETRY_STATUS_CODES)
     search_keywords: List[str] = []
     search_url: str = ""
     start_page: Optional[int] = 1
+    stop_after_known_links: Optional[int] = 10
+    stop_after_known_pages: Optional[int] = 1
     start_urls: List[str] = []
+    storage: str = "jsonl"
+    text_filename: str = "texts.jsonl"
+    transport: str = "auto"
+    url_index_bloom_threshold: Optional[int] = None
+    url_index_error_rate: float = 0.001
     verbose: bool = True
+    webdriver_max_pages: Optional[int] = 100
+    webdriver_pool_size: int = 1
+    writer_batch_size: int = 100
+    writer_flush_interval: float = 1.0
+    writer_fsync_interval: Optional[float] = 5.0
 
     _links: List[dict] = []
     _articles: List[dict] = []
+    _stores: Dict[str, Union[JsonlStore, ParquetStore]] = {}
+    _response_cache: Optional[HttpCache] = None
+    _content_index: Optional[ContentIndex] = None
     _headers = {
         "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3"
     }
 
-    def __call__(self):
+    def __init__(self, **data: Any):
+        # Fetchers are composed from the package configs
+        initialize()
+        super().__init__(**data)
+
+    def __call__(self) -> None:
         self.fetch()
 
-    def fetch(self):
+    def fetch(self) -> None:
         self.fetch_links()
         self.fetch_articles()
 
@@ -79,32 +237,193 @@ class BaseFetcher(BaseModel):
         use_selenium: bool = False,
         wait_time: int = 10,
         locator: Optional[Tuple[str, str]] = None,
-        params: dict = None,
+        params: Optional[dict] = None,
         **kwargs,
     ) -> Response:
         """Sends a GET request.
 
+        Plain HTTP requests go through the response cache, see `response_cache`.
+
         Args:
             url (str): URL for the request
             params (dict, optional): Dictionary, list of tuples or bytes to send
                 in the query string for the Request. Defaults to None.
-            **kwargs: Optional arguments that `request` takes.
+            **kwargs: Optional arguments that `requests.Session.get` takes.
+                The timeout defaults to (connect_timeout, read_timeout).
 
         Returns:
             Response object containing response text and status code
         """
         if use_selenium:
-            driver = ChromeWebDriver().get(
-                url,
-                wait_time=wait_time,
-                locator=locator,
+            # Selenium is only imported by processes that drive a browser
+            from .chromedriver import get_webdriver_pool
+
+            pool = get_webdriver_pool(
+                size=self.webdriver_pool_size,
+                max_pages=self.webdriver_max_pages,
             )
-            return Response(text=driver.text, status_code=driver.status_code)
-        res = requests.get(url, params=params, headers=self._headers, **kwargs)
+            rate_limiter = self.rate_limiter
+            with pool.session() as driver:
+                if rate_limiter is not None:
+                    rate_limiter.acquire()
+                start = time.perf_counter()
+                driver.get(
+                    url,
+                    wait_time=wait_time,
+                    locator=locator,
+                )
+                if rate_limiter is not None:
+                    rate_limiter.record(time.perf_counter() - start, driver.status_code)
+                return Response(
+                    text=driver.text,
+                    status_code=driver.status_code,
+                    transport="selenium",
+                )
+        metrics = get_metrics()
+        cache = self.response_cache
+        if cache is None:
+            res = self._request_with_retries("GET", url, params=params, **kwargs)
+            metrics.inc("http_bytes", len(res.content))
+            return Response(text=res.text, status_code=res.status_code)
+
+        if params:
+            url = requests.Request("GET", url, params=params).prepare().url or url
+        entry = cache.get(url)
+        if entry is not None and cache.is_fresh(entry):
+            metrics.inc("cache_hits")
+            return Response(
+                text=entry["text"], status_code=entry["status_code"], from_cache=True
+            )
+        headers = kwargs.pop("headers", None) or {}
+        if entry is not None:
+            headers = {**cache.conditional_headers(entry), **headers}
+        res = self._request_with_retries("GET", url, headers=headers, **kwargs)
+        if entry is not None and res.status_code == 304:
+            metrics.inc("cache_revalidated")
+            cache.refresh(url, entry, res.headers)
+            return Response(
+                text=entry["text"], status_code=entry["status_code"], from_cache=True
+            )
+        metrics.inc("cache_misses")
+        metrics.inc("http_bytes", len(res.content))
+        etag, last_modified = res.headers.get("ETag"), res.headers.get("Last-Modified")
+        # A response without validators can only be reused while it is fresh
+        if (
+            res.status_code == 200
+            and (etag or last_modified or cache.ttl != 0)
+            and "no-store" not in res.headers.get("Cache-Control", "")
+        ):
+            cache.put(url, res.text, etag=etag, last_modified=last_modified)
         return Response(text=res.text, status_code=res.status_code)
 
+    def head(self, url: str, **kwargs: Any) -> Response:
+        """Sends a HEAD request, following redirects.
+
+        Args:
+            url (str): URL for the request
+            **kwargs: Optional arguments that `requests.Session.head` takes.
+
+        Returns:
+            Response object containing the status code
+        """
+        kwargs.setdefault("allow_redirects", True)
+        res = self._request_with_retries("HEAD", url, **kwargs)
+        return Response(status_code=res.status_code)
+
+    def _request_with_retries(
+        self, method: str, url: str, **kwargs: Any
+    ) -> requests.Response:
+        kwargs.setdefault("timeout", (self.connect_timeout, self.read_timeout))
+        kwargs["headers"] = {**self._headers, **(kwargs.get("headers") or {})}
+        return request_with_retries(
+            self.session,
+            method,
+            url,
+            max_retries=self.max_retries,
+            backoff_factor=self.backoff_factor,
+            backoff_max=self.backoff_max,
+            retry_status_codes=self.retry_status_codes,
+            rate_limiter=self.rate_limiter,
+            **kwargs,
+        )
+
     @property
-    def start_urls_encoded(self):
+    def rate_limiter(self) -> Optional[RateLimiter]:
+        """Limiter that paces the requests of all workers together, if a rate is set.
+
+        The rate starts at `rate_limit` requests per second, or one request
+        every `delay_between_requests` seconds, and with `adaptive_rate_limit`
+        follows the server between `rate_limit_min` and `rate_limit_max`: up
+        while responses are fast, down on 429s, errors and responses slower
+        than `rate_limit_target_latency`. Without `rate_limit_max` the
+        configured rate is also the highest, so the limiter only backs off
+        from it and recovers; set `rate_limit_max` to let it grow further.
+        """
+        rate = self.rate_limit
+        if rate is None and self.delay_between_requests > 0:
+            rate = 1 / self.delay_between_requests
+        if not rate:
+            return None
+        max_rate = rate if self.rate_limit_max is None else self.rate_limit_max
+        return get_shared_rate_limiter(
+            rate=rate,
+            min_rate=self.rate_limit_min,
+            max_rate=max_rate,
+            burst=self.rate_limit_burst,
+            adaptive=self.adaptive_rate_limit,
+            target_latency=self.rate_limit_target_latency,
+        )
+
+    @property
+    def response_cache(self) -> Optional[HttpCache]:
+        """On-disk cache of GET responses under `output_dir`, if `http_cache` is on.
+
+        The cache is off by default; when enabled it is written to
+        `output_dir/http_cache_dirname` and bounded by `http_cache_max_bytes`.
+        Entries younger than `http_cache_ttl` seconds are served without a
+        request, older ones are revalidated with a conditional GET; with a
+        TTL of None cached pages are replayed without touching the network.
+        """
+        if not self.http_cache:
+            return None
+        if self._response_cache is None:
+            self._response_cache = HttpCache(
+                str(Path(self.output_dir) / self.http_cache_dirname),
+                ttl=self.http_cache_ttl,
+                max_bytes=self.http_cache_max_bytes,
+            )
+        return self._response_cache
+
+    @property
+    def session(self) -> requests.Session:
+        """Pooled HTTP session shared by all requests of this process.
+
+        With `record_dir` set, every GET response is also recorded there as a
+        fixture archive that `ReplayServer` can serve offline. Pages served
+        from the response cache are not requested, so turn `http_cache` off
+        to record a complete crawl.
+        """
+        session = get_session(self.http_pool_size)
+        if self.record_dir:
+            ResponseRecorder(self.record_dir).install(session)
+        return session
+
+    @property
+    def transports(self) -> List[str]:
+        """Transports to try, in order, when fetching a listing page.
+
+        `http` uses plain requests, `selenium` renders the page in a browser and
+        `auto` tries plain HTTP first and falls back to the browser only when the
+        page does not contain what the parser is looking for.
+        """
+        if self.transport == "auto":
+            return ["http", "selenium"]
+        if self.transport in ("http", "selenium"):
+            return [self.transport]
+        raise ValueError(f"Unknown transport: {self.transport}")
+
+    @property
+    def start_urls_encoded(self) -> List[str]:
         if self.start_urls:
             return self.start_urls
         if self.keyword_placeholder in self.search_url:
@@ -119,17 +438,63 @@ class BaseFetcher(BaseModel):
             start_urls = [self.search_url]
         return start_urls
 
-    def encode_keyword(self, keyword: str):
+    def encode_keyword(self, keyword: str) -> str:
         return keyword.replace(" ", "+")
 
     @property
-    def links(self):
+    def links(self) -> List[dict]:
         return self._links or self._load_links()
 
     @property
-    def articles(self):
+    def articles(self) -> List[dict]:
         return self._articles or self._load_articles()
 
+    def iter_links(
+        self,
+        columns: Optional[List[str]] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        author: Optional[str] = None,
+    ) -> Iterator[dict]:
+        """Stream the saved links without loading them all.
+
+        Args:
+            columns (Optional[List[str]]): Fields to return. Defaults to all.
+            start (Optional[datetime]): Only links with a timestamp from this date. Defaults to None.
+            end (Optional[datetime]): Only links with a timestamp before this date. Defaults to None.
+            author (Optional[str]): Only links by this author. Defaults to None.
+        """
+        return self._iter_records(
+            self._links, self.link_store, columns, start, end, author
+        )
+
+    def iter_articles(
+        self,
+        columns: Optional[List[str]] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        author: Optional[str] = None,
+    ) -> Iterator[dict]:
+        """Stream the saved articles without loading them all, see `iter_links`."""
+        return self._iter_records(
+            self._articles, self.article_store, columns, start, end, author
+        )
+
+    def _iter_records(
+        self,
+        records: List[dict],
+        store: Union[JsonlStore, ParquetStore],
+        columns: Optional[List[str]],
+        start: Optional[datetime],
+        end: Optional[datetime],
+        author: Optional[str],
+    ) -> Iterator[dict]:
+        where = {"author": author} if author is not None else None
+        # Records already in memory are used as they are
+        if records:
+            return select_records(records, columns, start, end, where)
+        return store.read(columns=columns, start=start, end=end, where=where)
+
     @property
     def link_filepath(self) -> str:
         _path = Path(self.output_dir) / self.link_filename
@@ -142,6 +507,12 @@ class BaseFetcher(BaseModel):
         _path.parent.mkdir(parents=True, exist_ok=True)
         return str(_path.absolute())
 
+    @property
+    def link_state_filepath(self) -> str:
+        _path = Path(self.output_dir) / f"{Path(self.link_filename).stem}.state.json"
+        _path.parent.mkdir(parents=True, exist_ok=True)
+        return str(_path.absolute())
+
     @property
     def link_filepath_tmp(self) -> str:
         _path = Path(self.output_dir) / f"{self.link_filename}.tmp"
@@ -154,17 +525,110 @@ class BaseFetcher(BaseModel):
         _path.parent.mkdir(parents=True, exist_ok=True)
         return str(_path)
 
+    @property
+    def link_checkpoint_filepath(self) -> str:
+        _path = Path(self.output_dir) / f"{self.link_filename}.pages.tmp"
+        _path.parent.mkdir(parents=True, exist_ok=True)
+        return str(_path)
+
+    @property
+    def shard_state_filepath(self) -> str:
+        _path = Path(self.output_dir) / f"{self.link_filename}.shards"
+        _path.parent.mkdir(parents=True, exist_ok=True)
+        return str(_path)
+
+    @property
+    def content_index_filepath(self) -> str:
+        _path = Path(self.output_dir) / f"{self.article_filename}.content"
+        _path.parent.mkdir(parents=True, exist_ok=True)
+        return str(_path.absolute())
+
+    @property
+    def content_index(self) -> ContentIndex:
+        """Content fingerprints of the PDFs of the articles, see `ContentIndex`."""
+        if self._content_index is None:
+            self._content_index = ContentIndex(self.content_index_filepath)
+        return self._content_index
+
+    @property
+    def metrics_filepath_tmp(self) -> str:
+        _path = Path(self.output_dir) / f"{self.metrics_filename}.jsonl.tmp"
+        _path.parent.mkdir(parents=True, exist_ok=True)
+        return str(_path)
+
+    def metrics_filepath(self, phase: str) -> str:
+        suffix = "prom" if self.metrics_format == "prometheus" else "json"
+        _path = Path(self.output_dir) / f"{self.metrics_filename}.{phase}.{suffix}"
+        _path.parent.mkdir(parents=True, exist_ok=True)
+        return str(_path.absolute())
+
+    @property
+    def pdf_dir(self) -> str:
+        _path = Path(self.output_dir) / self.pdf_dirname
+        _path.mkdir(parents=True, exist_ok=True)
+        return str(_path.absolute())
+
+    @property
+    def pdf_manifest_filepath(self) -> str:
+        _path = Path(self.output_dir) / self.pdf_manifest_filename
+        _path.parent.mkdir(parents=True, exist_ok=True)
+        return str(_path.absolute())
+
+    @property
+    def text_filepath(self) -> str:
+        _path = Path(self.output_dir) / self.text_filename
+        _path.parent.mkdir(parents=True, exist_ok=True)
+        return str(_path.absolute())
+
+    @property
+    def link_store(self) -> Union[JsonlStore, ParquetStore]:
+        return self._store(self.link_filepath)
+
+    @property
+    def article_store(self) -> Union[JsonlStore, ParquetStore]:
+        return self._store(self.article_filepath)
+
+    def _store(self, filepath: str) -> Union[JsonlStore, ParquetStore]:
+        """Storage backend of a link or article file.
+
+        `jsonl` stores the records in the file itself. `parquet` stores them
+        in a dataset partitioned by year, in a directory named after the
+        file without its extension, e.g. `articles/` for `articles.jsonl`.
+        """
+        if filepath not in self._stores:
+            store: Union[JsonlStore, ParquetStore]
+            if self.storage == "jsonl":
+                store = JsonlStore(
+                    filepath,
+                    key_field=self.key_field,
+                    compact_every=self.compact_every,
+                )
+            elif self.storage == "parquet":
+                store = ParquetStore(
+                    str(Path(filepath).with_suffix("")), key_field=self.key_field
+                )
+            else:
+                raise ValueError(f"Unknown storage: {self.storage}")
+            self._stores[filepath] = store
+        return self._stores[filepath]
+
+    def compact(self) -> None:
+        """Rewrite the link and article files without duplicates."""
+        for store in (self.link_store, self.article_store):
+            if Path(store.filepath).exists():
+                store.compact()
+
     def _load_links(self) -> List[dict]:
-        if Path(self.link_filepath).exists():
-            self._links = HyFI.load_jsonl(self.link_filepath)
+        if Path(self.link_store.filepath).exists():
+            self._links = list(self.link_store)
         return self._links
 
     def _load_articles(self) -> List[dict]:
-        if Path(self.article_filepath).exists():
-            self._articles = HyFI.load_jsonl(self.article_filepath)
+        if Path(self.article_store.filepath).exists():
+            self._articles = list(self.article_store)
         return self._articles
 
-    def fetch_links(self):
+    def fetch_links(self) -> None:
         parse_page_func = partial(
             self._parse_page_links,
             print_every=self.print_every,
@@ -176,116 +640,702 @@ class BaseFetcher(BaseModel):
             page_placeholder=self.page_placeholder,
         )
 
-        self._fetch_links(parse_page_func, next_page_func)
+        with self._phase("links"):
+            self._fetch_links(parse_page_func, next_page_func)
 
-    def fetch_articles(self):
+    def fetch_articles(self) -> None:
         parse_article_text = partial(self._parse_article_text)
 
-        self._fetch_articles(parse_article_text)
+        with self._phase("articles"):
+            self._fetch_articles(parse_article_text)
+        if timeouts := get_metrics().counters.get("article_timeouts"):
+            logger.warning(
+                "%d articles timed out after %ss", timeouts, self.article_timeout
+            )
 
-    def _fetch_links(self, parse_page_func: Callable, next_page_func: Callable):
-        num_workers = min(self.num_workers, len(self.search_keywords))
-        num_workers = max(num_workers, 1)
-        link_urls = [link["url"] for link in self.links]
+    @contextmanager
+    def _phase(self, name: str) -> Iterator[None]:
+        """Collect the metrics of one phase of the run, from this process and its workers.
+
+        At the end of the phase they are logged and, with `metrics_format` set
+        to "json" or "prometheus", written to `metrics_filepath(name)`.
+        With `profiler` set to `cprofile` or `pyinstrument`, this process is
+        profiled too.
+        """
+        metrics = get_metrics()
+        metrics.reset()
+        _remove_files(self.metrics_filepath_tmp)
+        profiler: ContextManager[object] = nullcontext()
+        if self.profiler:
+            suffix = "prof" if self.profiler == "cprofile" else "html"
+            profiler = Profiler(
+                self.profiler, str(Path(self.output_dir) / f"profile.{name}.{suffix}")
+            )
+        start = time.perf_counter()
+        try:
+            with profiler:
+                yield
+        finally:
+            metrics.set_gauge("phase_seconds", time.perf_counter() - start)
+            metrics.merge(read_jsonl(self.metrics_filepath_tmp))
+            _remove_files(self.metrics_filepath_tmp)
+            stages = sorted(
+                metrics.summary()["stages"].items(),
+                key=lambda item: -item[1]["seconds"],
+            )
+            for stage, summary in stages[:5]:
+                logger.info(
+                    "%s: %s calls, %.2fs in total, p50 <= %ss, p99 <= %ss",
+                    stage,
+                    summary["count"],
+                    summary["seconds"],
+                    summary["p50"],
+                    summary["p99"],
+                )
+            if self.metrics_format:
+                filepath = self.metrics_filepath(name)
+                metrics.write(filepath, self.metrics_format, labels={"phase": name})
+                logger.info("Saved the %s metrics to %s", name, filepath)
+
+    def fetch_pdfs(self) -> List[dict]:
+        """Download the PDF of every article into `pdf_dir`.
+
+        Downloads run in a pool of `download_workers` threads and are streamed
+        to disk in `download_chunk_size` chunks. Partial files are resumed and
+        files whose ETag or size has not changed are skipped. One record per
+        file, with byte counts, timings and content hash, is appended to the
+        PDF manifest. With `content_dedup`, the hash goes to `content_index`
+        and a PDF with the same bytes as another gets its `canonical_url`.
+        """
+        with self._phase("pdfs"):
+            return self._fetch_pdfs()
+
+    def _fetch_pdfs(self) -> List[dict]:
+        # Lines cut short by an interrupted run are skipped
+        _end_partial_line(self.pdf_manifest_filepath)
+        manifest = {
+            record["url"]: record
+            for record in read_jsonl(self.pdf_manifest_filepath)
+            if record["status"] != "failed"
+        }
+        jobs = {}
+        for article in self.iter_articles(columns=[self.pdf_url_field]):
+            if pdf_url := article.get(self.pdf_url_field):
+                jobs[pdf_url] = url_to_filepath(pdf_url, self.pdf_dir)
+        logger.info("Downloading %s PDFs to %s", len(jobs), self.pdf_dir)
+
+        start = time.perf_counter()
+        records = []
+        for record in download_files(
+            self._request_with_retries,
+            list(jobs.items()),
+            previous=manifest,
+            num_workers=self.download_workers,
+            chunk_size=self.download_chunk_size,
+        ):
+            records.append(record)
+            metrics = get_metrics()
+            if self.content_dedup and record.get("sha256"):
+                entry = self.content_index.update(
+                    record["url"], sha256=record["sha256"]
+                )
+                if entry["canonical_url"] != record["url"]:
+                    record["canonical_url"] = entry["canonical_url"]
+                    metrics.inc("pdf_duplicates")
+            metrics.inc("pdf_bytes", record["bytes"])
+            metrics.inc(f"pdf_{record['status']}")
+            if record["status"] in ("downloaded", "resumed"):
+                metrics.observe("pdf_download", record["elapsed"])
+            HyFI.append_to_jsonl(record, self.pdf_manifest_filepath)
+            if self.verbose and len(records) % self.print_every == 0:
+                logger.info("Processed %s/%s PDFs", len(records), len(jobs))
+        if self.content_dedup:
+            self.content_index.flush()
+        elapsed = time.perf_counter() - start
+
+        num_bytes = sum(record["bytes"] for record in records)
+        statuses = Counter(record["status"] for record in records)
+        logger.info(
+            "Processed %s PDFs in %.1f seconds (%s), %.2f MB at %.2f MB/s",
+            len(records),
+            elapsed,
+            ", ".join(f"{n} {status}" for status, n in sorted(statuses.items())),
+            num_bytes / 1e6,
+            num_bytes / 1e6 / elapsed if elapsed > 0 else 0.0,
+        )
+        if num_duplicates := sum("canonical_url" in record for record in records):
+            logger.info("%s PDFs have the same content as another PDF", num_duplicates)
+        return records
+
+    def extract_texts(self) -> Dict[str, int]:
+        """Extract the text of the downloaded PDFs into `text_filename`.
+
+        PDFs are processed by `extract_workers` processes (one per CPU by
+        default) and each speech, or each page with `extract_per_page`, is
+        appended as one JSONL record. PDFs whose content was extracted before
+        are skipped. With `content_dedup`, PDFs whose downloaded bytes match
+        another are skipped without being opened, and the text hash of each
+        PDF goes to `content_index`.
+        """
+        urls, hashes = {}, {}
+        for record in read_jsonl(self.pdf_manifest_filepath):
+            urls[record["path"]] = record["url"]
+            if record.get("sha256"):
+                hashes[record["path"]] = record["sha256"]
+        filepaths = sorted(str(path) for path in Path(self.pdf_dir).rglob("*.pdf"))
+        callback = None
+        if self.content_dedup:
+            # Canonical PDFs first, so their duplicates are the ones skipped
+            index = self.content_index
+
+            def _is_duplicate(path: str) -> bool:
+                url = urls.get(path, "")
+                return index.canonical_url(url) != url
+
+            filepaths.sort(key=_is_duplicate)
+            callback = self._record_text_hash
+        else:
+            hashes = {}
+        with self._phase("texts"):
+            counts = extract_pdf_texts(
+                filepaths,
+                self.text_filepath,
+                num_workers=self.extract_workers,
+                per_page=self.extract_per_page,
+                urls=urls,
+                hashes=hashes,
+                callback=callback,
+                print_every=self.print_every,
+                verbose=self.verbose,
+            )
+        if self.content_dedup:
+            self.content_index.flush()
+        return counts
+
+    def _record_text_hash(self, record: dict) -> None:
+        if record.get("url") and record.get("text_sha256"):
+            self.content_index.update(record["url"], text_sha256=record["text_sha256"])
+
+    def _fetch_links(self, parse_page_func: Callable, next_page_func: Callable) -> None:
+        self._recover_links()
+        link_index = self._build_url_index(
+            self.iter_links(columns=["url"]), size_hint=len(self.link_store)
+        )
+        # The index reaches the workers through the pool initializer
         fetch_links_func = partial(
             crawl_links,
             parse_page_func=parse_page_func,
             next_page_func=next_page_func,
-            start_page=self.start_page,
-            max_num_pages=self.max_num_pages,
-            link_urls=link_urls,
-            link_filepath=self.link_filepath_tmp,
-            delay_between_requests=self.delay_between_requests,
+            print_every=self.print_every,
+            verbose=self.verbose,
         )
-        if links := self._fetch_links_mp(
-            num_workers,
-            fetch_links_func,
-        ):
+        if self.incremental:
+            if state := self.link_state:
+                logger.info(
+                    "Fetching links newer than %s (%s)",
+                    state.get("timestamp"),
+                    state.get("url"),
+                )
+            fetch_links_func = partial(
+                fetch_links_func,
+                max_known_links=self.stop_after_known_links,
+                max_known_pages=self.stop_after_known_pages,
+            )
+        tasks = self._resume_partitions(self._page_partitions())
+        num_workers = max(min(self.num_workers, len(tasks)), 1)
+        with self._writer() as writer:
+            links = self._fetch_links_mp(
+                num_workers,
+                partial(crawl_page_partition, crawl_func=fetch_links_func),
+                tasks,
+                indexes={"links": link_index},
+                sinks={
+                    "links": writer.sink(self.link_filepath_tmp),
+                    "pages": writer.sink(
+                        self.link_checkpoint_filepath, checkpoint=True
+                    ),
+                    "shards": writer.sink(self.shard_state_filepath, checkpoint=True),
+                    "metrics": writer.sink(self.metrics_filepath_tmp),
+                },
+            )
+        if links:
             self.save_links(links)
         else:
             logger.info("No more links found")
+        # Everything is saved, the next run starts from scratch
+        _remove_files(self.link_filepath_tmp, self.link_checkpoint_filepath)
+
+    def _recover_links(self) -> None:
+        """Save the links and completed pages of an interrupted run.
+
+        The links in the `.tmp` file are merged into the saved links, so they
+        count as known; the completed pages are kept until the run finishes,
+        see `_resume_partitions`.
+        """
+        if links := list(read_jsonl(self.link_filepath_tmp)):
+            logger.info("Recovering %s links from an interrupted run", len(links))
+            self.save_links(links)
+        _remove_files(self.link_filepath_tmp)
+
+    @property
+    def completed_shards(self) -> Dict[str, dict]:
+        """Last completion record of each start url, see `_fetch_links_mp`."""
+        return {
+            record["start_url"]: record
+            for record in read_jsonl(self.shard_state_filepath)
+        }
+
+    def _is_final_shard(self, start_url: str) -> bool:
+        """Whether a start url gets no new links once crawled to its end.
+
+        Later runs skip final start urls. A plain listing can always get new
+        links; listings of past date windows cannot, see `BisFetcher`.
+        """
+        return False
+
+    @property
+    def completed_pages(self) -> Dict[str, set]:
+        """Listing pages per start url completed by an interrupted run."""
+        pages: Dict[str, set] = {}
+        for record in read_jsonl(self.link_checkpoint_filepath):
+            pages.setdefault(record["start_url"], set()).add(record["page"])
+        return pages
+
+    def _resume_partitions(
+        self, partitions: List[PagePartition]
+    ) -> List[PagePartition]:
+        """Skip the pages an interrupted run completed.
 
-    def save_links(self, links: List[dict]):
-        self._links.extend(links)
-        original_len = len(self._links)
-        self._links = HyFI.remove_duplicates_from_list_of_dicts(
-            self._links, key=self.key_field
+        A partition completes its pages in order, so it resumes at its first
+        page that is not in the checkpoint. Listings without a page
+        placeholder find their next page from the current one and start over.
+        """
+        completed = self.completed_pages
+        if not completed:
+            return partitions
+        for start_url, pages in completed.items():
+            logger.info(
+                "Resuming %s after %s completed pages (last page %s)",
+                start_url,
+                len(pages),
+                max(pages),
+            )
+        resumed = []
+        for partition in partitions:
+            pages = completed.get(partition.start_url, set())
+            if self.page_placeholder not in partition.start_url:
+                resumed.append(partition)
+                continue
+            start_page, max_num_pages = partition.start_page, partition.max_num_pages
+            while start_page in pages:
+                start_page += partition.page_step
+                if max_num_pages is not None:
+                    max_num_pages -= 1
+            if max_num_pages is not None and max_num_pages < 0:
+                continue
+            resumed.append(
+                partition._replace(start_page=start_page, max_num_pages=max_num_pages)
+            )
+        return resumed
+
+    def _writer(self) -> JsonlWriter:
+        """Writer that appends the records of all workers to the `.tmp` files."""
+        return JsonlWriter(
+            batch_size=self.writer_batch_size,
+            flush_interval=self.writer_flush_interval,
+            fsync_interval=self.writer_fsync_interval,
+        )
+
+    def _page_partitions(self) -> List[PagePartition]:
+        """Split the listing pages of the start urls among the workers.
+
+        Each start url with a page placeholder gets `num_workers // len(start_urls)`
+        partitions (at least one). Partition i of n crawls pages
+        start_page + i, start_page + i + n, ..., so all partitions advance
+        through the listing together and stop together once one of them
+        finds its end.
+        """
+        start_urls = self.start_urls_encoded
+        completed = self.completed_shards
+        if skipped := [
+            url for url in start_urls if completed.get(url, {}).get("final")
+        ]:
+            logger.info(
+                "Skipping %s of %s start urls completed by earlier runs",
+                len(skipped),
+                len(start_urls),
+            )
+            start_urls = [url for url in start_urls if url not in set(skipped)]
+        start_page = self.start_page or 1
+        num_partitions = 1
+        if self.page_partitioning and all(
+            self.page_placeholder in start_url for start_url in start_urls
+        ):
+            num_partitions = max(self.num_workers // max(len(start_urls), 1), 1)
+        partitions = []
+        for shard, start_url in enumerate(start_urls):
+            for offset in range(num_partitions):
+                max_num_pages = self.max_num_pages
+                if max_num_pages:
+                    # crawl_links visits pages start_page..start_page + max_num_pages
+                    last_page = start_page + max_num_pages
+                    num_pages = len(
+                        range(start_page + offset, last_page + 1, num_partitions)
+                    )
+                    if num_pages == 0:
+                        continue
+                    max_num_pages = num_pages - 1
+                partitions.append(
+                    PagePartition(
+                        shard=shard,
+                        start_url=start_url,
+                        start_page=start_page + offset,
+                        page_step=num_partitions,
+                        max_num_pages=max_num_pages,
+                    )
+                )
+        return partitions
+
+    def save_links(self, links: List[dict]) -> None:
+        """Append the links that are not saved yet, see `JsonlStore`."""
+        new_links = self.link_store.append(links)
+        if self._links:
+            self._links.extend(new_links)
+        logger.info(
+            "Skipped %s duplicate links of %s links",
+            len(links) - len(new_links),
+            len(links),
         )
         logger.info(
-            "Removed %s duplicate links from %s links",
-            original_len - len(self._links),
-            original_len,
+            "Saved %s new links to %s, %s in total",
+            len(new_links),
+            self.link_store.filepath,
+            len(self.link_store),
+        )
+        self.save_link_state(links)
+
+    @property
+    def link_state(self) -> dict:
+        """High-water mark of the links, i.e. the latest link seen so far."""
+        if Path(self.link_state_filepath).exists():
+            return HyFI.load_json(self.link_state_filepath)
+        return {}
+
+    def save_link_state(self, links: List[dict]) -> None:
+        """Move the high-water mark forward to the latest of the given links."""
+        state = self.link_state
+        dated = (
+            (date, link)
+            for link in links
+            if (date := parse_timestamp(link.get("timestamp"))) is not None
+        )
+        date_and_link = max(dated, key=lambda item: item[0], default=None)
+        if date_and_link is None:
+            return
+        date, latest = date_and_link
+        previous = parse_timestamp(state.get("timestamp"))
+        if previous and previous > date:
+            return
+        state = {
+            "timestamp": latest["timestamp"],
+            "url": latest["url"],
+            "updated_at": datetime.now().isoformat(timespec="seconds"),
+        }
+        HyFI.save_json(state, self.link_state_filepath)
+        logger.info("Saved link high-water mark to %s", self.link_state_filepath)
+
+    def _build_url_index(
+        self, records: Iterable[dict], size_hint: Optional[int] = None
+    ) -> UrlIndex:
+        return UrlIndex.build(
+            (record["url"] for record in records),
+            bloom_threshold=self.url_index_bloom_threshold,
+            error_rate=self.url_index_error_rate,
+            size_hint=size_hint,
         )
-        HyFI.save_jsonl(self._links, self.link_filepath)
-        logger.info("Saved %s links to %s", len(self._links), self.link_filepath)
 
     def _fetch_links_mp(
         self,
         num_workers: int,
         batch_func: Callable,
+        tasks: List[PagePartition],
+        indexes: Optional[Dict[str, UrlIndex]] = None,
+        sinks: Optional[Dict[str, JsonlSink]] = None,
     ) -> List[dict]:
-        with mp.Pool(num_workers) as pool:
-            results = pool.map(batch_func, self.start_urls_encoded)
-        links = []
-        for result in results:
-            links.extend(result)
-        return links
-
-    def _fetch_articles(self, parse_article_func: Callable):
-        num_workers = min(self.num_workers, len(self.links))
-        article_urls = [article["url"] for article in self.articles]
-        fetch_articles_func = partial(
-            scrape_article_text,
-            parse_article_func=parse_article_func,
+        # One end-of-listing marker per start url, shared by its partitions
+        num_shards = max((task.shard for task in tasks), default=-1) + 1
+        stop_pages = [mp.Value("q", NO_STOP_PAGE) for _ in range(num_shards)]
+        self.rate_limiter  # created here, so the workers share it
+        # A shard is done once all its partitions are; it is only complete if
+        # one of them found the end of its listing and no page failed. The
+        # partitions interleave, so every page before the end was crawled.
+        start_urls = {task.shard: task.start_url for task in tasks}
+        remaining = Counter(task.shard for task in tasks)
+        num_links: Counter = Counter()
+        reached_end: set = set()
+        failed: set = set()
+        shard_sink = (sinks or {}).get("shards")
+        with mp.Pool(
+            num_workers,
+            initializer=init_link_worker,
+            initargs=(indexes or {}, stop_pages, sinks or {}, shared_rate_limiters()),
+        ) as pool:
+            results = []
+            for shard, result, found_end, failed_pages in pool.imap_unordered(
+                batch_func, tasks
+            ):
+                results.append((shard, result))
+                remaining[shard] -= 1
+                num_links[shard] += len(result)
+                if found_end:
+                    reached_end.add(shard)
+                if failed_pages:
+                    failed.add(shard)
+                if remaining[shard] == 0 and shard_sink is not None:
+                    shard_sink.write(
+                        {
+                            "start_url": start_urls[shard],
+                            "num_links": num_links[shard],
+                            "final": shard in reached_end
+                            and shard not in failed
+                            and self._is_final_shard(start_urls[shard]),
+                            "completed_at": datetime.now().isoformat(
+                                timespec="seconds"
+                            ),
+                        }
+                    )
+            # Let workers exit normally so their browser sessions are shut down
+            pool.close()
+            pool.join()
+        # Restore the listing order: by start url, then by page
+        ordered: List[Tuple[int, int, dict]] = []
+        for shard, result in results:
+            ordered.extend((shard, link.get("page", 0), link) for link in result)
+        ordered.sort(key=lambda item: item[:2])
+        return [link for _, _, link in ordered]
+
+    def _fetch_articles(self, parse_article_func: Callable) -> None:
+        self._recover_articles()
+        known_articles = self.iter_articles(columns=["url"])
+        if self.content_dedup:
+            # Collapsed articles are known too, so they are not scraped again
+            known_articles = chain(
+                known_articles, ({"url": url} for url in self.content_index.aliases)
+            )
+        article_index = self._build_url_index(
+            known_articles, size_hint=len(self.article_store)
+        )
+        links = self._pending_links(article_index)
+        if self.article_engine not in ("async", "mp"):
+            raise ValueError(f"Unknown article engine: {self.article_engine}")
+        num_articles = 0
+        with self._writer() as writer:
+            sink = writer.sink(self.article_filepath_tmp)
+            if self.article_engine == "async":
+                num_articles = self._fetch_articles_async(
+                    parse_article_func, links, article_index, article_sink=sink
+                )
+            else:
+                fetch_articles_func = partial(
+                    scrape_article_text,
+                    parse_article_func=parse_article_func,
+                    overwrite_existing=self.overwrite_existing,
+                    max_num_articles=None,
+                    article_timeout=self.article_timeout,
+                    print_every=self.print_every,
+                    verbose=self.verbose,
+                )
+                results = self._fetch_articles_mp(
+                    self.num_workers,
+                    fetch_articles_func,
+                    links,
+                    indexes={"articles": article_index},
+                    sinks={
+                        "articles": sink,
+                        "metrics": writer.sink(self.metrics_filepath_tmp),
+                    },
+                )
+                # Save every article_batch_size articles, so memory does not grow with the run
+                for articles in iter_batches(
+                    (article for result in results for article in result),
+                    max(self.article_batch_size, 1),
+                ):
+                    self.save_articles(articles)
+                    num_articles += len(articles)
+        if not num_articles:
+            logger.info("No more articles found")
+        _remove_files(self.article_filepath_tmp)
+
+    def _recover_articles(self) -> None:
+        """Save the articles completed by an interrupted run, so they are not scraped again."""
+        if articles := list(read_jsonl(self.article_filepath_tmp)):
+            logger.info("Recovering %s articles from an interrupted run", len(articles))
+            self.save_articles(articles)
+        _remove_files(self.article_filepath_tmp)
+
+    def _pending_links(self, article_index: UrlIndex) -> Iterator[dict]:
+        """Stream the links still to be scraped, up to `max_num_articles` for the whole run."""
+        num_links = num_pending = 0
+        for link in self.iter_links():
+            num_links += 1
+            if not self.overwrite_existing and link["url"] in article_index:
+                continue
+            if (
+                self.max_num_articles is not None
+                and num_pending >= self.max_num_articles
+            ):
+                logger.info("Reached max number of articles, stopping...")
+                break
+            num_pending += 1
+            yield link
+        logger.info("Queued %s of %s links read", num_pending, num_links)
+
+    def _fetch_articles_async(
+        self,
+        parse_article_func: Callable,
+        links: Iterable[dict],
+        article_urls: UrlIndex,
+        article_sink: Optional[JsonlSink] = None,
+    ) -> int:
+        """Scrape the links in one event loop, saving every `article_batch_size` articles.
+
+        Returns:
+            int: The number of articles scraped.
+        """
+        num_articles = 0
+
+        def _save(articles: List[dict]) -> None:
+            nonlocal num_articles
+            self.save_articles(articles)
+            num_articles += len(articles)
+
+        # Requests are paced by rate_limiter, not by the engine
+        resolve_articles(
+            links,
+            parse_article_func,
             article_urls=article_urls,
             overwrite_existing=self.overwrite_existing,
-            article_filepath=self.article_filepath_tmp,
-            max_num_articles=self.max_num_articles,
-            delay_between_requests=self.delay_between_requests,
+            max_num_articles=None,
+            article_sink=article_sink,
+            article_timeout=self.article_timeout,
+            max_concurrency=self.max_concurrency,
+            max_concurrency_per_host=self.max_concurrency_per_host,
+            on_batch=_save,
+            batch_size=max(self.article_batch_size, 1),
             print_every=self.print_every,
             verbose=self.verbose,
         )
-        if articles := self._fetch_articles_mp(num_workers, fetch_articles_func):
-            self.save_articles(articles)
-        else:
-            logger.info("No more articles found")
+        return num_articles
 
-    def save_articles(self, articles: List[dict]):
-        self._articles.extend(articles)
-        original_len = len(self._articles)
-        self._articles = HyFI.remove_duplicates_from_list_of_dicts(
-            self._articles, key=self.key_field
-        )
+    def save_articles(self, articles: List[dict]) -> None:
+        """Append the articles that are not saved yet, see `JsonlStore`.
+
+        With `content_dedup`, an article whose PDF belongs to another article
+        is not saved; its url is recorded as an alias in `content_index`.
+        """
+        if self.content_dedup:
+            articles = self._collapse_articles(articles)
+            self.content_index.flush()
+        new_articles = self.article_store.append(articles)
+        if self._articles:
+            self._articles.extend(new_articles)
         logger.info(
-            "Removed %s duplicate articles from %s articles",
-            original_len - len(self._articles),
-            original_len,
+            "Skipped %s duplicate articles of %s articles",
+            len(articles) - len(new_articles),
+            len(articles),
         )
-        HyFI.save_jsonl(self._articles, self.article_filepath)
         logger.info(
-            "Saved %s articles to %s",
-            len(self._articles),
-            self.article_filepath,
+            "Saved %s new articles to %s, %s in total",
+            len(new_articles),
+            self.article_store.filepath,
+            len(self.article_store),
         )
 
+    def _collapse_articles(self, articles: List[dict]) -> List[dict]:
+        """Keep the first article of each PDF url, e.g. a speech page over a direct PDF link."""
+        canonical = []
+        for article in articles:
+            url, pdf_url = article[self.key_field], article.get(self.pdf_url_field)
+            if not pdf_url:
+                canonical.append(article)
+                continue
+            record = self.content_index.get(pdf_url)
+            article_url = record.get("article_url")
+            if article_url is None:
+                self.content_index.update(pdf_url, article_url=url)
+                canonical.append(article)
+            elif article_url == url:
+                canonical.append(article)
+            elif url not in record.get("aliases", []):
+                self.content_index.update(
+                    pdf_url, aliases=record.get("aliases", []) + [url]
+                )
+        if len(canonical) < len(articles):
+            logger.info(
+                "Collapsed %s articles into the articles of the same PDF",
+                len(articles) - len(canonical),
+            )
+        return canonical
+
     def _fetch_articles_mp(
         self,
         num_workers: int,
         batch_func: Callable,
-    ) -> List[dict]:
-        articles = []
-        if len(self.links) < 1:
-            return articles
-        batch_size = len(self.links) // num_workers
-        batches = [
-            self.links[i : i + batch_size]
-            for i in range(0, len(self.links), batch_size)
-        ]
-        with mp.Pool(num_workers) as pool:
-            results = pool.map(batch_func, batches)
-        for result in results:
-            articles.extend(result)
-        return articles
+        links: Iterable[dict],
+        indexes: Optional[Dict[str, UrlIndex]] = None,
+        sinks: Optional[Dict[str, JsonlSink]] = None,
+    ) -> Iterator[List[dict]]:
+        """Scrape the links in chunks in a process pool, yielding each chunk's articles.
+
+        Small chunks are handed out on demand, so a slow chunk never holds up
+        the rest. Links are read from `links` only as chunks are submitted,
+        and at most two chunks per worker are in flight.
+        """
+        chunks = iter_batches(links, max(self.article_chunk_size, 1))
+        first_chunk = next(chunks, None)
+        if first_chunk is None:
+            return
+        num_workers = max(num_workers, 1)
+        max_in_flight = 2 * num_workers
+        done: queue.Queue = queue.Queue()
+        num_chunks = num_done = num_articles = 0
+
+        def _collect(max_pending: int) -> Iterator[List[dict]]:
+            # Wait until at most max_pending chunks are in flight, and pick up any finished chunk
+            nonlocal num_done, num_articles
+            while num_chunks - num_done > max_pending or (
+                num_done < num_chunks and not done.empty()
+            ):
+                result = done.get()
+                if isinstance(result, BaseException):
+                    raise result
+                num_done += 1
+                num_articles += len(result)
+                get_metrics().set_gauge("chunks_in_flight", num_chunks - num_done)
+                if self.verbose:
+                    logger.info(
+                        "Finished %s/%s chunks submitted, %s articles so far",
+                        num_done,
+                        num_chunks,
+                        num_articles,
+                    )
+                yield result
+
+        self.rate_limiter  # created here, so the workers share it
+        with mp.Pool(
+            num_workers,
+            initializer=init_article_worker,
+            initargs=(indexes or {}, sinks or {}, shared_rate_limiters()),
+        ) as pool:
+            for chunk in chain([first_chunk], chunks):
+                pool.apply_async(
+                    batch_func, (chunk,), callback=done.put, error_callback=done.put
+                )
+                num_chunks += 1
+                yield from _collect(max_in_flight - 1)
+            yield from _collect(0)
+            pool.close()
+            pool.join()
 
     def _next_page_func(
         self,
@@ -316,7 +1366,7 @@ class BaseFetcher(BaseModel):
         # TODO: Parse the page and extract all links
         raise NotImplementedError("Parsing links is not implemented in base class")
 
-    def _parse_article_text(self, url: str) -> dict:
+    def _parse_article_text(self, url: str) -> Optional[dict]:
         # TODO: Scrape the article page and extract the text
         raise NotImplementedError(
             "Parsing article text is not implemented in base class"
@@ -329,9 +1379,16 @@ def crawl_links(
     next_page_func: Callable,
     start_page: int = 1,
     max_num_pages: Optional[int] = 2,
-    link_urls: Optional[List[str]] = None,
+    link_urls: Optional[Union[List[str], UrlIndex]] = None,
     link_filepath: Optional[str] = None,
-    delay_between_requests: float = 0.0,
+    max_known_links: Optional[int] = None,
+    max_known_pages: Optional[int] = None,
+    page_step: int = 1,
+    stop_page: Optional["Synchronized[int]"] = None,
+    on_listing_end: Optional[Callable[[int], None]] = None,
+    on_page_error: Optional[Callable[[int], None]] = None,
+    print_every: int = 10,
+    verbose: bool = False,
 ) -> List[dict]:
     """Crawl links for article links with the given keyword.
 
@@ -340,69 +1397,217 @@ def crawl_links(
         search_url (str, optional): URL to search for the keyword. Defaults to "https://www.khmertimeskh.com/page/{page}/?s={keyword}".
         links (List[dict], optional): List of links to append to. Defaults to None.
         max_num_pages (Optional[int], optional): Maximum number of pages to crawl. Defaults to 2.
-        link_filepath (Optional[str], optional): Filepath to save the links to. Defaults to None.
+        link_filepath (Optional[str], optional): Filepath to append the links to when no
+            "links" sink is installed in this process. Defaults to None.
+            Completed pages are sent to the "pages" sink, if one is installed.
+        max_known_links (Optional[int], optional): Stop after this many consecutive known links. Defaults to None.
+        max_known_pages (Optional[int], optional): Stop after this many consecutive pages without new links. Defaults to None.
+        page_step (int, optional): Difference between consecutive page numbers. Defaults to 1.
+        stop_page (Optional[multiprocessing.Value], optional): Shared marker of the first page past the
+            end of the listing. Partitions crawling the same listing stop at it, and a missing page
+            lowers it. Defaults to None.
+        on_listing_end (Optional[Callable[[int], None]], optional): Called with the page that
+            showed the end of the listing, i.e. a missing page. Not called if the crawl stops
+            for any other reason. Defaults to None.
+        on_page_error (Optional[Callable[[int], None]], optional): Called with each page that
+            failed to parse. Defaults to None.
         print_every (int, optional): Print progress every n pages. Defaults to 10.
         verbose (bool, optional): Print progress. Defaults to False.
 
+    Only a missing page (`parse_page_func` returns None) ends the listing. A page
+    that fails to parse is logged and skipped, and is left out of the checkpoint
+    so that a resumed run crawls it again.
+
     Returns:
         List[dict]: List of links.
     """
 
     page = start_page
     page_cnt = 0
+    known_links_cnt = 0
+    known_pages_cnt = 0
     page_url = None
     links = []
-    link_urls = link_urls or []
+    if link_urls is None:
+        link_urls = get_shared_index("links")
+    elif not isinstance(link_urls, UrlIndex):
+        link_urls = UrlIndex(link_urls)
+    link_sink = get_shared_sink("links")
+    page_sink = get_shared_sink("pages")
     logger.info("Fetching links for url: %s", start_url)
     while True:
+        if stop_page is not None and page >= stop_page.value:
+            logger.info("Reached the end of the listing, stopping...")
+            break
         # get next page url
         page_url = next_page_func(start_url, page_url, page)
         # Parse page
-        page_links = parse_page_func(page_url)
+        failed = False
+        try:
+            page_links = parse_page_func(page_url)
+        except Exception as e:
+            logger.error("Error while fetching the page url: %s", page_url)
+            logger.error(e)
+            page_links, failed = [], True
+            if on_page_error is not None:
+                on_page_error(page)
 
         # Check if page_links is None
         if page_links is None:
             logger.info("No more links found, stopping...")
+            _lower_stop_page(stop_page, page)
+            if on_listing_end is not None:
+                on_listing_end(page)
             break
 
+        num_new_links = 0
         for link in page_links:
             if link["url"] not in link_urls:
                 link["page_url"] = page_url
                 link["page"] = page
                 links.append(link)
-                link_urls.append(link["url"])
-                if link_filepath:
+                link_urls.add(link["url"])
+                num_new_links += 1
+                known_links_cnt = 0
+                if link_sink is not None:
+                    link_sink.write(link)
+                elif link_filepath:
                     HyFI.append_to_jsonl(link, link_filepath)
             else:
+                known_links_cnt += 1
                 logger.info(
                     "Link %s already exists, skipping...",
                     link["url"],
                 )
+        if not failed:
+            known_pages_cnt = 0 if num_new_links else known_pages_cnt + 1
+            if page_sink is not None:
+                page_sink.write({"start_url": start_url, "page": page})
+
+        # The listing is sorted by date, so a run of known links means we caught up
+        if max_known_links and known_links_cnt >= max_known_links:
+            logger.info("Found %s known links in a row, stopping...", known_links_cnt)
+            _lower_stop_page(stop_page, page + 1)
+            break
+        if max_known_pages and known_pages_cnt >= max_known_pages:
+            logger.info(
+                "Found %s pages without new links, stopping...", known_pages_cnt
+            )
+            _lower_stop_page(stop_page, page + 1)
+            break
 
-        page += 1
+        page += page_step
         page_cnt += 1
+        if verbose and page_cnt % print_every == 0:
+            logger.info(
+                "Fetched %s pages of %s, %s new links so far",
+                page_cnt,
+                start_url,
+                len(links),
+            )
 
         if max_num_pages and page_cnt > max_num_pages:
             logger.info("Reached max number of pages, stopping...")
             break
-        # Delay between requests
-        if delay_between_requests > 0:
-            logger.info("Sleeping for %s seconds...", delay_between_requests)
-            time.sleep(delay_between_requests)
 
     logger.info("Finished fetching links for url: %s", start_url)
     logger.info("Total links fetched: %s", len(links))
     return links
 
 
+def _remove_files(*filepaths: str) -> None:
+    for filepath in filepaths:
+        if os.path.exists(filepath):
+            os.remove(filepath)
+
+
+def _end_partial_line(filepath: str) -> None:
+    """End a line cut short by a crash, so the next appended record starts on its own line."""
+    if not os.path.exists(filepath) or not os.path.getsize(filepath):
+        return
+    with open(filepath, "rb+") as f:
+        f.seek(-1, os.SEEK_END)
+        if f.read(1) != b"\n":
+            f.write(b"\n")
+
+
+def _lower_stop_page(stop_page: Optional["Synchronized[int]"], page: int) -> None:
+    if stop_page is None:
+        return
+    with stop_page.get_lock():
+        stop_page.value = min(stop_page.value, page)
+
+
+def crawl_page_partition(
+    partition: PagePartition,
+    crawl_func: Callable = crawl_links,
+) -> Tuple[int, List[dict], bool, List[int]]:
+    """Crawl the pages of one partition, see `BaseFetcher._page_partitions`.
+
+    Returns:
+        Tuple[int, List[dict], bool, List[int]]: The shard of the partition, its
+        links, whether it found the end of the listing, and the pages that failed.
+    """
+    stop_page = None
+    if partition.page_step > 1:
+        stop_page = _stop_pages[partition.shard]
+    end_pages: List[int] = []
+    failed_pages: List[int] = []
+    links = crawl_func(
+        partition.start_url,
+        start_page=partition.start_page,
+        max_num_pages=partition.max_num_pages,
+        page_step=partition.page_step,
+        stop_page=stop_page,
+        on_listing_end=end_pages.append,
+        on_page_error=failed_pages.append,
+    )
+    _report_metrics()
+    return partition.shard, links, bool(end_pages), failed_pages
+
+
+def _report_metrics() -> None:
+    """Send the metrics of this worker to the parent, if it collects them."""
+    if (sink := get_shared_sink("metrics")) is not None:
+        sink.write(get_metrics().snapshot())
+
+
+def call_with_timeout(
+    func: Callable[..., T], timeout: Optional[float], *args: object, **kwargs: object
+) -> T:
+    """Call func, raising TimeoutError if it runs longer than timeout seconds.
+
+    The timeout relies on SIGALRM, so it only applies in the main thread of a
+    process on platforms that have it, which includes pool workers. Elsewhere
+    func runs without a limit.
+    """
+    if (
+        not timeout
+        or not hasattr(signal, "setitimer")
+        or threading.current_thread() is not threading.main_thread()
+    ):
+        return func(*args, **kwargs)
+
+    def _raise_timeout(signum: int, frame: Optional[FrameType]) -> None:
+        raise TimeoutError(f"Timed out after {timeout} seconds")
+
+    previous = signal.signal(signal.SIGALRM, _raise_timeout)
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        return func(*args, **kwargs)
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
 def scrape_article_text(
     links: List[dict],
     parse_article_func: Callable,
-    article_urls: Optional[List[dict]] = None,
+    article_urls: Optional[Union[List[str], UrlIndex]] = None,
     overwrite_existing: bool = False,
     max_num_articles: Optional[int] = 10,
     article_filepath: Optional[str] = None,
-    delay_between_requests: float = 0.0,
+    article_timeout: Optional[float] = None,
     print_every: int = 10,
     verbose: bool = False,
 ) -> List[dict]:
@@ -413,7 +1618,9 @@ def scrape_article_text(
         articles (Optional[List[dict]], optional): List of articles to append to. Defaults to None.
         overwrite_existing (bool, optional): Overwrite existing articles. Defaults to False.
         max_num_articles (Optional[int], optional): Maximum number of articles to scrape. Defaults to 10.
-        article_filepath (Optional[str], optional): Filepath to save the articles to. Defaults to None.
+        article_filepath (Optional[str], optional): Filepath to append the articles to when no
+            "articles" sink is installed in this process. Defaults to None.
+        article_timeout (Optional[float], optional): Give up on an article after this many seconds. Defaults to None.
         print_every (int, optional): Print progress every n articles. Defaults to 10.
         verbose (bool, optional): Print progress. Defaults to False.
 
@@ -421,7 +1628,11 @@ def scrape_article_text(
         List[dict]: List of articles.
     """
     articles = []
-    article_urls = article_urls or []
+    if article_urls is None:
+        article_urls = get_shared_index("articles")
+    elif not isinstance(article_urls, UrlIndex):
+        article_urls = UrlIndex(article_urls)
+    article_sink = get_shared_sink("articles")
     for i, link in enumerate(links):
         if max_num_articles is not None and i >= max_num_articles:
             logger.info("Reached max number of articles, stopping...")
@@ -434,7 +1645,13 @@ def scrape_article_text(
             continue
 
         # Parse article
-        _article = parse_article_func(url)
+        try:
+            with get_metrics().timer("article"):
+                _article = call_with_timeout(parse_article_func, article_timeout, url)
+        except TimeoutError:
+            logger.warning("Timed out after %ss scraping %s", article_timeout, url)
+            get_metrics().inc("article_timeouts")
+            continue
         if _article is None:
             logger.info(
                 "Article [%s](%s) does not exist, skipping...",
@@ -445,17 +1662,17 @@ def scrape_article_text(
         article = link.copy()
         article.update(_article)
         articles.append(article)
-        article_urls.append(url)
-        if article_filepath:
+        article_urls.add(url)
+        if article_sink is not None:
+            article_sink.write(article)
+        elif article_filepath:
             HyFI.append_to_jsonl(article, article_filepath)
-        if (verbose and (i + 1) % print_every == 0) or delay_between_requests > 0:
-            logger.info("Article [%s](%s) scraped", title, url)
-
-        # Delay between requests
-        if delay_between_requests > 0 and i < len(links) - 1:
-            logger.info("Sleeping for %s seconds...", delay_between_requests)
-            time.sleep(delay_between_requests)
+        if verbose and len(articles) % print_every == 0:
+            logger.info(
+                "Scraped %s articles, last: [%s](%s)", len(articles), title, url
+            )
 
     logger.info("Finished scraping articles")
     logger.info("Total articles scraped: %s", len(articles))
+    _report_metrics()
     return articles
@@ -0,0 +1,235 @@
+"""Offline throughput benchmarks of the fetcher against a replayed archive"""
+import argparse
+import json
+import logging
+import multiprocessing as mp
+import queue
+import resource
+import sys
+import tempfile
+import time
+from multiprocessing.queues import Queue
+from typing import Dict, List, Optional, Sequence
+
+from .replay import LISTING_URL, ReplayServer, build_synthetic_archive
+
+logger = logging.getLogger(__name__)
+
+# Benchmark cases: the phase that is timed, and the fetcher options of the case
+BENCHMARK_CASES = {
+    "links-http": ("links", {"transport": "http"}),
+    "links-auto": ("links", {"transport": "auto"}),
+    "links-selenium": ("links", {"transport": "selenium"}),
+    "articles-mp": ("articles", {"article_engine": "mp"}),
+    "articles-async": ("articles", {"article_engine": "async"}),
+    "pdfs": ("pdfs", {}),
+}
+DEFAULT_CASES = ("links-http", "links-auto", "articles-mp", "articles-async", "pdfs")
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is in KiB on Linux; worker processes count as children
+    peak = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+    return peak / 1024
+
+
+def _run_case(
+    name: str,
+    archive_dir: str,
+    options: dict,
+    latency: float,
+    error_rate: float,
+    start_method: str,
+    results: "Queue[dict]",
+) -> None:
+    """Runs one case in a fresh process, so its peak RSS is its own."""
+    from .bis import BisFetcher
+
+    # A spawned process spawns its own workers too, unless told otherwise
+    mp.set_start_method(start_method, force=True)
+
+    phase, case_options = BENCHMARK_CASES[name]
+    with ReplayServer(
+        archive_dir, latency=latency, error_rate=error_rate, seed=0
+    ) as server:
+        fetcher = BisFetcher(
+            **{
+                "base_url": server.url,
+                "search_url": server.url + LISTING_URL.split("bis.org", 1)[1],
+                "http_cache": False,
+                "max_num_articles": None,
+                "max_num_pages": None,
+                "verbose": False,
+                **options,
+                **case_options,
+            }
+        )
+        # Earlier phases are set up untimed
+        if phase != "links":
+            fetcher.fetch_links()
+        if phase == "pdfs":
+            fetcher.fetch_articles()
+        server.reset_stats()
+
+        start = time.perf_counter()
+        if phase == "links":
+            fetcher.fetch_links()
+        elif phase == "articles":
+            fetcher.fetch_articles()
+        else:
+            fetcher.fetch_pdfs()
+        elapsed = time.perf_counter() - start
+        stats = dict(server.stats)
+
+    num_bytes = sum(value for key, value in stats.items() if key.endswith("_bytes"))
+    num_links = sum(1 for _ in fetcher.iter_links(columns=["url"]))
+    num_articles = sum(1 for _ in fetcher.iter_articles(columns=["url"]))
+    results.put(
+        {
+            "case": name,
+            "seconds": elapsed,
+            "links": num_links,
+            "articles": num_articles,
+            "pages_per_s": stats.get("listing_requests", 0) / elapsed,
+            "articles_per_s": (num_articles / elapsed) if phase == "articles" else 0.0,
+            "mb_per_s": num_bytes / 1e6 / elapsed,
+            "peak_rss_mb": _peak_rss_mb(),
+            "requests": stats,
+        }
+    )
+
+
+def run_benchmarks(
+    archive_dir: str,
+    cases: Sequence[str] = DEFAULT_CASES,
+    output_dir: Optional[str] = None,
+    latency: float = 0.0,
+    error_rate: float = 0.0,
+    **options: object,
+) -> List[dict]:
+    """
+    Times the fetcher on an archive replayed by a local ReplayServer.
+
+    Each case runs in its own process, with its own server and an empty
+    output directory, and reports its pages/s, articles/s, MB/s served
+    and peak RSS.
+
+    Args:
+        archive_dir (str): Fixture archive to replay, see `build_synthetic_archive`.
+        cases (Sequence[str]): Names of the cases in BENCHMARK_CASES. Defaults to DEFAULT_CASES.
+        output_dir (Optional[str]): Where the cases write their output. Defaults to a temporary directory.
+        latency (float): Seconds the server waits before each response. Defaults to 0.0.
+        error_rate (float): Share of requests answered with a 503. Defaults to 0.0.
+        **options: Fetcher options, e.g. num_workers.
+
+    Returns:
+        List[dict]: One result per case.
+    """
+    ctx = mp.get_context("spawn")
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name in cases:
+            if name not in BENCHMARK_CASES:
+                raise ValueError(f"Unknown benchmark case: {name}")
+            case_dir = f"{output_dir or tmp_dir}/{name}"
+            queue_ = ctx.Queue()
+            process = ctx.Process(
+                target=_run_case,
+                args=(
+                    name,
+                    archive_dir,
+                    {**options, "output_dir": case_dir},
+                    latency,
+                    error_rate,
+                    mp.get_start_method(),
+                    queue_,
+                ),
+            )
+            process.start()
+            result = None
+            while result is None:
+                try:
+                    result = queue_.get(timeout=1.0)
+                except queue.Empty:
+                    if not process.is_alive():
+                        raise RuntimeError(
+                            f"Benchmark case {name} failed with exit code {process.exitcode}"
+                        )
+            process.join()
+            logger.info(
+                "%s: %.1f pages/s, %.1f articles/s, %.2f MB/s, %.0f MB peak RSS",
+                name,
+                result["pages_per_s"],
+                result["articles_per_s"],
+                result["mb_per_s"],
+                result["peak_rss_mb"],
+            )
+            results.append(result)
+    return results
+
+
+def _format_results(results: List[dict]) -> str:
+    lines = [
+        f"{'case':16s}{'seconds':>9s}{'pages/s':>10s}{'articles/s':>12s}{'MB/s':>9s}{'RSS MB':>9s}"
+    ]
+    for result in results:
+        lines.append(
+            f"{result['case']:16s}{result['seconds']:9.2f}{result['pages_per_s']:10.1f}"
+            f"{result['articles_per_s']:12.1f}{result['mb_per_s']:9.2f}{result['peak_rss_mb']:9.0f}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> List[dict]:
+    parser = argparse.ArgumentParser(
+        prog="python -m bis_fetcher.fetcher.benchmark",
+        description="Benchmark the fetcher against a replayed fixture archive.",
+    )
+    parser.add_argument("--archive", help="Fixture archive, recorded with record_dir")
+    parser.add_argument(
+        "--pages", type=int, default=5, help="Listing pages of a synthetic archive"
+    )
+    parser.add_argument(
+        "--per-page", type=int, default=10, help="Speeches per listing page"
+    )
+    parser.add_argument(
+        "--pdf-size", type=int, default=100_000, help="Bytes per synthetic PDF"
+    )
+    parser.add_argument(
+        "--cases", nargs="+", default=list(DEFAULT_CASES), choices=list(BENCHMARK_CASES)
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="Seconds per response"
+    )
+    parser.add_argument(
+        "--error-rate", type=float, default=0.0, help="Share of 503 responses"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=1, help="num_workers of the fetcher"
+    )
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        archive_dir = args.archive
+        if archive_dir is None:
+            archive_dir = f"{tmp_dir}/archive"
+            build_synthetic_archive(
+                archive_dir, args.pages, args.per_page, pdf_size=args.pdf_size
+            )
+        results = run_benchmarks(
+            archive_dir,
+            cases=args.cases,
+            latency=args.latency,
+            error_rate=args.error_rate,
+            num_workers=args.workers,
+        )
+    print(json.dumps(results, indent=2) if args.json else _format_results(results))
+    return results
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
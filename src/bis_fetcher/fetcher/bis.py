@@ -1,10 +1,14 @@
 import logging
-from datetime import datetime
-from typing import List, Optional, Tuple
-
-from bs4 import BeautifulSoup
+import re
+from collections import Counter
+from datetime import date, datetime
+from typing import TYPE_CHECKING, List, Optional, Tuple
 
 from .base import BaseFetcher, By
+from .planner import CrawlShard, parse_date, plan_crawl
+
+if TYPE_CHECKING:
+    from .parsing import PageParser
 
 logger = logging.getLogger(__name__)
 
@@ -23,6 +27,20 @@ class BisFetcher(BaseFetcher):
         "https://www.bis.org/cbspeeches/index.htm?m=256&cbspeeches_page={page}"
     )
     search_keywords: List[str] = []
+    # Crawl the listing in shards by date window, institution and author;
+    # see `plan_crawl`. The query parameters are those of the listing's filters.
+    crawl_authors: List[str] = []
+    crawl_end: Optional[str] = None
+    crawl_institutions: List[str] = []
+    crawl_start: Optional[str] = None
+    crawl_window: str = "year"
+    filter_date_format: str = "%d/%m/%Y"
+    filter_params: dict = {
+        "from": "fromDate",
+        "till": "tillDate",
+        "institution": "institutions",
+        "author": "authors",
+    }
 
     link_locator: Tuple[str, str] = (
         By.CSS_SELECTOR,
@@ -34,6 +52,68 @@ class BisFetcher(BaseFetcher):
     link_find_all_attrs: dict = {}
     lint_article_name: str = "div"
     lint_article_attrs: dict = {"class": "title"}
+    parser_backend: str = "strainer"
+    predict_pdf_url: bool = True
+    verify_pdf_url: bool = True
+
+    _page_parser: Optional["PageParser"] = None
+
+    @property
+    def page_parser(self) -> "PageParser":
+        """Parser for listing and speech pages, built once per fetcher.
+
+        `parser_backend` is one of `html.parser` (a full tree), `lxml`, or
+        `strainer`/`lxml-strainer`, which only build the listing table or the
+        PDF link div.
+        """
+        if self._page_parser is None:
+            # bs4 is imported on first use, not when the fetcher is
+            from .parsing import PageParser
+
+            self._page_parser = PageParser(
+                self.parser_backend,
+                container_name=self.link_container_name,
+                container_attrs=self.link_container_attrs,
+                row_name=self.link_find_all_name,
+                row_attrs=self.link_find_all_attrs,
+                title_name=self.lint_article_name,
+                title_attrs=self.lint_article_attrs,
+            )
+        return self._page_parser
+
+    @property
+    def crawl_plan(self) -> List[CrawlShard]:
+        """Shards of the listing from `crawl_start` to `crawl_end` (today by default)."""
+        start = parse_date(self.crawl_start)
+        if start is None:
+            return []
+        end = parse_date(self.crawl_end, end=True) or date.today()
+        return plan_crawl(
+            self.search_url,
+            start,
+            min(end, date.today()),
+            window=self.crawl_window,
+            institutions=self.crawl_institutions,
+            authors=self.crawl_authors,
+            from_param=self.filter_params["from"],
+            till_param=self.filter_params["till"],
+            institution_param=self.filter_params["institution"],
+            author_param=self.filter_params["author"],
+            date_format=self.filter_date_format,
+        )
+
+    @property
+    def start_urls_encoded(self) -> List[str]:
+        if not self.start_urls and self.crawl_start:
+            return [shard.url for shard in self.crawl_plan]
+        return super().start_urls_encoded
+
+    def _is_final_shard(self, start_url: str) -> bool:
+        """A shard whose date window is over gets no new speeches."""
+        for shard in self.crawl_plan:
+            if shard.url == start_url:
+                return shard.end < date.today()
+        return False
 
     def _parse_page_links(
         self,
@@ -41,59 +121,54 @@ class BisFetcher(BaseFetcher):
         print_every: int = 10,
         verbose: bool = False,
     ) -> Optional[List[dict]]:
-        """Get the links from the given page."""
+        """Get the links from the given page.
+
+        Returns None if the page does not exist, i.e. past the end of the
+        listing. Raises if the page could not be fetched, or no transport
+        found the listing table in it, so that an error is not taken for
+        the end of the listing.
+        """
         links = []
-        try:
+        for transport in self.transports:
             response = self.request(
                 page_url,
-                use_selenium=True,
+                use_selenium=transport == "selenium",
                 locator=self.link_locator,
             )
             # Check if page exists (status code 200) or not (status code 404)
             if response.status_code == 404:
                 logger.info("Page [%s] does not exist, stopping...", page_url)
                 return None
-            soup = BeautifulSoup(response.text, "html.parser")
 
-            # Find the section with class 'section-category'
-            section = soup.find(
-                self.link_container_name, attrs=self.link_container_attrs
+            # Find the table that holds the list of speeches
+            rows = self.page_parser.parse_listing(response.text)
+            if rows is not None:
+                break
+            logger.info(
+                "No links found in page [%s] via %s", page_url, response.transport
             )
-
-            # Find all articles within the section
-            articles = section.find_all(
-                self.link_find_all_name, attrs=self.link_find_all_attrs
+        else:
+            raise ValueError(
+                f"No listing found in page {page_url} "
+                f"(status code {response.status_code})"
             )
-
-            for article_no, article in enumerate(articles):
-                # Extract and print article information
-                title_div = article.find(
-                    self.lint_article_name, attrs=self.lint_article_attrs
-                )
-                if title_div is None:
-                    logger.info("No title found for article %s", article_no)
-                    continue
-                title = title_div.text
-                url = self.base_url + article.find("a")["href"]
-
-                date_ = article.find("td", class_="item_date")
-                item_date = date_.text.strip() if date_ else ""
-                author_ = article.find("a", class_="authorlnk dashed")
-                author = author_.text.strip() if author_ else ""
-
-                if verbose and article_no % print_every == 0:
-                    logger.info("Title: %s", title)
-                    logger.info("URL: %s", url)
-                link = {
-                    "title": title,
-                    "author": author,
-                    "timestamp": item_date,
-                    "url": url,
-                }
-                links.append(link)
-        except Exception as e:
-            logger.error("Error while fetching the page url: %s", page_url)
-            logger.error(e)
+        if verbose:
+            logger.info("Page [%s] fetched via %s", page_url, response.transport)
+
+        for article_no, row in enumerate(rows):
+            title = row["title"]
+            url = self.base_url + row["href"]
+            if verbose and article_no % print_every == 0:
+                logger.info("Title: %s", title)
+                logger.info("URL: %s", url)
+            link = {
+                "title": title,
+                "author": row["author"],
+                "timestamp": row["timestamp"],
+                "url": url,
+                "transport": response.transport,
+            }
+            links.append(link)
         return links
 
     def _parse_article_text(self, url: str) -> Optional[dict]:
@@ -104,17 +179,58 @@ class BisFetcher(BaseFetcher):
                     "pdf_url": url,
                 }
 
+            if self.predict_pdf_url:
+                if pdf_url := self._predict_pdf_url(url):
+                    return {
+                        "pdf_url": pdf_url,
+                        "pdf_url_source": "predicted",
+                    }
+                logger.info("Could not predict the PDF url of %s", url)
+
             response = self.request(url)
-            soup = BeautifulSoup(response.text, "html.parser")
-            pdf_div = soup.find("div", class_="pdftxt")
-            pdf = pdf_div.find("a", class_="pdftitle_link")["href"]
+            pdf = self.page_parser.parse_pdf_href(response.text)
+            if pdf is None:
+                logger.info("No PDF link found in %s", url)
+                return None
             pdf_url = self.base_url + pdf
 
             return {
                 "pdf_url": pdf_url,
+                "pdf_url_source": "parsed",
             }
 
+        except TimeoutError:
+            # Raised by the article_timeout alarm, counted by the caller
+            raise
         except Exception as e:
             logger.error("Error while scraping the article url: %s", url)
             logger.error(e)
         return None
+
+    def _predict_pdf_url(self, url: str) -> Optional[str]:
+        """Predict the PDF url of a speech from its page url.
+
+        BIS serves the PDF of a speech next to its page, e.g.
+        /review/r231110a.htm -> /review/r231110a.pdf. With `verify_pdf_url`
+        the prediction is only trusted if a HEAD request finds the file.
+        """
+        if not re.search(r"\.html?$", url):
+            return None
+        pdf_url = re.sub(r"\.html?$", ".pdf", url)
+        if not self.verify_pdf_url:
+            return pdf_url
+        try:
+            if self.head(pdf_url).status_code == 200:
+                return pdf_url
+        except Exception as e:
+            logger.info("Error while checking the PDF url %s: %s", pdf_url, e)
+        return None
+
+    def save_articles(self, articles: List[dict]) -> None:
+        sources = Counter(article.get("pdf_url_source") for article in articles)
+        logger.info(
+            "PDF urls resolved: %s predicted, %s parsed from the page",
+            sources["predicted"],
+            sources["parsed"],
+        )
+        super().save_articles(articles)
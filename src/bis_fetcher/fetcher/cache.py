@@ -0,0 +1,166 @@
+"""On-disk HTTP response cache"""
+import gzip
+import hashlib
+import json
+import logging
+import os
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, List, Mapping, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class HttpCache:
+    """
+    Cache of GET responses on disk, keyed by URL.
+
+    Each entry is one gzip file holding a JSON header line, with the status,
+    validators and time the response was stored, followed by the body.
+    Entries are written to a temporary file and renamed, so processes can
+    share the cache. An entry younger than `ttl` seconds is served as is;
+    an older one is revalidated with a conditional GET (If-None-Match,
+    If-Modified-Since). Reading an entry marks it as used, and the least
+    recently used entries are evicted once the cache exceeds `max_bytes`.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str,
+        ttl: Optional[float] = 0.0,
+        max_bytes: Optional[int] = 512 * 1024 * 1024,
+    ):
+        """
+        Initializes an HttpCache instance.
+
+        Args:
+            cache_dir (str): Directory of the cache.
+            ttl (Optional[float]): Seconds an entry is served without revalidation,
+                None to never revalidate. Defaults to 0.0 (always revalidate).
+            max_bytes (Optional[int]): Size of the cache on disk before entries are evicted,
+                None for no limit. Defaults to 512 MiB.
+        """
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._num_bytes: Optional[int] = None
+
+    def _path(self, url: str) -> Path:
+        key = hashlib.sha256(url.encode()).hexdigest()
+        return Path(self.cache_dir) / key[:2] / f"{key}.gz"
+
+    def get(self, url: str) -> Optional[dict]:
+        """
+        Returns the cached entry of a URL, with its `text`, or None.
+
+        The entry is marked as recently used.
+        """
+        path = self._path(url)
+        try:
+            with gzip.open(path, "rb") as f:
+                header = json.loads(f.readline())
+                header["text"] = f.read().decode("utf-8")
+            os.utime(path)
+        except (OSError, EOFError, ValueError):
+            return None
+        return header
+
+    def is_fresh(self, entry: dict) -> bool:
+        if self.ttl is None:
+            return True
+        return time.time() - entry["stored_at"] < self.ttl
+
+    @staticmethod
+    def conditional_headers(entry: dict) -> Dict[str, str]:
+        """Headers that make a GET return 304 if the cached entry is still current."""
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def put(
+        self,
+        url: str,
+        text: str,
+        status_code: int = 200,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+    ) -> None:
+        """Stores a response, replacing any previous entry of the URL."""
+        path = self._path(url)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        header = {
+            "url": url,
+            "status_code": status_code,
+            "etag": etag,
+            "last_modified": last_modified,
+            "stored_at": time.time(),
+        }
+        previous_size = path.stat().st_size if path.exists() else 0
+        tmp_path = path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+        with gzip.open(tmp_path, "wb", compresslevel=6) as f:
+            f.write(json.dumps(header).encode("utf-8") + b"\n")
+            f.write(text.encode("utf-8"))
+        size = tmp_path.stat().st_size
+        os.replace(tmp_path, path)
+        if self._num_bytes is not None:
+            self._num_bytes += size - previous_size
+        if self.max_bytes is not None and self.num_bytes > self.max_bytes:
+            self.evict()
+
+    def refresh(
+        self, url: str, entry: dict, headers: Optional[Mapping[str, str]] = None
+    ) -> None:
+        """Marks an entry as revalidated, taking any new validators from a 304 response."""
+        headers = headers or {}
+        self.put(
+            url,
+            entry["text"],
+            status_code=entry["status_code"],
+            etag=headers.get("ETag") or entry.get("etag"),
+            last_modified=headers.get("Last-Modified") or entry.get("last_modified"),
+        )
+
+    @property
+    def num_bytes(self) -> int:
+        """Size of the cache on disk, counted once and then tracked by this process."""
+        if self._num_bytes is None:
+            self._num_bytes = sum(size for _, size, _ in self._entries())
+        return self._num_bytes
+
+    def _entries(self) -> List[Tuple[float, int, Path]]:
+        entries = []
+        for path in Path(self.cache_dir).glob("*/*.gz"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue  # evicted by another process
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def evict(self, target_ratio: float = 0.9) -> None:
+        """Removes the least recently used entries until the cache is below `target_ratio` of `max_bytes`."""
+        if self.max_bytes is None:
+            return
+        entries = sorted(self._entries())
+        num_bytes = sum(size for _, size, _ in entries)
+        target = self.max_bytes * target_ratio
+        num_evicted = 0
+        for _, size, path in entries:
+            if num_bytes <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            num_bytes -= size
+            num_evicted += 1
+        self._num_bytes = num_bytes
+        logger.info(
+            "Evicted %s entries from the HTTP cache, %.1f MB left",
+            num_evicted,
+            num_bytes / 1e6,
+        )
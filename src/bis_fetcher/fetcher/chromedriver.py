@@ -1,15 +1,38 @@
+import json
 import logging
-from typing import Optional, Tuple
+import os
+import queue
+import threading
+from contextlib import contextmanager
+from multiprocessing.util import Finalize
+from typing import TYPE_CHECKING, Callable, Iterator, List, Optional, Tuple, TypedDict
 
 import requests
 from selenium import webdriver
+from selenium.common.exceptions import TimeoutException
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.ui import WebDriverWait
 
+from .metrics import get_metrics
+
+if TYPE_CHECKING:
+    from typing_extensions import Unpack
+
 logger = logging.getLogger(__name__)
 
 
+class DriverOptions(TypedDict, total=False):
+    """Keyword arguments of ChromeWebDriver that a pool passes to each session."""
+
+    headless: bool
+    no_sandbox: bool
+    disable_dev_shm_usage: bool
+    autoclose: bool
+    wait_time: int
+    single_load: bool
+
+
 class ChromeWebDriver:
     """
     ChromeWebDriver class to fetch the HTTP response for a given URL
@@ -43,10 +66,13 @@ class ChromeWebDriver:
 
     autoclose: bool = True
     options: Options = None
+    page_count: int = 0
+    response: Optional[dict] = None
+    single_load: bool = True
     status_code: int = 0
     text: str = ""
     title: str = ""
-    url: str
+    url: Optional[str]
     wait_time: int = 10
 
     _driver: Optional[webdriver.Chrome] = None
@@ -59,6 +85,7 @@ class ChromeWebDriver:
         disable_dev_shm_usage: bool = True,
         autoclose: bool = True,
         wait_time: int = 10,
+        single_load: bool = True,
     ):
         """
         Initializes a ChromeWebDriver instance.
@@ -70,6 +97,8 @@ class ChromeWebDriver:
             disable_dev_shm_usage (bool): Whether to disable the /dev/shm usage. Defaults to True.
             autoclose (bool): Whether to automatically close the ChromeWebDriver instance. Defaults to True.
             wait_time (int): The maximum time to wait for the page to load, in seconds. Defaults to 1.
+            single_load (bool): Whether to load each URL once and read the status code from the
+                performance log instead of issuing an extra HTTP request and a refresh. Defaults to True.
         """
         self.url = url  # URL to fetch
         self.options = Options()
@@ -79,18 +108,22 @@ class ChromeWebDriver:
             self.options.add_argument("--no-sandbox")
         if disable_dev_shm_usage:
             self.options.add_argument("--disable-dev-shm-usage")
+        self.options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
         self.autoclose = autoclose
         self.wait_time = wait_time
+        self.single_load = single_load
 
         self._driver = None
         self.text = ""
         self.title = ""
         self.status_code = 0
+        self.response = None
+        self.page_count = 0
         if url is not None:
             self.get(url)
 
     @property
-    def driver(self):
+    def driver(self) -> webdriver.Chrome:
         """
         Property that returns the ChromeWebDriver instance.
 
@@ -123,15 +156,24 @@ class ChromeWebDriver:
         """
         self.url = url  # set the URL to fetch
         wait_time = wait_time or self.wait_time
+        self.page_count += 1
+        self.status_code = 0  # don't leak the previous page of a reused session
+        self.response = None
+        self.text = ""
+        self.title = ""
+        metrics = get_metrics()
         try:
-            self._get(
-                url,
-                wait_time,
-                locator=locator,
-            )
+            with metrics.timer("selenium_get"):
+                self._get(
+                    url,
+                    wait_time,
+                    locator=locator,
+                )
+            metrics.inc("selenium_chars", len(self.text))
         except Exception as e:
             logger.error("Error while fetching the url: %s", url)
             logger.error(e)
+            metrics.inc("selenium_errors")
             self.close()
         return self
 
@@ -140,20 +182,73 @@ class ChromeWebDriver:
         url: str,
         wait_time: int = 10,
         locator: Optional[Tuple[str, str]] = None,
-    ):
-        self.status_code = requests.get(url).status_code  # get the HTTP status code
-        self.driver.get(url)  # get the requested URL
-        self.driver.refresh()
-        if wait_time > 0 and locator is not None:
-            WebDriverWait(self.driver, wait_time).until(
-                EC.presence_of_element_located(locator)
-            )
+    ) -> None:
+        if self.single_load:
+            self._get_once(url, wait_time, locator=locator)
+        else:
+            self.status_code = requests.get(url).status_code  # get the HTTP status code
+            self.driver.get(url)  # get the requested URL
+            self.driver.refresh()
+            if wait_time > 0 and locator is not None:
+                WebDriverWait(self.driver, wait_time).until(
+                    EC.presence_of_element_located(locator)
+                )
         self.title = self.driver.title
         self.text = self.driver.page_source
         if self.autoclose:
             self.close()
 
-    def close(self):
+    def _get_once(
+        self,
+        url: str,
+        wait_time: int = 10,
+        locator: Optional[Tuple[str, str]] = None,
+    ) -> None:
+        self.driver.get_log("performance")  # drop entries left by earlier pages
+        self.driver.get(url)  # get the requested URL
+        self.response = self._response_from_performance_log(
+            self.driver.get_log("performance")
+        )
+        if self.response is not None:
+            self.status_code = int(self.response.get("status", 0))
+        if wait_time > 0 and locator is not None:
+            try:
+                WebDriverWait(self.driver, wait_time).until(
+                    EC.presence_of_element_located(locator)
+                )
+            except TimeoutException:
+                # Refresh only when the element did not show up in time
+                logger.info("Timed out waiting for %s, refreshing...", url)
+                self.driver.refresh()
+                WebDriverWait(self.driver, wait_time).until(
+                    EC.presence_of_element_located(locator)
+                )
+
+    @staticmethod
+    def _response_from_performance_log(entries: List[dict]) -> Optional[dict]:
+        """
+        Extracts the main document response from ChromeDriver performance log entries.
+
+        Args:
+            entries (List[dict]): Entries returned by `driver.get_log("performance")`.
+
+        Returns:
+            Optional[dict]: The response of the main document, or None if there is none.
+        """
+        for entry in entries:
+            try:
+                message = json.loads(entry["message"])["message"]
+            except (KeyError, TypeError, ValueError):
+                continue
+            if message.get("method") != "Network.responseReceived":
+                continue
+            params = message.get("params", {})
+            # The top-level document arrives before those of any subframes
+            if params.get("type") == "Document":
+                return params.get("response")
+        return None
+
+    def close(self) -> None:
         """
         Closes the ChromeWebDriver instance.
 
@@ -161,4 +256,193 @@ class ChromeWebDriver:
         and quitting the driver, releasing all associated resources.
         """
         if self._driver is not None:
-            self._driver.close()
+            try:
+                self._driver.quit()
+            except Exception as e:
+                logger.debug("Error while closing the driver: %s", e)
+            self._driver = None
+
+    def is_alive(self) -> bool:
+        """
+        Checks whether the browser session is still usable.
+
+        Returns:
+            bool: True if the session responds to a trivial script, False otherwise.
+        """
+        if self._driver is None or self._driver.session_id is None:
+            return False
+        try:
+            self._driver.execute_script("return 1")
+        except Exception:
+            return False
+        return True
+
+
+class ChromeWebDriverPool:
+    """
+    Pool of warm, reusable ChromeWebDriver sessions.
+
+    Sessions are started lazily (or eagerly with `prewarm`), handed out with
+    `acquire`/`release` or the `session` context manager, health-checked before
+    reuse and recycled after `max_pages` page loads. The pool belongs to the
+    process that created it and is shut down when that process exits.
+    """
+
+    def __init__(
+        self,
+        size: int = 1,
+        max_pages: Optional[int] = 100,
+        prewarm: bool = False,
+        driver_factory: Optional[Callable[[], ChromeWebDriver]] = None,
+        **driver_kwargs: "Unpack[DriverOptions]",
+    ):
+        """
+        Initializes a ChromeWebDriverPool instance.
+
+        Args:
+            size (int): Maximum number of concurrent browser sessions. Defaults to 1.
+            max_pages (Optional[int]): Recycle a session after this many page loads. Defaults to 100.
+            prewarm (bool): Whether to start all sessions immediately. Defaults to False.
+            driver_factory (Optional[Callable]): Factory for new sessions. Defaults to ChromeWebDriver.
+            **driver_kwargs: Keyword arguments passed to ChromeWebDriver.
+        """
+        self.size = max(size, 1)
+        self.max_pages = max_pages
+        self.pid = os.getpid()
+        driver_kwargs["autoclose"] = False
+        self._driver_factory = driver_factory or (
+            lambda: ChromeWebDriver(**driver_kwargs)
+        )
+        self._idle: "queue.LifoQueue[ChromeWebDriver]" = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._num_sessions = 0
+        self._closed = False
+        self._finalizer = Finalize(self, self.close, exitpriority=10)
+        if prewarm:
+            self.prewarm()
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    @property
+    def num_sessions(self) -> int:
+        return self._num_sessions
+
+    def prewarm(self) -> None:
+        """Starts browser sessions until the pool is full."""
+        drivers = [self.acquire() for _ in range(self.size - self._num_sessions)]
+        for driver in drivers:
+            _ = driver.driver  # start the browser
+            self.release(driver)
+
+    def acquire(self, timeout: Optional[float] = None) -> ChromeWebDriver:
+        """
+        Takes a healthy session from the pool, starting a new one if the pool is not full.
+
+        Args:
+            timeout (Optional[float]): Seconds to wait for a free session. Defaults to None (wait forever).
+
+        Returns:
+            ChromeWebDriver: A session reserved for the caller until it is released.
+        """
+        if self._closed:
+            raise RuntimeError("ChromeWebDriverPool is closed")
+        while True:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                with self._lock:
+                    if self._num_sessions < self.size:
+                        self._num_sessions += 1
+                        try:
+                            return self._driver_factory()
+                        except Exception:
+                            # The session was never started, so free its slot
+                            self._num_sessions -= 1
+                            raise
+                driver = self._idle.get(timeout=timeout)
+            if driver.page_count == 0 or driver.is_alive():
+                return driver
+            logger.info("Discarding unhealthy browser session")
+            self._discard(driver)
+
+    def release(self, driver: ChromeWebDriver) -> None:
+        """
+        Returns a session to the pool, recycling it if it is worn out or unhealthy.
+
+        Args:
+            driver (ChromeWebDriver): The session obtained from `acquire`.
+        """
+        if self._closed:
+            self._discard(driver)
+        elif self.max_pages and driver.page_count >= self.max_pages:
+            logger.info("Recycling browser session after %s pages", driver.page_count)
+            self._discard(driver)
+        elif driver.page_count > 0 and not driver.is_alive():
+            logger.info("Discarding unhealthy browser session")
+            self._discard(driver)
+        else:
+            self._idle.put(driver)
+
+    @contextmanager
+    def session(self, timeout: Optional[float] = None) -> Iterator[ChromeWebDriver]:
+        """Context manager that acquires a session and releases it on exit."""
+        driver = self.acquire(timeout=timeout)
+        try:
+            yield driver
+        finally:
+            self.release(driver)
+
+    def close(self) -> None:
+        """Quits every idle session. Sessions in use are quit when released."""
+        if self._closed or self.pid != os.getpid():
+            return
+        self._closed = True
+        while True:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(driver)
+
+    def _discard(self, driver: ChromeWebDriver) -> None:
+        driver.close()
+        with self._lock:
+            self._num_sessions -= 1
+
+    def __enter__(self) -> "ChromeWebDriverPool":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+
+_webdriver_pool: Optional[ChromeWebDriverPool] = None
+
+
+def get_webdriver_pool(
+    size: int = 1,
+    max_pages: Optional[int] = 100,
+    **driver_kwargs: "Unpack[DriverOptions]",
+) -> ChromeWebDriverPool:
+    """
+    Returns the ChromeWebDriverPool of the current process, creating it on first use.
+
+    A pool inherited from a parent process through fork is never reused,
+    because its browser sessions belong to the parent.
+    """
+    global _webdriver_pool
+    pool = _webdriver_pool
+    if pool is None or pool.closed or pool.pid != os.getpid():
+        pool = ChromeWebDriverPool(size=size, max_pages=max_pages, **driver_kwargs)
+        _webdriver_pool = pool
+    return pool
+
+
+def close_webdriver_pool() -> None:
+    """Shuts down the ChromeWebDriverPool of the current process, if any."""
+    global _webdriver_pool
+    if _webdriver_pool is not None:
+        _webdriver_pool.close()
+        _webdriver_pool = None
@@ -0,0 +1,140 @@
+"""Content fingerprints for deduplication and change detection"""
+import hashlib
+import json
+import logging
+import re
+import unicodedata
+from datetime import datetime
+from functools import partial
+from typing import Dict, Iterator, List, Optional
+
+from .writer import read_jsonl
+
+logger = logging.getLogger(__name__)
+
+FINGERPRINT_FIELDS = ("sha256", "text_sha256")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Normalizes text for fingerprinting: NFKC, case-folded, with whitespace collapsed."""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFKC", text).casefold()).strip()
+
+
+def text_hash(text: str) -> str:
+    """SHA-256 of the normalized text, so texts that differ only in layout hash alike."""
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+def file_hash(filepath: str, chunk_size: int = 1 << 20) -> str:
+    """SHA-256 of the bytes of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        for chunk in iter(partial(f.read, chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ContentIndex:
+    """
+    Content fingerprints of the PDFs of the saved articles, by PDF url.
+
+    The record of a PDF url holds the article that links to it
+    (`article_url`), other article urls that link to the same PDF
+    (`aliases`), the SHA-256 of its bytes (`sha256`) and of its normalized
+    text (`text_sha256`), and `canonical_url`: the first PDF url seen with
+    the same bytes or text, or the url itself. Updates are buffered and
+    appended to a JSONL file by `flush`, once per batch of articles or
+    downloads; the last record of a url wins. Only the fields needed for
+    lookups are held in memory, not the update times.
+    """
+
+    def __init__(self, filepath: str):
+        self.filepath = filepath
+        self._records: Optional[Dict[str, dict]] = None
+        self._pending: Dict[str, dict] = {}
+        # "{field}:{hash}" -> url of the first PDF with that content
+        self._owners: Dict[str, str] = {}
+
+    @property
+    def records(self) -> Dict[str, dict]:
+        if self._records is None:
+            self._records = {}
+            for record in read_jsonl(self.filepath):
+                record.pop("updated_at", None)
+                self._records[record["url"]] = record
+            for url, record in self._records.items():
+                if record.get("canonical_url", url) == url:
+                    for key in self._keys(record):
+                        self._owners.setdefault(key, url)
+        return self._records
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def get(self, url: str) -> dict:
+        return self.records.get(url, {})
+
+    @property
+    def aliases(self) -> Iterator[str]:
+        """Article urls that were collapsed onto the article of the same PDF."""
+        for record in self.records.values():
+            yield from record.get("aliases", [])
+
+    def canonical_url(self, url: str) -> str:
+        return self.get(url).get("canonical_url", url)
+
+    def update(self, url: str, **fields: object) -> dict:
+        """
+        Updates the record of a PDF url, and finds its canonical url again.
+
+        Returns:
+            dict: The record.
+        """
+        previous = self.get(url)
+        record = {**previous, **fields, "url": url}
+        for field in FINGERPRINT_FIELDS:
+            old = previous.get(field)
+            if (
+                old
+                and old != record.get(field)
+                and self._owners.get(f"{field}:{old}") == url
+            ):
+                # The content at this url changed, it no longer owns the old one
+                del self._owners[f"{field}:{old}"]
+        keys = self._keys(record)
+        canonical = next(
+            (self._owners[key] for key in keys if self._owners.get(key, url) != url),
+            url,
+        )
+        if canonical == url:
+            for key in keys:
+                self._owners.setdefault(key, url)
+        record["canonical_url"] = canonical
+        if record == previous:
+            return previous
+        self.records[url] = self._pending[url] = record
+        return record
+
+    def flush(self) -> None:
+        """Appends the records updated since the last flush."""
+        if not self._pending:
+            return
+        updated_at = datetime.now().isoformat(timespec="seconds")
+        with open(self.filepath, "a", encoding="utf-8") as f:
+            f.write(
+                "".join(
+                    json.dumps({**record, "updated_at": updated_at}, ensure_ascii=False)
+                    + "\n"
+                    for record in self._pending.values()
+                )
+            )
+        self._pending = {}
+
+    @staticmethod
+    def _keys(record: dict) -> List[str]:
+        return [
+            f"{field}:{record[field]}"
+            for field in FINGERPRINT_FIELDS
+            if record.get(field)
+        ]
@@ -0,0 +1,173 @@
+"""Streaming, resumable file downloads"""
+import hashlib
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Mapping, Optional, Tuple
+from urllib.parse import urlparse
+
+from .content import file_hash
+
+logger = logging.getLogger(__name__)
+
+
+def url_to_filepath(url: str, output_dir: str) -> str:
+    """Maps a URL to a file under output_dir that mirrors the URL path.
+
+    e.g. https://www.bis.org/review/r231110a.pdf -> {output_dir}/review/r231110a.pdf
+    """
+    path = urlparse(url).path.lstrip("/") or "index"
+    return str(Path(output_dir) / path)
+
+
+def download_file(
+    request_func: Callable,
+    url: str,
+    filepath: str,
+    previous: Optional[dict] = None,
+    chunk_size: int = 1 << 16,
+) -> dict:
+    """
+    Downloads a file in chunks, resuming a partial download if there is one.
+
+    The file is written to `{filepath}.part` and renamed when complete, so a
+    file at `filepath` is always whole. If the file exists and its ETag, or
+    failing that its Last-Modified date and size, match the previous
+    download, nothing is fetched. The SHA-256 of the content is computed as
+    it is written; if it matches the previous download, the file in place is
+    kept as it is, so its text is not extracted again.
+
+    Args:
+        request_func (Callable): Function called as `request_func(method, url, **kwargs)`
+            that returns a requests.Response.
+        url (str): URL of the file.
+        filepath (str): Where to save the file.
+        previous (Optional[dict]): Manifest record of the previous download. Defaults to None.
+        chunk_size (int): Bytes read and written at a time. Defaults to 64 KiB.
+
+    Returns:
+        dict: Manifest record with the status, byte counts, content hash and timing of the download.
+    """
+    start = time.perf_counter()
+    record: dict = {"url": url, "path": filepath, "bytes": 0}
+    previous = previous or {}
+    try:
+        if os.path.exists(filepath) and previous:
+            head = request_func("HEAD", url, allow_redirects=True)
+            if head.ok and _is_unchanged(head.headers, previous, filepath):
+                record.update(
+                    status="unchanged",
+                    http_status=head.status_code,
+                    size=os.path.getsize(filepath),
+                    etag=previous.get("etag"),
+                    last_modified=previous.get("last_modified"),
+                    sha256=previous.get("sha256") or file_hash(filepath),
+                )
+                return record
+
+        part = f"{filepath}.part"
+        Path(filepath).parent.mkdir(parents=True, exist_ok=True)
+        offset = os.path.getsize(part) if os.path.exists(part) else 0
+        headers = {}
+        if offset:
+            headers["Range"] = f"bytes={offset}-"
+            if previous.get("etag"):
+                headers["If-Range"] = previous["etag"]
+        response = request_func("GET", url, stream=True, headers=headers)
+        with response:
+            if response.status_code == 206 and offset:
+                mode, status = "ab", "resumed"
+            elif response.ok:
+                mode, status, offset = "wb", "downloaded", 0
+            else:
+                if response.status_code == 416:
+                    # The partial file is unusable, start over next time
+                    os.remove(part)
+                record.update(status="failed", http_status=response.status_code)
+                return record
+            # Keep the validators of a resumed file, the response of a Range request may omit them
+            record.update(
+                etag=response.headers.get("ETag") or previous.get("etag"),
+                last_modified=response.headers.get("Last-Modified")
+                or previous.get("last_modified"),
+                http_status=response.status_code,
+            )
+            digest = hashlib.sha256()
+            if mode == "ab":
+                with open(part, "rb") as f:
+                    for chunk in iter(lambda: f.read(chunk_size), b""):
+                        digest.update(chunk)
+            with open(part, mode) as f:
+                for chunk in response.iter_content(chunk_size=chunk_size):
+                    f.write(chunk)
+                    digest.update(chunk)
+                    record["bytes"] += len(chunk)
+        record.update(sha256=digest.hexdigest(), size=offset + record["bytes"])
+        if record["sha256"] == previous.get("sha256") and os.path.exists(filepath):
+            # New validators, same content: keep the file and its mtime
+            os.remove(part)
+            status = "unchanged"
+        else:
+            os.replace(part, filepath)
+        record["status"] = status
+    except Exception as e:
+        logger.error("Error while downloading %s: %s", url, e)
+        record.update(status="failed", error=str(e))
+    finally:
+        record["elapsed"] = round(time.perf_counter() - start, 6)
+    return record
+
+
+def _is_unchanged(headers: Mapping[str, str], previous: dict, filepath: str) -> bool:
+    etag = headers.get("ETag")
+    if etag and previous.get("etag"):
+        return etag == previous["etag"]
+    last_modified = headers.get("Last-Modified")
+    if last_modified and previous.get("last_modified"):
+        if last_modified != previous["last_modified"]:
+            return False
+    size = headers.get("Content-Length")
+    return (
+        size is not None
+        and int(size) == previous.get("size")
+        and int(size) == os.path.getsize(filepath)
+    )
+
+
+def download_files(
+    request_func: Callable,
+    jobs: List[Tuple[str, str]],
+    previous: Optional[Dict[str, dict]] = None,
+    num_workers: int = 4,
+    chunk_size: int = 1 << 16,
+) -> Iterator[dict]:
+    """
+    Downloads files in a bounded thread pool, yielding manifest records as they finish.
+
+    Args:
+        request_func (Callable): See `download_file`.
+        jobs (List[Tuple[str, str]]): (url, filepath) pairs to download.
+        previous (Optional[Dict[str, dict]]): Previous manifest records by URL. Defaults to None.
+        num_workers (int): Number of concurrent downloads. Defaults to 4.
+        chunk_size (int): Bytes read and written at a time. Defaults to 64 KiB.
+
+    Yields:
+        dict: Manifest record of each download.
+    """
+    previous = previous or {}
+    with ThreadPoolExecutor(max_workers=max(num_workers, 1)) as executor:
+        futures = [
+            executor.submit(
+                download_file,
+                request_func,
+                url,
+                filepath,
+                previous.get(url),
+                chunk_size,
+            )
+            for url, filepath in jobs
+        ]
+        for future in as_completed(futures):
+            yield future.result()
@@ -0,0 +1,228 @@
+"""Parallel PDF text extraction"""
+import hashlib
+import json
+import logging
+import mmap
+import multiprocessing as mp
+import os
+from typing import BinaryIO, Callable, Dict, Iterable, List, Optional, Set, Tuple, cast
+
+from .content import text_hash
+
+logger = logging.getLogger(__name__)
+
+_known_hashes: Set[str] = set()
+
+
+def extract_pdf_text(filepath: str, per_page: bool = False) -> List[dict]:
+    """
+    Extracts the text of a PDF file.
+
+    The file is memory-mapped rather than read into memory, and its SHA-256 is
+    computed from the same mapping. `text_sha256` is the SHA-256 of the
+    normalized text of the whole file, see `text_hash`.
+
+    Args:
+        filepath (str): Path of the PDF file.
+        per_page (bool): Whether to return one record per page instead of one per file. Defaults to False.
+
+    Returns:
+        List[dict]: Records with the path, size, mtime, content hashes and extracted text.
+    """
+    from pypdf import PdfReader
+
+    stat = os.stat(filepath)
+    with open(filepath, "rb") as f, mmap.mmap(
+        f.fileno(), 0, access=mmap.ACCESS_READ
+    ) as mm:
+        sha256 = hashlib.sha256(mm).hexdigest()
+        if sha256 in _known_hashes:
+            return [_file_record(filepath, stat, sha256, skipped=True)]
+        # The mmap serves the file API PdfReader reads through
+        reader = PdfReader(cast(BinaryIO, mm))
+        pages = [page.extract_text() or "" for page in reader.pages]
+    text = "\n".join(pages)
+    record = _file_record(
+        filepath, stat, sha256, num_pages=len(pages), text_sha256=text_hash(text)
+    )
+    if not per_page or not pages:
+        record["text"] = text
+        return [record]
+    return [dict(record, page=page_no, text=text) for page_no, text in enumerate(pages)]
+
+
+def _file_record(
+    filepath: str, stat: os.stat_result, sha256: str, **kwargs: object
+) -> dict:
+    return {
+        "path": filepath,
+        "size": stat.st_size,
+        "mtime": stat.st_mtime,
+        "sha256": sha256,
+        **kwargs,
+    }
+
+
+def _extract_one(job: Tuple[str, bool]) -> List[dict]:
+    filepath, per_page = job
+    try:
+        return extract_pdf_text(filepath, per_page=per_page)
+    except Exception as e:
+        logger.error("Error while extracting text from %s: %s", filepath, e)
+        return [{"path": filepath, "error": str(e)}]
+
+
+def _init_worker(known_hashes: Set[str]) -> None:
+    global _known_hashes
+    _known_hashes = known_hashes
+
+
+def load_extracted(
+    text_filepath: str,
+) -> Tuple[Set[str], Dict[str, tuple], Dict[str, str]]:
+    """
+    Reads an extraction output file.
+
+    Returns:
+        Tuple[Set[str], Dict[str, tuple], Dict[str, str]]: The content hashes that
+        already have text, the (size, mtime, sha256) of every extracted path, and
+        the first path extracted with each text hash.
+    """
+    hashes: Set[str] = set()
+    files: Dict[str, tuple] = {}
+    texts: Dict[str, str] = {}
+    if not os.path.exists(text_filepath):
+        return hashes, files, texts
+    with open(text_filepath, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # a partial line left by an interrupted run
+            if "sha256" not in record:
+                continue
+            hashes.add(record["sha256"])
+            files[record["path"]] = (record["size"], record["mtime"], record["sha256"])
+            if record.get("text_sha256") and "duplicate_of" not in record:
+                texts.setdefault(record["text_sha256"], record["path"])
+    return hashes, files, texts
+
+
+def extract_pdf_texts(
+    filepaths: Iterable[str],
+    text_filepath: str,
+    num_workers: Optional[int] = None,
+    per_page: bool = False,
+    urls: Optional[Dict[str, str]] = None,
+    hashes: Optional[Dict[str, str]] = None,
+    callback: Optional[Callable[[dict], None]] = None,
+    print_every: int = 10,
+    verbose: bool = False,
+) -> Dict[str, int]:
+    """Extract the text of PDF files in a process pool and append it to a JSONL file.
+
+    Files whose path, size and mtime match an earlier extraction are not
+    opened at all; other files are hashed and skipped if their content was
+    already extracted. Files whose hash is given in `hashes` are skipped
+    without being opened if their content was extracted before or is queued
+    under another path. A file whose normalized text matches an earlier one
+    gets a single record with `duplicate_of` instead of its text. Records
+    are written as soon as each file is done.
+
+    Args:
+        filepaths (Iterable[str]): PDF files to extract.
+        text_filepath (str): JSONL file to append the records to.
+        num_workers (Optional[int], optional): Number of processes. Defaults to the number of CPUs.
+        per_page (bool, optional): Write one record per page. Defaults to False.
+        urls (Optional[Dict[str, str]], optional): Source URL of each file, added to its records. Defaults to None.
+        hashes (Optional[Dict[str, str]], optional): SHA-256 of the files already known, e.g. from downloading them. Defaults to None.
+        callback (Optional[Callable[[dict], None]], optional): Called with the first record of each extracted file. Defaults to None.
+        print_every (int, optional): Print progress every n files. Defaults to 10.
+        verbose (bool, optional): Print progress. Defaults to False.
+
+    Returns:
+        Dict[str, int]: Number of files extracted, skipped and failed.
+    """
+    known_hashes, extracted_files, known_texts = load_extracted(text_filepath)
+    urls = urls or {}
+    hashes = hashes or {}
+    jobs = []
+    # Files skipped by their known hash, recorded so later runs skip them by size and mtime
+    skipped = []
+    queued_hashes = set()
+    counts = {"extracted": 0, "skipped": 0, "failed": 0}
+    for filepath in filepaths:
+        stat = os.stat(filepath)
+        previous = extracted_files.get(filepath)
+        if previous and previous[:2] == (stat.st_size, stat.st_mtime):
+            counts["skipped"] += 1
+            continue
+        sha256 = hashes.get(filepath)
+        if sha256 and (sha256 in known_hashes or sha256 in queued_hashes):
+            skipped.append([_file_record(filepath, stat, sha256, skipped=True)])
+            continue
+        if sha256:
+            queued_hashes.add(sha256)
+        jobs.append((filepath, per_page))
+    counts["skipped"] += len(skipped)
+    logger.info(
+        "Extracting text from %s PDFs, %s unchanged or duplicate",
+        len(jobs),
+        counts["skipped"],
+    )
+    if not jobs and not skipped:
+        return counts
+
+    num_duplicates = 0
+
+    def _write(records: List[dict]) -> None:
+        nonlocal num_duplicates
+        first = records[0]
+        path = first["path"]
+        if text_sha256 := first.get("text_sha256"):
+            canonical = known_texts.setdefault(text_sha256, path)
+            if canonical != path:
+                # Same text as another file: keep one file-level record without the text
+                records = [
+                    {
+                        **{k: v for k, v in first.items() if k not in ("page", "text")},
+                        "duplicate_of": canonical,
+                    }
+                ]
+                num_duplicates += 1
+        for record in records:
+            if path in urls:
+                record["url"] = urls[path]
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+        out.flush()
+        if callback is not None and not first.get("skipped"):
+            callback(records[0])
+
+    with open(text_filepath, "a", encoding="utf-8") as out:
+        for records in skipped:
+            _write(records)
+        if jobs:
+            num_workers = max(1, min(num_workers or os.cpu_count() or 1, len(jobs)))
+            with mp.Pool(
+                num_workers, initializer=_init_worker, initargs=(known_hashes,)
+            ) as pool:
+                # In order, so the first of the files with the same text is the one kept
+                for i, records in enumerate(pool.imap(_extract_one, jobs)):
+                    first = records[0]
+                    if "error" in first:
+                        counts["failed"] += 1
+                        continue
+                    counts["skipped" if first.get("skipped") else "extracted"] += 1
+                    _write(records)
+                    if verbose and (i + 1) % print_every == 0:
+                        logger.info("Processed %s/%s PDFs", i + 1, len(jobs))
+                pool.close()
+                pool.join()
+    logger.info(
+        "Extracted %s PDFs (%s with the text of another), skipped %s, failed %s",
+        counts["extracted"],
+        num_duplicates,
+        counts["skipped"],
+        counts["failed"],
+    )
+    return counts
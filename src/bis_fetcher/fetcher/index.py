@@ -0,0 +1,141 @@
+"""Compact URL indexes for deduplication"""
+import hashlib
+import math
+from typing import Dict, Iterable, Optional
+
+
+def url_hash(url: str) -> int:
+    """Returns a 64-bit hash of a URL that is stable across processes and runs."""
+    return int.from_bytes(hashlib.blake2b(url.encode(), digest_size=8).digest(), "big")
+
+
+class BloomFilter:
+    """
+    Bloom filter over 64-bit hashes.
+
+    Membership tests can return false positives at about `error_rate` once
+    `capacity` items were added, but never false negatives.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        capacity = max(capacity, 1)
+        self.num_bits = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self._bits = bytearray((self.num_bits + 7) // 8)
+
+    def _positions(self, value: int) -> Iterable[int]:
+        # Double hashing: derive k bit positions from the two halves of the hash
+        h1, h2 = value & 0xFFFFFFFF, (value >> 32) | 1
+        return ((h1 + i * h2) % self.num_bits for i in range(self.num_hashes))
+
+    def add(self, value: int) -> None:
+        for pos in self._positions(value):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, value: int) -> bool:
+        return all(
+            self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(value)
+        )
+
+
+class UrlIndex:
+    """
+    Set of URLs stored as 64-bit hashes, optionally in a Bloom filter.
+
+    A hashed set gives exact O(1) lookups at a fraction of the memory of the
+    URL strings. With `bloom_capacity` the index is a Bloom filter instead,
+    which is smaller still but may report an unseen URL as known with
+    probability `error_rate`.
+    """
+
+    def __init__(
+        self,
+        urls: Iterable[str] = (),
+        bloom_capacity: Optional[int] = None,
+        error_rate: float = 0.001,
+    ):
+        self._bloom = (
+            BloomFilter(bloom_capacity, error_rate) if bloom_capacity else None
+        )
+        self._hashes: set = set()
+        self._len = 0
+        for url in urls:
+            self.add(url)
+
+    @classmethod
+    def build(
+        cls,
+        urls: Iterable[str],
+        bloom_threshold: Optional[int] = None,
+        error_rate: float = 0.001,
+        size_hint: Optional[int] = None,
+    ) -> "UrlIndex":
+        """
+        Builds an index, switching to a Bloom filter above `bloom_threshold` URLs.
+
+        URLs are hashed as they are read, so the strings are never held.
+        With `size_hint`, e.g. the number of stored records, a Bloom filter
+        is filled directly; otherwise the hashes are collected and moved to
+        a filter once all were read. The filter is sized for twice the
+        number of URLs so it keeps its error rate while the index grows
+        during a run.
+        """
+        if bloom_threshold is not None and size_hint and size_hint > bloom_threshold:
+            index = cls(bloom_capacity=2 * size_hint, error_rate=error_rate)
+            for url in urls:
+                index.add(url)
+            return index
+        index = cls(urls)
+        if bloom_threshold is None or len(index) <= bloom_threshold:
+            return index
+        bloom_index = cls(bloom_capacity=2 * len(index), error_rate=error_rate)
+        for value in index._hashes:
+            bloom_index.add_hash(value)
+        return bloom_index
+
+    @property
+    def is_bloom(self) -> bool:
+        return self._bloom is not None
+
+    def add(self, url: str) -> None:
+        self.add_hash(url_hash(url))
+
+    def add_hash(self, value: int) -> None:
+        """Adds a URL by its `url_hash`."""
+        if self._bloom is not None:
+            if value not in self._bloom:
+                self._bloom.add(value)
+                self._len += 1
+        elif value not in self._hashes:
+            self._hashes.add(value)
+            self._len += 1
+
+    def __contains__(self, url: str) -> bool:
+        value = url_hash(url)
+        if self._bloom is not None:
+            return value in self._bloom
+        return value in self._hashes
+
+    def __len__(self) -> int:
+        return self._len
+
+
+_shared_indexes: Dict[str, UrlIndex] = {}
+
+
+def init_shared_indexes(indexes: Dict[str, UrlIndex]) -> None:
+    """
+    Installs indexes for the current process.
+
+    Used as a multiprocessing.Pool initializer so each worker receives the
+    indexes once when it starts, instead of with every task.
+    """
+    _shared_indexes.clear()
+    _shared_indexes.update(indexes)
+
+
+def get_shared_index(name: str) -> UrlIndex:
+    """Returns the index installed under `name`, or a new empty one."""
+    if name not in _shared_indexes:
+        _shared_indexes[name] = UrlIndex()
+    return _shared_indexes[name]
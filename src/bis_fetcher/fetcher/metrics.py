@@ -0,0 +1,280 @@
+"""Run metrics: stage latencies, counters and gauges"""
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds, in seconds, of the latency histogram buckets
+LATENCY_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+METRICS_FORMATS = ("json", "prometheus")
+PROFILERS = ("cprofile", "pyinstrument")
+
+
+class Metrics:
+    """
+    Metrics of one process: latency histograms by stage, counters and gauges.
+
+    Updates take a lock, so threads can share the registry. Processes each
+    have their own; a worker sends `snapshot()` to the parent, which adds it
+    to its own with `merge`.
+    """
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.id = uuid.uuid4().hex
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.counters: Dict[str, float] = {}
+            self.gauges: Dict[str, Dict[str, float]] = {}
+            self.histograms: Dict[str, Dict] = {}
+
+    def inc(self, name: str, value: float = 1) -> None:
+        """Adds `value` to a counter."""
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def set_gauge(self, name: str, value: float) -> None:
+        """Sets a gauge, keeping the highest value seen."""
+        with self._lock:
+            gauge = self.gauges.setdefault(name, {"last": value, "max": value})
+            gauge["last"] = value
+            gauge["max"] = max(gauge["max"], value)
+
+    def observe(self, stage: str, seconds: float) -> None:
+        """Records the latency of one call of a stage."""
+        with self._lock:
+            histogram = self.histograms.get(stage)
+            if histogram is None:
+                histogram = self.histograms[stage] = {
+                    "counts": [0] * (len(self.buckets) + 1),
+                    "count": 0,
+                    "sum": 0.0,
+                }
+            histogram["counts"][bisect.bisect_left(self.buckets, seconds)] += 1
+            histogram["count"] += 1
+            histogram["sum"] += seconds
+
+    @contextmanager
+    def timer(self, stage: str) -> Iterator[None]:
+        """Times the block as one call of `stage`, even if it raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return json.loads(
+                json.dumps(
+                    {
+                        "id": self.id,
+                        "counters": self.counters,
+                        "gauges": self.gauges,
+                        "histograms": self.histograms,
+                    }
+                )
+            )
+
+    def merge(self, snapshots: Iterable[dict]) -> None:
+        """Adds the snapshots of other processes, keeping the last one of each."""
+        latest = {snapshot["id"]: snapshot for snapshot in snapshots}
+        with self._lock:
+            for snapshot in latest.values():
+                for name, value in snapshot["counters"].items():
+                    self.counters[name] = self.counters.get(name, 0) + value
+                for name, other in snapshot["gauges"].items():
+                    gauge = self.gauges.setdefault(name, dict(other))
+                    gauge["last"] = max(gauge["last"], other["last"])
+                    gauge["max"] = max(gauge["max"], other["max"])
+                for stage, other in snapshot["histograms"].items():
+                    histogram = self.histograms.setdefault(
+                        stage,
+                        {"counts": [0] * len(other["counts"]), "count": 0, "sum": 0.0},
+                    )
+                    histogram["counts"] = [
+                        a + b for a, b in zip(histogram["counts"], other["counts"])
+                    ]
+                    histogram["count"] += other["count"]
+                    histogram["sum"] += other["sum"]
+
+    def quantile(self, stage: str, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the `q` quantile of a stage's latency."""
+        histogram = self.histograms.get(stage)
+        if not histogram or not histogram["count"]:
+            return None
+        rank = q * histogram["count"]
+        seen = 0
+        for bound, count in zip(self.buckets + (float("inf"),), histogram["counts"]):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def summary(self) -> dict:
+        """Counters, gauges and per stage calls, total seconds and latency quantiles."""
+        stages = {}
+        for stage, histogram in sorted(self.histograms.items()):
+            count = histogram["count"]
+            stages[stage] = {
+                "count": count,
+                "seconds": histogram["sum"],
+                "mean": histogram["sum"] / count if count else 0.0,
+                "p50": self.quantile(stage, 0.5),
+                "p90": self.quantile(stage, 0.9),
+                "p99": self.quantile(stage, 0.99),
+                "buckets": dict(
+                    zip([str(b) for b in self.buckets] + ["+Inf"], histogram["counts"])
+                ),
+            }
+        return {
+            "counters": dict(sorted(self.counters.items())),
+            "gauges": dict(sorted(self.gauges.items())),
+            "stages": stages,
+        }
+
+    def to_prometheus(
+        self, prefix: str = "bis_fetcher", labels: Optional[dict] = None
+    ) -> str:
+        """Renders the metrics in the Prometheus text exposition format."""
+
+        def _labels(extra: Optional[dict] = None) -> str:
+            items = {**(labels or {}), **(extra or {})}
+            if not items:
+                return ""
+            return "{" + ",".join(f'{k}="{v}"' for k, v in items.items()) + "}"
+
+        lines: List[str] = []
+        for name, value in sorted(self.counters.items()):
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            lines.append(f"{prefix}_{name}_total{_labels()} {value}")
+        for name, gauge in sorted(self.gauges.items()):
+            lines.append(f"# TYPE {prefix}_{name} gauge")
+            lines.append(f"{prefix}_{name}{_labels()} {gauge['last']}")
+            lines.append(f"# TYPE {prefix}_{name}_max gauge")
+            lines.append(f"{prefix}_{name}_max{_labels()} {gauge['max']}")
+        if self.histograms:
+            name = f"{prefix}_stage_seconds"
+            lines.append(f"# TYPE {name} histogram")
+            for stage, histogram in sorted(self.histograms.items()):
+                cumulative = 0
+                for bound, count in zip(
+                    [str(b) for b in self.buckets] + ["+Inf"], histogram["counts"]
+                ):
+                    cumulative += count
+                    lines.append(
+                        f"{name}_bucket{_labels({'stage': stage, 'le': bound})} {cumulative}"
+                    )
+                lines.append(
+                    f"{name}_sum{_labels({'stage': stage})} {histogram['sum']}"
+                )
+                lines.append(
+                    f"{name}_count{_labels({'stage': stage})} {histogram['count']}"
+                )
+        return "\n".join(lines) + "\n"
+
+    def write(
+        self, filepath: str, format: str = "json", labels: Optional[dict] = None
+    ) -> None:
+        """Writes the metrics as a JSON summary or a Prometheus text file."""
+        if format not in METRICS_FORMATS:
+            raise ValueError(f"Unknown metrics format: {format}")
+        if format == "json":
+            text = json.dumps({**(labels or {}), **self.summary()}, indent=2)
+        else:
+            text = self.to_prometheus(labels=labels)
+        tmp_path = f"{filepath}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, filepath)
+
+
+_metrics: Optional[Metrics] = None
+_metrics_pid: Optional[int] = None
+
+
+def get_metrics() -> Metrics:
+    """
+    Returns the Metrics of the current process.
+
+    A registry inherited from a parent process through fork is never
+    reused, so a worker only reports its own work.
+    """
+    global _metrics, _metrics_pid
+    if _metrics is None or _metrics_pid != os.getpid():
+        _metrics = Metrics()
+        _metrics_pid = os.getpid()
+    return _metrics
+
+
+class Profiler:
+    """
+    Profiles a block of code with cProfile or, if installed, pyinstrument.
+
+    cProfile writes pstats data (`.prof`), pyinstrument an HTML report.
+    Only the current process is profiled, not pool workers.
+    """
+
+    def __init__(self, name: str, filepath: str):
+        if name not in PROFILERS:
+            raise ValueError(f"Unknown profiler: {name}")
+        self.name = name
+        self.filepath = filepath
+        self._profiler: Optional[Any] = None
+
+    def __enter__(self) -> "Profiler":
+        if self.name == "cprofile":
+            import cProfile
+
+            profiler = cProfile.Profile()
+            profiler.enable()
+            self._profiler = profiler
+        else:
+            try:
+                from pyinstrument import Profiler as _Pyinstrument
+            except ImportError as e:
+                raise ImportError(
+                    "The pyinstrument profiler needs pyinstrument, install it with `pip install pyinstrument`"
+                ) from e
+            self._profiler = _Pyinstrument()
+            self._profiler.start()
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        profiler, self._profiler = self._profiler, None
+        if profiler is None:
+            return
+        if self.name == "cprofile":
+            profiler.disable()
+            profiler.dump_stats(self.filepath)
+        else:
+            profiler.stop()
+            with open(self.filepath, "w", encoding="utf-8") as f:
+                f.write(profiler.output_html())
+        logger.info("Saved the profile to %s", self.filepath)
@@ -0,0 +1,209 @@
+"""HTML parsing of BIS listing and speech pages"""
+import logging
+import sys
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import soupsieve as sv
+from bs4 import BeautifulSoup, SoupStrainer
+from bs4.builder import builder_registry
+
+from .metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+# Parser backends: the bs4 tree builder, and whether to build only the parts of the page that are used
+PARSER_BACKENDS = {
+    "html.parser": ("html.parser", False),
+    "strainer": ("html.parser", True),
+    "lxml": ("lxml", False),
+    "lxml-strainer": ("lxml", True),
+}
+
+
+def available_backends() -> List[str]:
+    """Parser backends whose tree builder is installed."""
+    return [
+        name
+        for name, (features, _) in PARSER_BACKENDS.items()
+        if builder_registry.lookup(features) is not None
+    ]
+
+
+class PageParser:
+    """
+    Extracts speech links from listing pages and the PDF link from speech pages.
+
+    The strainers and CSS selectors are compiled once, when the parser is
+    created. With a strainer backend only the listing container, or the
+    `pdftxt` div of a speech page, is turned into a tree; the rest of the
+    page is tokenized and dropped.
+    """
+
+    def __init__(
+        self,
+        backend: str = "strainer",
+        container_name: str = "table",
+        container_attrs: Optional[dict] = None,
+        row_name: str = "tr",
+        row_attrs: Optional[dict] = None,
+        title_name: str = "div",
+        title_attrs: Optional[dict] = None,
+    ):
+        if backend not in PARSER_BACKENDS:
+            raise ValueError(f"Unknown parser backend: {backend}")
+        features, strain = PARSER_BACKENDS[backend]
+        if builder_registry.lookup(features) is None:
+            raise ValueError(
+                f"Parser backend {backend} needs {features}, which is not installed"
+            )
+        self._config = dict(
+            backend=backend,
+            container_name=container_name,
+            container_attrs=container_attrs or {},
+            row_name=row_name,
+            row_attrs=row_attrs or {},
+            title_name=title_name,
+            title_attrs=title_attrs or {},
+        )
+        self.backend = backend
+        self.features = features
+        self.container = (container_name, container_attrs or {})
+        self.row = (row_name, row_attrs or {})
+        self.title = (title_name, title_attrs or {})
+        self.listing_strainer = None
+        if strain:
+            self.listing_strainer = SoupStrainer(
+                container_name, attrs=container_attrs or {}
+            )
+        self.speech_strainer = SoupStrainer("div", class_="pdftxt") if strain else None
+        self.date_selector = sv.compile("td.item_date")
+        self.author_selector = sv.compile("a.authorlnk.dashed")
+        self.pdf_selector = sv.compile("div.pdftxt a.pdftitle_link[href]")
+
+    def __reduce__(self) -> Tuple[Callable[[dict], "PageParser"], Tuple[dict]]:
+        # Compiled selectors are rebuilt in the process that unpickles the parser
+        return (_make_parser, (self._config,))
+
+    def parse_listing(self, html: str) -> Optional[List[dict]]:
+        """
+        Extracts the rows of a listing page.
+
+        Returns:
+            Optional[List[dict]]: The title, href, timestamp and author of each row,
+            or None if the page has no listing container.
+        """
+        with get_metrics().timer("parse_listing"):
+            return self._parse_listing(html)
+
+    def _parse_listing(self, html: str) -> Optional[List[dict]]:
+        soup = BeautifulSoup(html, self.features, parse_only=self.listing_strainer)
+        section = soup.find(self.container[0], attrs=self.container[1])
+        if section is None:
+            return None
+        rows = []
+        for row_no, row in enumerate(section.find_all(self.row[0], attrs=self.row[1])):
+            title_div = row.find(self.title[0], attrs=self.title[1])
+            if title_div is None:
+                logger.info("No title found for article %s", row_no)
+                continue
+            date_ = self.date_selector.select_one(row)
+            author_ = self.author_selector.select_one(row)
+            rows.append(
+                {
+                    "title": title_div.text,
+                    "href": row.find("a")["href"],
+                    "timestamp": date_.text.strip() if date_ else "",
+                    "author": author_.text.strip() if author_ else "",
+                }
+            )
+        return rows
+
+    def parse_pdf_href(self, html: str) -> Optional[str]:
+        """Returns the href of the PDF link of a speech page, if any."""
+        with get_metrics().timer("parse_speech"):
+            soup = BeautifulSoup(html, self.features, parse_only=self.speech_strainer)
+            link = self.pdf_selector.select_one(soup)
+        return str(link["href"]) if link else None
+
+
+def _make_parser(config: dict) -> PageParser:
+    return PageParser(**config)
+
+
+def benchmark_parsers(
+    listing_pages: Sequence[str],
+    speech_pages: Sequence[str] = (),
+    backends: Optional[Sequence[str]] = None,
+    repeat: int = 5,
+) -> Dict[str, Dict[str, float]]:
+    """
+    Times the parser backends on saved pages.
+
+    Every backend must extract the same rows and PDF links as the first one.
+
+    Args:
+        listing_pages (Sequence[str]): HTML of listing pages.
+        speech_pages (Sequence[str]): HTML of speech pages. Defaults to ().
+        backends (Optional[Sequence[str]]): Backends to compare. Defaults to the installed ones.
+        repeat (int): Passes over the pages; the fastest one counts. Defaults to 5.
+
+    Returns:
+        Dict[str, Dict[str, float]]: Milliseconds per listing and per speech page, by backend.
+    """
+    results: Dict[str, Dict[str, float]] = {}
+    expected = None
+    for backend in backends or available_backends():
+        parser = PageParser(
+            backend,
+            container_attrs={"class": "documentList"},
+            title_attrs={"class": "title"},
+        )
+        output = (
+            [parser.parse_listing(html) for html in listing_pages],
+            [parser.parse_pdf_href(html) for html in speech_pages],
+        )
+        if expected is None:
+            expected = output
+        elif output != expected:
+            raise AssertionError(f"Parser backend {backend} extracts different data")
+        results[backend] = {
+            "listing_ms": _best_time(parser.parse_listing, listing_pages, repeat),
+            "speech_ms": _best_time(parser.parse_pdf_href, speech_pages, repeat),
+        }
+    return results
+
+
+def _best_time(
+    func: Callable[[str], object], pages: Sequence[str], repeat: int
+) -> float:
+    if not pages:
+        return 0.0
+    best = float("inf")
+    for _ in range(max(repeat, 1)):
+        start = time.perf_counter()
+        for html in pages:
+            func(html)
+        best = min(best, time.perf_counter() - start)
+    return best / len(pages) * 1000
+
+
+if __name__ == "__main__":
+    # python -m bis_fetcher.fetcher.parsing listing1.htm ... [--speech speech1.htm ...]
+    args = sys.argv[1:]
+    split = args.index("--speech") if "--speech" in args else len(args)
+
+    def _read(paths: List[str]) -> List[str]:
+        pages = []
+        for path in paths:
+            with open(path, encoding="utf-8") as f:
+                pages.append(f.read())
+        return pages
+
+    for name, timings in benchmark_parsers(
+        _read(args[:split]), _read(args[split + 1 :])
+    ).items():
+        print(
+            f"{name:15s} listing {timings['listing_ms']:8.3f} ms/page"
+            f"   speech {timings['speech_ms']:8.3f} ms/page"
+        )
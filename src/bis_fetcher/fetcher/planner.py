@@ -0,0 +1,150 @@
+"""Crawl planning: listing shards by date window, institution and author"""
+import logging
+from datetime import date, timedelta
+from typing import Iterable, List, NamedTuple, Optional, Tuple, Union
+from urllib.parse import urlencode
+
+logger = logging.getLogger(__name__)
+
+CRAWL_WINDOWS = ("year", "quarter", "month", "week")
+
+
+class CrawlShard(NamedTuple):
+    """Listing of the speeches of one date window, optionally of one institution or author."""
+
+    url: str
+    start: date
+    end: date
+    institution: Optional[str] = None
+    author: Optional[str] = None
+
+
+def parse_date(value: Union[str, date, None], end: bool = False) -> Optional[date]:
+    """
+    Parses an ISO date, or a year as its first day (or last, with `end`).
+
+    Returns:
+        Optional[date]: The date, or None for an empty value.
+    """
+    if value is None or value == "":
+        return None
+    if isinstance(value, date):
+        return value
+    value = str(value).strip()
+    if len(value) == 4 and value.isdigit():
+        return date(int(value), 12, 31) if end else date(int(value), 1, 1)
+    return date.fromisoformat(value)
+
+
+def date_windows(
+    start: date, end: date, window: str = "year"
+) -> List[Tuple[date, date]]:
+    """
+    Splits the days from `start` to `end`, both included, into calendar windows.
+
+    Args:
+        start (date): First day.
+        end (date): Last day.
+        window (str): `year`, `quarter`, `month`, `week`, or a number of days such as `10d`.
+            Defaults to "year".
+
+    Returns:
+        List[Tuple[date, date]]: First and last day of each window, oldest first.
+    """
+    windows = []
+    first = start
+    while first <= end:
+        if window == "year":
+            last = date(first.year, 12, 31)
+        elif window in ("quarter", "month"):
+            months = 3 if window == "quarter" else 1
+            month = (first.month - 1) // months * months + months + 1
+            year = first.year + (month - 1) // 12
+            last = date(year, (month - 1) % 12 + 1, 1) - timedelta(days=1)
+        elif window == "week":
+            last = first + timedelta(days=6 - first.weekday())
+        elif window.endswith("d") and window[:-1].isdigit() and int(window[:-1]) > 0:
+            last = first + timedelta(days=int(window[:-1]) - 1)
+        else:
+            raise ValueError(f"Unknown crawl window: {window}")
+        last = min(last, end)
+        windows.append((first, last))
+        first = last + timedelta(days=1)
+    return windows
+
+
+def plan_crawl(
+    search_url: str,
+    start: date,
+    end: date,
+    window: str = "year",
+    institutions: Iterable[str] = (),
+    authors: Iterable[str] = (),
+    from_param: str = "fromDate",
+    till_param: str = "tillDate",
+    institution_param: str = "institutions",
+    author_param: str = "authors",
+    date_format: str = "%d/%m/%Y",
+    newest_first: bool = True,
+) -> List[CrawlShard]:
+    """
+    Builds one listing url per date window and institution or author.
+
+    The filters are appended to the query of `search_url` with the listing's
+    own parameters, and the page placeholder is left as it is, so each shard
+    is paginated on its own. Institutions and authors each get their own
+    shards; with neither, a window covers all speeches.
+
+    Args:
+        search_url (str): Listing url with a page placeholder.
+        start (date): First day of the crawl.
+        end (date): Last day of the crawl.
+        window (str): Size of the date windows, see `date_windows`. Defaults to "year".
+        institutions (Iterable[str]): Institution ids to crawl separately. Defaults to ().
+        authors (Iterable[str]): Author ids to crawl separately. Defaults to ().
+        from_param (str): Query parameter of the first day. Defaults to "fromDate".
+        till_param (str): Query parameter of the last day. Defaults to "tillDate".
+        institution_param (str): Query parameter of the institution. Defaults to "institutions".
+        author_param (str): Query parameter of the author. Defaults to "authors".
+        date_format (str): Format of the dates in the query. Defaults to "%d/%m/%Y".
+        newest_first (bool): Put the most recent windows first. Defaults to True.
+
+    Returns:
+        List[CrawlShard]: The shards of the crawl.
+    """
+    filters: List[Tuple[Optional[str], Optional[str]]] = [
+        (institution, None) for institution in institutions
+    ] + [(None, author) for author in authors]
+    windows = date_windows(start, end, window)
+    if newest_first:
+        windows.reverse()
+    separator = "&" if "?" in search_url else "?"
+    shards = []
+    for first, last in windows:
+        for institution, author in filters or [(None, None)]:
+            params = {
+                from_param: first.strftime(date_format),
+                till_param: last.strftime(date_format),
+            }
+            if institution is not None:
+                params[institution_param] = institution
+            if author is not None:
+                params[author_param] = author
+            shards.append(
+                CrawlShard(
+                    url=f"{search_url}{separator}{urlencode(params)}",
+                    start=first,
+                    end=last,
+                    institution=institution,
+                    author=author,
+                )
+            )
+    logger.debug(
+        "Planned %s shards: %s windows from %s to %s, %s filters",
+        len(shards),
+        len(windows),
+        start,
+        end,
+        len(filters) or "no",
+    )
+    return shards
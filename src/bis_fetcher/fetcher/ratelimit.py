@@ -0,0 +1,159 @@
+"""Adaptive request rate limiter shared by worker processes"""
+import logging
+import multiprocessing as mp
+import time
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from .session import RETRY_STATUS_CODES
+
+logger = logging.getLogger(__name__)
+
+# Indexes of the shared state
+_RATE, _NEXT_SLOT, _LAST_DECREASE = range(3)
+
+
+class RateLimiter:
+    """
+    Paces requests across processes, adapting the rate to the server (AIMD).
+
+    The state lives in shared memory, so the limiter must reach worker
+    processes when they start, e.g. through a Pool initializer. `acquire`
+    reserves the next free time slot, at most `burst` slots ahead of now,
+    and sleeps until it comes; the rate holds for all processes together,
+    whatever the number of workers.
+
+    With `adaptive`, every response is reported to `record`. Successes
+    increase the rate by about `increase` requests per second each second;
+    a 429 or server error, a connection error or a response slower than
+    `target_latency` multiplies it by `decrease_factor`, at most once every
+    `decrease_cooldown` seconds so that one slowdown seen by many requests
+    in flight counts once. A Retry-After header holds all requests back.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        min_rate: float = 0.1,
+        max_rate: Optional[float] = None,
+        burst: int = 1,
+        adaptive: bool = True,
+        target_latency: Optional[float] = 5.0,
+        increase: float = 1.0,
+        decrease_factor: float = 0.5,
+        decrease_cooldown: float = 1.0,
+        backoff_status_codes: Iterable[int] = RETRY_STATUS_CODES,
+    ):
+        """
+        Initializes a RateLimiter instance.
+
+        Args:
+            rate (float): Requests per second to start with.
+            min_rate (float): Lowest rate to back off to. Defaults to 0.1.
+            max_rate (Optional[float]): Highest rate to grow to, None for no limit. Defaults to None.
+            burst (int): Requests that may be sent at once after an idle period. Defaults to 1.
+            adaptive (bool): Adjust the rate to the responses. Defaults to True.
+            target_latency (Optional[float]): Slower responses count as congestion. Defaults to 5.0.
+            increase (float): Additive increase, in requests per second per second. Defaults to 1.0.
+            decrease_factor (float): Multiplicative decrease on congestion. Defaults to 0.5.
+            decrease_cooldown (float): Minimum seconds between two decreases. Defaults to 1.0.
+            backoff_status_codes (Iterable[int]): Status codes that mean congestion. Defaults to 429 and 5xx.
+        """
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.min_rate = min(min_rate, rate)
+        self.max_rate = max_rate
+        self.burst = max(burst, 1)
+        self.adaptive = adaptive
+        self.target_latency = target_latency
+        self.increase = increase
+        self.decrease_factor = decrease_factor
+        self.decrease_cooldown = decrease_cooldown
+        self.backoff_status_codes = frozenset(backoff_status_codes)
+        self._state = mp.Array("d", [rate, 0.0, 0.0])
+
+    @property
+    def rate(self) -> float:
+        """Current rate, in requests per second."""
+        return self._state[_RATE]
+
+    def acquire(self) -> float:
+        """Waits for the next free slot, returning the seconds waited."""
+        with self._state.get_lock():
+            now = time.monotonic()
+            interval = 1 / self._state[_RATE]
+            slot = max(self._state[_NEXT_SLOT], now - (self.burst - 1) * interval)
+            self._state[_NEXT_SLOT] = slot + interval
+        wait = slot - now
+        if wait > 0:
+            time.sleep(wait)
+        return max(wait, 0.0)
+
+    def record(
+        self,
+        latency: float,
+        status_code: Optional[int] = None,
+        retry_after: Optional[float] = None,
+    ) -> None:
+        """
+        Reports a response, adjusting the rate.
+
+        Args:
+            latency (float): Seconds the request took.
+            status_code (Optional[int]): Status code, None if the request failed. Defaults to None.
+            retry_after (Optional[float]): Seconds the server asked to wait. Defaults to None.
+        """
+        congested = (
+            not status_code
+            or status_code in self.backoff_status_codes
+            or (self.target_latency is not None and latency > self.target_latency)
+        )
+        with self._state.get_lock():
+            now = time.monotonic()
+            if retry_after:
+                self._state[_NEXT_SLOT] = max(
+                    self._state[_NEXT_SLOT], now + retry_after
+                )
+            if not self.adaptive:
+                return
+            rate = self._state[_RATE]
+            if not congested:
+                rate += self.increase / rate
+                if self.max_rate is not None:
+                    rate = min(rate, self.max_rate)
+                self._state[_RATE] = rate
+            elif now - self._state[_LAST_DECREASE] >= self.decrease_cooldown:
+                self._state[_RATE] = max(rate * self.decrease_factor, self.min_rate)
+                self._state[_LAST_DECREASE] = now
+                logger.info(
+                    "Slowing down to %.2f requests/s after %s in %.2fs",
+                    self._state[_RATE],
+                    status_code or "a failed request",
+                    latency,
+                )
+
+
+_shared_rate_limiters: Dict[Tuple, RateLimiter] = {}
+
+
+def init_shared_rate_limiters(rate_limiters: Dict[Tuple, RateLimiter]) -> None:
+    """
+    Installs rate limiters for the current process.
+
+    Used as part of a multiprocessing.Pool initializer, so the workers pace
+    their requests with the limiters of the parent process.
+    """
+    _shared_rate_limiters.clear()
+    _shared_rate_limiters.update(rate_limiters)
+
+
+def get_shared_rate_limiter(**config: Any) -> RateLimiter:
+    """Returns the rate limiter installed for `config`, creating it on first use."""
+    key = tuple(sorted(config.items()))
+    if key not in _shared_rate_limiters:
+        _shared_rate_limiters[key] = RateLimiter(**config)
+    return _shared_rate_limiters[key]
+
+
+def shared_rate_limiters() -> Dict[Tuple, RateLimiter]:
+    """Rate limiters of the current process, to pass on to worker processes."""
+    return dict(_shared_rate_limiters)
@@ -0,0 +1,404 @@
+"""Recording and offline replay of HTTP responses"""
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Counter, Dict, List, Optional, Sequence, Tuple, Type
+from urllib.parse import urlsplit
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+# Response headers kept in the archive
+RECORDED_HEADERS = ("Content-Type", "ETag", "Last-Modified")
+
+
+def _request_path(url: str) -> str:
+    parts = urlsplit(url)
+    return parts.path + (f"?{parts.query}" if parts.query else "")
+
+
+class FixtureArchive:
+    """
+    Directory of recorded HTTP responses.
+
+    `index.jsonl` holds one line per response, with the method, URL, status,
+    a few headers and the name of the body file under `bodies/`. Bodies are
+    named by their SHA-256, so identical bodies are stored once. Responses
+    are looked up by path and query string, whatever the host, so they can
+    be replayed from any address.
+    """
+
+    def __init__(self, archive_dir: str):
+        self.archive_dir = archive_dir
+        self._lock = threading.Lock()
+        self._entries: Optional[Dict[Tuple[str, str], dict]] = None
+
+    @property
+    def index_filepath(self) -> str:
+        return str(Path(self.archive_dir) / "index.jsonl")
+
+    def add(
+        self,
+        method: str,
+        url: str,
+        status_code: int,
+        body: bytes,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> None:
+        """Adds a response to the archive."""
+        sha256 = hashlib.sha256(body).hexdigest()
+        body_path = Path(self.archive_dir) / "bodies" / f"{sha256}.bin"
+        if not body_path.exists():
+            body_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = body_path.with_name(f"{body_path.name}.{uuid.uuid4().hex}.tmp")
+            tmp_path.write_bytes(body)
+            os.replace(tmp_path, body_path)
+        entry = {
+            "method": method.upper(),
+            "url": url,
+            "status_code": status_code,
+            "headers": {
+                key: value
+                for key, value in (headers or {}).items()
+                if key in RECORDED_HEADERS
+            },
+            "body": body_path.name,
+            "size": len(body),
+        }
+        with self._lock, open(self.index_filepath, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+        self._entries = None
+
+    @property
+    def entries(self) -> Dict[Tuple[str, str], dict]:
+        """Responses by (method, path), preferring the last one that was not a server error."""
+        if self._entries is None:
+            entries: Dict[Tuple[str, str], dict] = {}
+            if os.path.exists(self.index_filepath):
+                with open(self.index_filepath, encoding="utf-8") as f:
+                    for line in f:
+                        entry = json.loads(line)
+                        key = (entry["method"], _request_path(entry["url"]))
+                        previous = entries.get(key)
+                        if (
+                            previous is None
+                            or entry["status_code"] < 500
+                            or previous["status_code"] >= 500
+                        ):
+                            entries[key] = entry
+            self._entries = entries
+        return self._entries
+
+    def lookup(self, method: str, path: str) -> Optional[dict]:
+        """Returns the response to a request, answering HEAD with the recorded GET if needed."""
+        entries = self.entries
+        entry = entries.get((method.upper(), path))
+        if entry is None and method.upper() == "HEAD":
+            entry = entries.get(("GET", path))
+        return entry
+
+    def body(self, entry: dict) -> bytes:
+        return (Path(self.archive_dir) / "bodies" / entry["body"]).read_bytes()
+
+
+class ResponseRecorder:
+    """
+    Records every response of a requests.Session into a FixtureArchive.
+
+    Installed as a response hook, so it captures listing pages, speech pages
+    and PDF downloads alike; streamed bodies are read in full. HEAD requests,
+    304s and partial responses are not recorded, the replay server answers
+    them from the full GET response.
+    """
+
+    def __init__(self, archive_dir: str):
+        self.archive = FixtureArchive(archive_dir)
+
+    def install(self, session: requests.Session) -> None:
+        """Adds the recorder to a session, once per archive."""
+        hooks = session.hooks["response"]
+        for hook in hooks:
+            recorder = getattr(hook, "__self__", None)
+            if (
+                isinstance(recorder, ResponseRecorder)
+                and recorder.archive.archive_dir == self.archive.archive_dir
+            ):
+                return
+        hooks.append(self.record)
+
+    def record(
+        self, response: requests.Response, *args: object, **kwargs: object
+    ) -> requests.Response:
+        if response.request.method != "GET" or response.status_code in (206, 304):
+            return response
+        self.archive.add(
+            "GET",
+            response.url,
+            response.status_code,
+            response.content or b"",
+            dict(response.headers),
+        )
+        return response
+
+
+class ReplayServer:
+    """
+    Local HTTP server that replays a FixtureArchive.
+
+    Every request waits `latency` seconds, and fails with a 503 with
+    probability `error_rate`. Conditional GETs (If-None-Match) and Range
+    requests are answered like a real server would. `stats` counts the
+    requests and bytes served, by kind of resource.
+    """
+
+    def __init__(
+        self,
+        archive_dir: str,
+        latency: float = 0.0,
+        error_rate: float = 0.0,
+        seed: Optional[int] = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ):
+        self.archive = FixtureArchive(archive_dir)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.stats: Counter[str] = Counter()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._host = host
+        self._httpd = ThreadingHTTPServer((host, port), self._handler())
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self._host}:{self._httpd.server_port}"
+
+    def start(self) -> "ReplayServer":
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._httpd.serve_forever, daemon=True
+            )
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._httpd.shutdown()
+            self._thread.join()
+            self._thread = None
+        self._httpd.server_close()
+
+    def __enter__(self) -> "ReplayServer":
+        return self.start()
+
+    def __exit__(self, *exc: object) -> None:
+        self.stop()
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self.stats.clear()
+
+    def _count(self, kind: str, num_bytes: int) -> None:
+        with self._lock:
+            self.stats[f"{kind}_requests"] += 1
+            self.stats[f"{kind}_bytes"] += num_bytes
+
+    def _fail(self) -> bool:
+        with self._lock:
+            return self._random.random() < self.error_rate
+
+    def _handler(self) -> Type[BaseHTTPRequestHandler]:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self) -> None:
+                self._respond(send_body=True)
+
+            def do_HEAD(self) -> None:
+                self._respond(send_body=False)
+
+            def _respond(self, send_body: bool) -> None:
+                if server.latency > 0:
+                    time.sleep(server.latency)
+                if server._fail():
+                    server._count("error", 0)
+                    self._send(503, b"", {}, send_body)
+                    return
+                entry = server.archive.lookup(self.command, self.path)
+                if entry is None:
+                    server._count("missing", 0)
+                    self._send(404, b"", {}, send_body)
+                    return
+                headers = dict(entry["headers"])
+                etag = headers.get("ETag")
+                if etag and self.headers.get("If-None-Match") == etag:
+                    server._count("not_modified", 0)
+                    self._send(304, b"", {"ETag": etag}, False)
+                    return
+                body = server.archive.body(entry) if entry["size"] else b""
+                status = entry["status_code"]
+                range_ = self.headers.get("Range")
+                if range_ and status == 200 and range_.startswith("bytes="):
+                    start = int(range_[6:].split("-")[0] or 0)
+                    if start >= len(body):
+                        self._send(416, b"", {}, send_body)
+                        return
+                    end = len(body) - 1
+                    headers["Content-Range"] = f"bytes {start}-{end}/{len(body)}"
+                    body, status = body[start:], 206
+                server._count(_resource_kind(self.path), len(body) if send_body else 0)
+                self._send(status, body, headers, send_body)
+
+            def _send(
+                self,
+                status: int,
+                body: bytes,
+                headers: Dict[str, str],
+                send_body: bool,
+            ) -> None:
+                self.send_response(status)
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                if status != 304:
+                    self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                if send_body and body:
+                    self.wfile.write(body)
+
+            def log_message(self, *args: object) -> None:
+                pass
+
+        return Handler
+
+
+def _resource_kind(path: str) -> str:
+    path = path.split("?", 1)[0]
+    if path.endswith(".pdf"):
+        return "pdf"
+    if path.startswith("/review/"):
+        return "speech"
+    return "listing"
+
+
+def make_pdf(texts: Sequence[str], padding: int = 0) -> bytes:
+    """Builds a minimal PDF with one line of text per page, padded by about `padding` bytes."""
+    num_pages = len(texts)
+    font_id = 3 + 2 * num_pages
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [%s] /Count %d >>"
+        % (" ".join(f"{3 + 2 * i} 0 R" for i in range(num_pages)), num_pages),
+    ]
+    for i, text in enumerate(texts):
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET"
+        objects.append(
+            "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 {font_id} 0 R >> >> /Contents {4 + 2 * i} 0 R >>"
+        )
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+    objects.append("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    if padding > 0:
+        filler = "%" * padding
+        objects.append(f"<< /Length {len(filler)} >>\nstream\n{filler}\nendstream")
+    out = b"%PDF-1.4\n"
+    offsets = []
+    for no, obj in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += f"{no} 0 obj\n{obj}\nendobj\n".encode()
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode()
+    out += (
+        f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\n"
+        f"startxref\n{xref}\n%%EOF\n"
+    ).encode()
+    return out
+
+
+LISTING_URL = "https://www.bis.org/cbspeeches/index.htm?m=256&cbspeeches_page={page}"
+
+
+def build_synthetic_archive(
+    archive_dir: str,
+    num_pages: int = 5,
+    per_page: int = 10,
+    pdf_size: int = 100_000,
+    filler_size: int = 50_000,
+) -> FixtureArchive:
+    """
+    Writes an archive shaped like the BIS central bankers' speeches site.
+
+    Useful where bis.org cannot be recorded: listing pages in the BIS markup,
+    one speech page and one PDF per listed speech.
+
+    Args:
+        archive_dir (str): Directory of the archive.
+        num_pages (int): Number of listing pages. Defaults to 5.
+        per_page (int): Speeches per listing page. Defaults to 10.
+        pdf_size (int): Approximate size of each PDF in bytes. Defaults to 100,000.
+        filler_size (int): Bytes of unrelated markup around each listing. Defaults to 50,000.
+    """
+    archive = FixtureArchive(archive_dir)
+    filler = (
+        "<div class='nav'>"
+        + "<p><a href='#'>menu</a></p>" * (filler_size // 27)
+        + "</div>"
+    )
+    day = date(2023, 11, 30)
+    for page in range(1, num_pages + 1):
+        rows: List[str] = []
+        for _ in range(per_page):
+            speech_id = f"r{day:%y%m%d}{chr(ord('a') + len(rows) % 26)}"
+            rows.append(
+                f'<tr><td class="item_date">{day:%d %b %Y}</td><td><div>'
+                f'<div class="title"><a href="/review/{speech_id}.htm">Speech {speech_id}</a></div>'
+                f'<a class="authorlnk dashed">Author {len(rows) % 7}</a></div></td></tr>'
+            )
+            speech = (
+                f"<html><body>{filler}<div class='pdftxt'>"
+                f"<a class='pdftitle_link' href='/review/{speech_id}.pdf'>PDF</a>"
+                "</div></body></html>"
+            ).encode()
+            archive.add(
+                "GET",
+                f"https://www.bis.org/review/{speech_id}.htm",
+                200,
+                speech,
+                {"Content-Type": "text/html", "ETag": f'"{speech_id}"'},
+            )
+            archive.add(
+                "GET",
+                f"https://www.bis.org/review/{speech_id}.pdf",
+                200,
+                make_pdf([f"Speech {speech_id}"], padding=pdf_size),
+                {"Content-Type": "application/pdf", "ETag": f'"{speech_id}-pdf"'},
+            )
+            if len(rows) % 3 == 0:
+                day -= timedelta(days=1)
+        listing = (
+            f"<html><body>{filler}<div id='cbspeeches_list'><div>"
+            f"<table class='documentList'><tbody>{''.join(rows)}</tbody></table>"
+            "</div></div></body></html>"
+        ).encode()
+        archive.add(
+            "GET",
+            LISTING_URL.format(page=page),
+            200,
+            listing,
+            {"Content-Type": "text/html", "ETag": f'"page-{page}-{len(rows)}"'},
+        )
+        day -= timedelta(days=1)
+    return archive
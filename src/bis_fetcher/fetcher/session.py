@@ -0,0 +1,191 @@
+"""Pooled HTTP session with timeouts and retries"""
+import logging
+import os
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Optional, Tuple, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .metrics import get_metrics
+
+if TYPE_CHECKING:
+    from .ratelimit import RateLimiter
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+_sessions: Dict[Tuple[int, int], requests.Session] = {}
+
+
+def get_session(pool_size: int = 10) -> requests.Session:
+    """
+    Returns the pooled requests.Session of the current process.
+
+    Connections are kept alive and reused across requests, so each host pays
+    for the TCP and TLS handshakes only once per connection in the pool.
+    Sessions are never shared with child processes.
+
+    Args:
+        pool_size (int): Maximum number of connections kept per host. Defaults to 10.
+
+    Returns:
+        requests.Session: The session for this process and pool size.
+    """
+    key = (os.getpid(), pool_size)
+    session = _sessions.get(key)
+    if session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        _sessions[key] = session
+    return session
+
+
+def retry_after_seconds(response: requests.Response) -> Optional[float]:
+    """
+    Parses the Retry-After header of a response.
+
+    Returns:
+        Optional[float]: Seconds to wait, or None if the header is missing or invalid.
+    """
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(retry_at.timestamp() - time.time(), 0.0)
+
+
+def backoff_delay(
+    attempt: int,
+    backoff_factor: float = 0.5,
+    backoff_max: float = 60.0,
+    retry_after: Optional[float] = None,
+) -> float:
+    """
+    Computes the delay before the next retry.
+
+    Uses exponential backoff with full jitter, but never waits less than the
+    server asked for in Retry-After.
+
+    Args:
+        attempt (int): Number of the attempt that just failed, starting at 0.
+        backoff_factor (float): Base delay in seconds. Defaults to 0.5.
+        backoff_max (float): Upper bound of the exponential delay. Defaults to 60.0.
+        retry_after (Optional[float]): Delay requested by the server. Defaults to None.
+
+    Returns:
+        float: Seconds to sleep.
+    """
+    delay = random.uniform(0, min(backoff_max, backoff_factor * 2**attempt))
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    return delay
+
+
+def get_with_retries(
+    session: requests.Session,
+    url: str,
+    timeout: Union[float, Tuple[float, float], None] = None,
+    max_retries: int = 3,
+    backoff_factor: float = 0.5,
+    backoff_max: float = 60.0,
+    retry_status_codes: Iterable[int] = RETRY_STATUS_CODES,
+    **kwargs: Any,
+) -> requests.Response:
+    """Sends a GET request with `request_with_retries`."""
+    return request_with_retries(
+        session,
+        "GET",
+        url,
+        timeout=timeout,
+        max_retries=max_retries,
+        backoff_factor=backoff_factor,
+        backoff_max=backoff_max,
+        retry_status_codes=retry_status_codes,
+        **kwargs,
+    )
+
+
+def request_with_retries(
+    session: requests.Session,
+    method: str,
+    url: str,
+    timeout: Union[float, Tuple[float, float], None] = None,
+    max_retries: int = 3,
+    backoff_factor: float = 0.5,
+    backoff_max: float = 60.0,
+    retry_status_codes: Iterable[int] = RETRY_STATUS_CODES,
+    rate_limiter: Optional["RateLimiter"] = None,
+    **kwargs: Any,
+) -> requests.Response:
+    """
+    Sends a request, retrying connection errors, timeouts and retryable status codes.
+
+    Args:
+        session (requests.Session): Session to send the request with.
+        method (str): HTTP method, e.g. GET or HEAD.
+        url (str): URL for the request.
+        timeout (Union[float, Tuple[float, float], None]): Connect and read timeouts. Defaults to None.
+        max_retries (int): Number of retries after the first attempt. Defaults to 3.
+        backoff_factor (float): Base delay of the exponential backoff. Defaults to 0.5.
+        backoff_max (float): Upper bound of the exponential delay. Defaults to 60.0.
+        retry_status_codes (Iterable[int]): Status codes to retry. Defaults to 429 and 5xx.
+        rate_limiter (Optional[RateLimiter]): Paces every attempt and is told how it went.
+            Defaults to None.
+        **kwargs: Optional arguments that `requests.Session.request` takes.
+
+    Returns:
+        requests.Response: The last response received.
+    """
+    retry_status_codes = set(retry_status_codes)
+    metrics = get_metrics()
+    stage = f"http_{method.lower()}"
+    attempt = 0
+    while True:
+        if rate_limiter is not None:
+            metrics.observe("rate_limit_wait", rate_limiter.acquire())
+        start = time.perf_counter()
+        try:
+            response = session.request(method, url, timeout=timeout, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            metrics.observe(stage, time.perf_counter() - start)
+            metrics.inc("request_errors")
+            if rate_limiter is not None:
+                rate_limiter.record(time.perf_counter() - start)
+            if attempt >= max_retries:
+                raise
+            delay = backoff_delay(attempt, backoff_factor, backoff_max)
+            logger.info("Request to %s failed (%s), retrying...", url, e)
+        else:
+            metrics.observe(stage, time.perf_counter() - start)
+            metrics.inc(f"http_status_{response.status_code}")
+            if rate_limiter is not None:
+                rate_limiter.record(
+                    time.perf_counter() - start,
+                    response.status_code,
+                    retry_after_seconds(response),
+                )
+            if response.status_code not in retry_status_codes or attempt >= max_retries:
+                return response
+            delay = backoff_delay(
+                attempt, backoff_factor, backoff_max, retry_after_seconds(response)
+            )
+            logger.info(
+                "Request to %s returned %s, retrying...", url, response.status_code
+            )
+        logger.info("Sleeping for %.2f seconds...", delay)
+        metrics.inc("retries")
+        time.sleep(delay)
+        attempt += 1
@@ -0,0 +1,479 @@
+"""Append-only record stores for links and articles"""
+import json
+import logging
+import os
+import shutil
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import (
+    TYPE_CHECKING,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+)
+
+from .index import UrlIndex, url_hash
+from .writer import read_jsonl
+
+if TYPE_CHECKING:
+    import pyarrow.dataset as ds
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+TIMESTAMP_FORMATS = ("%d %b %Y", "%d %B %Y", "%Y-%m-%d", "%Y-%m-%dT%H:%M:%S")
+
+
+def parse_timestamp(value: Optional[str]) -> Optional[datetime]:
+    """Parse a listing timestamp such as "10 Nov 2023", or return None."""
+    if not value:
+        return None
+    value = value.strip()
+    for fmt in TIMESTAMP_FORMATS:
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+def _in_date_range(
+    record: dict, start: Optional[datetime], end: Optional[datetime]
+) -> bool:
+    if start is None and end is None:
+        return True
+    date = parse_timestamp(record.get("timestamp"))
+    if date is None:
+        return False
+    return (start is None or date >= start) and (end is None or date < end)
+
+
+def select_records(
+    records: Iterable[dict],
+    columns: Optional[Sequence[str]] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    where: Optional[Mapping[str, object]] = None,
+) -> Iterator[dict]:
+    """
+    Lazily filters and projects records.
+
+    Args:
+        records (Iterable[dict]): Records to select from.
+        columns (Optional[Sequence[str]]): Fields to return. Defaults to all.
+        start (Optional[datetime]): Only records with a timestamp from this date. Defaults to None.
+        end (Optional[datetime]): Only records with a timestamp before this date. Defaults to None.
+        where (Optional[Mapping[str, object]]): Only records with these field values. Defaults to None.
+    """
+    for record in records:
+        if not _in_date_range(record, start, end):
+            continue
+        if where and any(record.get(k) != v for k, v in where.items()):
+            continue
+        if columns is not None:
+            record = {column: record.get(column) for column in columns}
+        yield record
+
+
+def iter_batches(records: Iterable[T], batch_size: int) -> Iterator[List[T]]:
+    """Groups records into lists of up to `batch_size`, reading only one batch ahead."""
+    batch: List[T] = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class JsonlStore:
+    """
+    JSONL file of unique records that only ever grows by appends.
+
+    The hashes of the record keys are kept in a side file, `{filepath}.keys`,
+    so saving new records costs time proportional to the new records rather
+    than to the whole file, and nothing but the keys is held in memory.
+    After each append the keys file notes the size of the data file; if the
+    two disagree on the next load, e.g. after a crash between the writes, the
+    keys are rebuilt from the data. Every `compact_every` appended records
+    the data file is rewritten without duplicates or partial lines.
+    """
+
+    def __init__(
+        self,
+        filepath: str,
+        key_field: str = "url",
+        compact_every: Optional[int] = 1000,
+    ):
+        """
+        Initializes a JsonlStore instance.
+
+        Args:
+            filepath (str): Path of the JSONL file.
+            key_field (str): Field that identifies a record. Defaults to "url".
+            compact_every (Optional[int]): Compact after this many appended records,
+                None to compact only on request. Defaults to 1000.
+        """
+        self.filepath = filepath
+        self.key_field = key_field
+        self.compact_every = compact_every
+        self._keys: Optional[UrlIndex] = None
+        self._num_appended = 0
+
+    @property
+    def keys_filepath(self) -> str:
+        return f"{self.filepath}.keys"
+
+    @property
+    def keys(self) -> UrlIndex:
+        """Index of the keys of the stored records."""
+        if self._keys is None:
+            self._keys, self._num_appended = self._load_keys()
+        return self._keys
+
+    def __iter__(self) -> Iterator[dict]:
+        return read_jsonl(self.filepath)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def read(
+        self,
+        columns: Optional[Sequence[str]] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        where: Optional[Mapping[str, object]] = None,
+    ) -> Iterator[dict]:
+        """Streams the records, see `select_records` for the arguments."""
+        return select_records(self, columns, start, end, where)
+
+    def append(self, records: Iterable[dict]) -> List[dict]:
+        """
+        Appends the records whose key is not stored yet.
+
+        Returns:
+            List[dict]: The records that were appended.
+        """
+        keys = self.keys
+        new_records = []
+        for record in records:
+            key = record[self.key_field]
+            if key not in keys:
+                keys.add(key)
+                new_records.append(record)
+        if not new_records:
+            return new_records
+        with open(self.filepath, "a+", encoding="utf-8") as f:
+            if f.tell() and not _ends_with_newline(self.filepath):
+                f.write("\n")  # end a partial line left by a crash
+            f.write(
+                "".join(
+                    json.dumps(record, ensure_ascii=False) + "\n"
+                    for record in new_records
+                )
+            )
+            f.flush()
+            os.fsync(f.fileno())
+        with open(self.keys_filepath, "a", encoding="utf-8") as f:
+            for record in new_records:
+                f.write(f"{url_hash(record[self.key_field]):016x}\n")
+            f.write(f"#size {os.path.getsize(self.filepath)}\n")
+        self._num_appended += len(new_records)
+        if self.compact_every and self._num_appended >= self.compact_every:
+            self.compact()
+        return new_records
+
+    def compact(self) -> None:
+        """Rewrites the data file without duplicates or partial lines, and rebuilds the keys."""
+        keys = UrlIndex()
+        hashes = []
+        tmp_filepath = f"{self.filepath}.compact"
+        num_records = num_kept = 0
+        with open(tmp_filepath, "w", encoding="utf-8") as f:
+            for record in read_jsonl(self.filepath):
+                num_records += 1
+                key = record.get(self.key_field)
+                if key is None or key in keys:
+                    continue
+                keys.add(key)
+                hashes.append(url_hash(key))
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                num_kept += 1
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_filepath, self.filepath)
+        self._write_keys(hashes)
+        self._keys, self._num_appended = keys, 0
+        logger.info(
+            "Compacted %s: kept %s of %s records",
+            self.filepath,
+            num_kept,
+            num_records,
+        )
+
+    def _write_keys(self, hashes: List[int]) -> None:
+        tmp_filepath = f"{self.keys_filepath}.tmp"
+        size = os.path.getsize(self.filepath) if os.path.exists(self.filepath) else 0
+        with open(tmp_filepath, "w", encoding="utf-8") as f:
+            f.writelines(f"{value:016x}\n" for value in hashes)
+            f.write("#compacted\n")
+            f.write(f"#size {size}\n")
+        os.replace(tmp_filepath, self.keys_filepath)
+
+    def _load_keys(self) -> Tuple[UrlIndex, int]:
+        """Reads the keys file, or rebuilds it if it does not match the data file."""
+        size = os.path.getsize(self.filepath) if os.path.exists(self.filepath) else 0
+        keys, num_appended, recorded_size = UrlIndex(), 0, 0
+        if os.path.exists(self.keys_filepath):
+            with open(self.keys_filepath, encoding="utf-8") as f:
+                for line in f:
+                    if line.startswith("#size "):
+                        recorded_size = int(line[6:])
+                    elif line.startswith("#compacted"):
+                        num_appended = 0
+                    elif line.strip() and not line.startswith("#"):
+                        keys.add_hash(int(line, 16))
+                        num_appended += 1
+        if recorded_size == size:
+            return keys, num_appended
+        logger.info("Rebuilding the key index of %s", self.filepath)
+        keys, hashes = UrlIndex(), []
+        for record in read_jsonl(self.filepath):
+            key = record.get(self.key_field)
+            if key is not None and key not in keys:
+                keys.add(key)
+                hashes.append(url_hash(key))
+        self._write_keys(hashes)
+        # Duplicates or partial lines may have been left behind, compact on the next append
+        return keys, self.compact_every or 0
+
+
+def _ends_with_newline(filepath: str) -> bool:
+    with open(filepath, "rb") as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b"\n"
+
+
+class ParquetStore:
+    """
+    Parquet dataset of unique records, partitioned by year of their timestamp.
+
+    Records are stored under `{root}/year={year}/`, with a `date` column
+    parsed from `timestamp`. Date-range reads skip the partitions and row
+    groups outside the range and read only the requested columns. Each
+    append writes new files, staged in a hidden directory and moved into
+    place, so a crash never leaves a partial file in the dataset.
+    `compact` merges the files of each partition.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        key_field: str = "url",
+        row_group_size: int = 10_000,
+    ):
+        """
+        Initializes a ParquetStore instance.
+
+        Args:
+            root (str): Directory of the dataset.
+            key_field (str): Field that identifies a record. Defaults to "url".
+            row_group_size (int): Maximum rows per row group. Defaults to 10,000.
+        """
+        self.filepath = root
+        self.key_field = key_field
+        self.row_group_size = row_group_size
+        self._keys: Optional[UrlIndex] = None
+
+    @property
+    def keys(self) -> UrlIndex:
+        """Index of the keys of the stored records, read from the key column only."""
+        if self._keys is None:
+            self._keys = UrlIndex()
+            if self.files:
+                for batch in self._dataset().to_batches(columns=[self.key_field]):
+                    for key in batch.column(0).to_pylist():
+                        if key is not None:
+                            self._keys.add(key)
+        return self._keys
+
+    @property
+    def files(self) -> List[str]:
+        if not os.path.isdir(self.filepath):
+            return []
+        # File names start with the time of the append, so records are read in append order
+        return sorted(
+            (str(path) for path in Path(self.filepath).glob("year=*/*.parquet")),
+            key=os.path.basename,
+        )
+
+    def __iter__(self) -> Iterator[dict]:
+        return self.read()
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def read(
+        self,
+        columns: Optional[Sequence[str]] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        where: Optional[Mapping[str, object]] = None,
+        batch_size: int = 1024,
+    ) -> Iterator[dict]:
+        """
+        Reads the records, optionally only some fields and a date range.
+
+        The filters are pushed down to the partitions and row groups.
+
+        Args:
+            columns (Optional[Sequence[str]]): Fields to return. Defaults to all but `year` and `date`.
+            start (Optional[datetime]): Only records with a timestamp from this date. Defaults to None.
+            end (Optional[datetime]): Only records with a timestamp before this date. Defaults to None.
+            where (Optional[Mapping[str, object]]): Only records with these field values. Defaults to None.
+            batch_size (int): Rows read at a time. Defaults to 1024.
+        """
+        import pyarrow.dataset as ds
+
+        if not self.files:
+            return
+        dataset = self._dataset()
+        if columns is None:
+            columns = [
+                name for name in dataset.schema.names if name not in ("year", "date")
+            ]
+        columns = [name for name in columns if name in dataset.schema.names]
+        expression = None
+        if start is not None:
+            expression = (ds.field("year") >= start.year) & (ds.field("date") >= start)
+        if end is not None:
+            before_end = (ds.field("year") <= end.year) & (ds.field("date") < end)
+            expression = before_end if expression is None else expression & before_end
+        for name, value in (where or {}).items():
+            if name not in dataset.schema.names:
+                if value is not None:
+                    return
+                continue
+            equals = ds.field(name) == value
+            expression = equals if expression is None else expression & equals
+        for batch in dataset.to_batches(
+            columns=columns, filter=expression, batch_size=batch_size
+        ):
+            yield from batch.to_pylist()
+
+    def append(self, records: Iterable[dict]) -> List[dict]:
+        """
+        Appends the records whose key is not stored yet, as new files.
+
+        Returns:
+            List[dict]: The records that were appended.
+        """
+        keys = self.keys
+        new_records = []
+        for record in records:
+            key = record[self.key_field]
+            if key not in keys:
+                keys.add(key)
+                new_records.append(record)
+        if new_records:
+            self._write(new_records)
+        return new_records
+
+    def compact(self) -> None:
+        """Rewrites each year partition as a single file without duplicate records."""
+        import pyarrow.dataset as ds
+
+        files = self.files
+        if not files:
+            return
+        dataset = self._dataset()
+        keys = UrlIndex()
+        num_records = num_kept = 0
+        partitions = sorted({os.path.dirname(path) for path in files})
+        for partition in partitions:
+            year = int(os.path.basename(partition).split("=", 1)[1])
+            records = []
+            for batch in dataset.to_batches(filter=ds.field("year") == year):
+                for record in batch.to_pylist():
+                    num_records += 1
+                    if record[self.key_field] in keys:
+                        continue
+                    keys.add(record[self.key_field])
+                    records.append(record)
+            num_kept += len(records)
+            self._write(records, with_dates=False)
+        for path in files:
+            os.remove(path)
+        self._keys = keys
+        logger.info(
+            "Compacted %s: kept %s of %s records",
+            self.filepath,
+            num_kept,
+            num_records,
+        )
+
+    def _dataset(self) -> "ds.Dataset":
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+        import pyarrow.parquet as pq
+
+        files = self.files
+        # Appends may add columns, so read with the union of the file schemas
+        schemas = [pq.read_schema(path) for path in files]
+        try:
+            schema = pa.unify_schemas(schemas, promote_options="permissive")
+        except TypeError:
+            # pyarrow < 14 only merges null columns into typed ones
+            schema = pa.unify_schemas(schemas)
+        if "year" not in schema.names:
+            schema = schema.append(pa.field("year", pa.int32()))
+        return ds.dataset(
+            files,
+            schema=schema,
+            format="parquet",
+            partitioning=ds.partitioning(
+                pa.schema([("year", pa.int32())]), flavor="hive"
+            ),
+            partition_base_dir=self.filepath,
+        )
+
+    def _write(self, records: List[dict], with_dates: bool = True) -> None:
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+
+        if not records:
+            return
+        if with_dates:
+            dates = [parse_timestamp(record.get("timestamp")) for record in records]
+            records = [
+                {**record, "date": date, "year": date.year if date else 0}
+                for record, date in zip(records, dates)
+            ]
+        table = pa.Table.from_pylist(records)
+        staging = Path(self.filepath) / f".staging-{uuid.uuid4().hex}"
+        ds.write_dataset(
+            table,
+            staging,
+            format="parquet",
+            partitioning=ds.partitioning(
+                pa.schema([("year", pa.int32())]), flavor="hive"
+            ),
+            basename_template=f"part-{time.time_ns():020d}-{uuid.uuid4().hex[:8]}-{{i}}.parquet",
+            max_rows_per_group=self.row_group_size,
+            min_rows_per_group=min(self.row_group_size, len(records)),
+        )
+        for path in staging.glob("year=*/*.parquet"):
+            target = Path(self.filepath) / path.relative_to(staging)
+            target.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(path, target)
+        shutil.rmtree(staging)
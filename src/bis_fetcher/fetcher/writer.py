@@ -0,0 +1,209 @@
+"""Single-writer JSONL sink shared by worker processes"""
+import json
+import logging
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+from multiprocessing.queues import Queue
+from typing import IO, Dict, Iterator, List, Optional, Set, Tuple
+
+from .metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+
+class JsonlSink:
+    """
+    Handle that sends records for one JSONL file to a JsonlWriter.
+
+    Sinks are cheap and can be handed to pool workers through the pool
+    initializer; their queue cannot be pickled with each task.
+    """
+
+    def __init__(self, queue_: "Queue[Optional[Tuple[str, dict]]]", filepath: str):
+        self._queue = queue_
+        self.filepath = filepath
+
+    def write(self, record: dict) -> None:
+        self._queue.put((self.filepath, record))
+
+
+class JsonlWriter:
+    """
+    Appends records from any number of processes to JSONL files.
+
+    A single thread owns the files. It receives records over a
+    multiprocessing queue, buffers them, writes them in batches of whole
+    lines, flushes at least every `flush_interval` seconds and fsyncs at
+    least every `fsync_interval` seconds. A killed run can therefore lose at
+    most the records of the last intervals, and leaves at worst one partial
+    line at the end of a file, which `read_jsonl` skips.
+
+    Records for checkpoint files are held back until the next flush and
+    written after the other files are flushed, so a checkpoint on disk never
+    refers to records that are not.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = 100,
+        flush_interval: float = 1.0,
+        fsync_interval: Optional[float] = 5.0,
+    ):
+        """
+        Initializes a JsonlWriter instance.
+
+        Args:
+            batch_size (int): Write a file's buffer once it holds this many records. Defaults to 100.
+            flush_interval (float): Maximum seconds a record stays in the buffer. Defaults to 1.0.
+            fsync_interval (Optional[float]): Seconds between fsyncs, None to never fsync. Defaults to 5.0.
+        """
+        self.batch_size = max(batch_size, 1)
+        self.flush_interval = flush_interval
+        self.fsync_interval = fsync_interval
+        self.num_records = 0
+        # Records for a file, or None to stop the writer
+        self._queue: "Queue[Optional[Tuple[str, dict]]]" = mp.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._files: Dict[str, IO[str]] = {}
+        self._buffers: Dict[str, List[str]] = {}
+        self._checkpoints: Set[str] = set()
+
+    def sink(self, filepath: str, checkpoint: bool = False) -> JsonlSink:
+        """
+        Returns a handle that sends records to `filepath` through this writer.
+
+        Args:
+            filepath (str): File to append the records to.
+            checkpoint (bool): Whether the file records progress, see the class docstring. Defaults to False.
+        """
+        if checkpoint:
+            self._checkpoints.add(filepath)
+        return JsonlSink(self._queue, filepath)
+
+    def start(self) -> "JsonlWriter":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def close(self) -> None:
+        """Writes every pending record, fsyncs and closes the files."""
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+
+    def __enter__(self) -> "JsonlWriter":
+        return self.start()
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+    def _run(self) -> None:
+        metrics = get_metrics()
+        last_flush = last_fsync = time.monotonic()
+        try:
+            while True:
+                try:
+                    item = self._queue.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    pass
+                else:
+                    if item is None:
+                        break
+                    filepath, record = item
+                    buffer = self._buffers.setdefault(filepath, [])
+                    buffer.append(json.dumps(record, ensure_ascii=False) + "\n")
+                    self.num_records += 1
+                    if (
+                        len(buffer) >= self.batch_size
+                        and filepath not in self._checkpoints
+                    ):
+                        self._write(filepath)
+                now = time.monotonic()
+                if now - last_flush >= self.flush_interval:
+                    metrics.set_gauge("writer_queue_depth", self._queue_depth())
+                    self._flush()
+                    last_flush = now
+                if self.fsync_interval is not None and (
+                    now - last_fsync >= self.fsync_interval
+                ):
+                    self._fsync()
+                    last_fsync = now
+        finally:
+            self._flush()
+            self._fsync()
+            for f in self._files.values():
+                f.close()
+            self._files.clear()
+
+    def _queue_depth(self) -> int:
+        try:
+            return self._queue.qsize()
+        except NotImplementedError:  # macOS
+            return 0
+
+    def _write(self, filepath: str) -> None:
+        lines = self._buffers.pop(filepath, None)
+        if not lines:
+            return
+        if filepath not in self._files:
+            self._files[filepath] = open(filepath, "a", encoding="utf-8")
+        metrics = get_metrics()
+        data = "".join(lines)
+        with metrics.timer("jsonl_write"):
+            self._files[filepath].write(data)
+        metrics.inc("jsonl_records", len(lines))
+        metrics.inc("jsonl_bytes", len(data))
+
+    def _flush(self) -> None:
+        for checkpoints in (False, True):
+            for filepath in list(self._buffers):
+                if (filepath in self._checkpoints) == checkpoints:
+                    self._write(filepath)
+            for filepath, f in self._files.items():
+                if (filepath in self._checkpoints) == checkpoints:
+                    f.flush()
+
+    def _fsync(self) -> None:
+        for filepath in sorted(self._files, key=lambda p: p in self._checkpoints):
+            f = self._files[filepath]
+            with get_metrics().timer("jsonl_fsync"):
+                f.flush()
+                os.fsync(f.fileno())
+
+
+def read_jsonl(filepath: str, encoding: str = "utf-8") -> Iterator[dict]:
+    """
+    Reads records from a JSONL file written by JsonlWriter or HyFI.append_to_jsonl.
+
+    Lines that are not valid JSON, such as a line cut short by a crash, are skipped.
+    """
+    if not os.path.exists(filepath):
+        return
+    with open(filepath, "r", encoding=encoding) as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                logger.warning("Skipping invalid line %s in %s", line_no, filepath)
+
+
+_shared_sinks: Dict[str, JsonlSink] = {}
+
+
+def init_shared_sinks(sinks: Dict[str, JsonlSink]) -> None:
+    """Installs sinks for the current process, see `init_shared_indexes`."""
+    _shared_sinks.clear()
+    _shared_sinks.update(sinks)
+
+
+def get_shared_sink(name: str) -> Optional[JsonlSink]:
+    """Returns the sink installed under `name`, if any."""
+    return _shared_sinks.get(name)
@@ -0,0 +1,26 @@
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+import requests
+
+
+@pytest.fixture
+def server(handler):
+    """Serves the `handler` fixture of the test module on a local port."""
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def http_request():
+    """A `request(method, url, **kwargs)` function, as passed to the download helpers."""
+
+    def request(method, url, **kwargs):
+        return requests.request(method, url, timeout=5, **kwargs)
+
+    return request
@@ -0,0 +1,93 @@
+import threading
+import time
+
+from bis_fetcher.fetcher.aio import resolve_articles
+from bis_fetcher.fetcher.metrics import get_metrics
+from hyfi.main import HyFI
+
+
+def test_resolve_articles(tmp_path):
+    lock = threading.Lock()
+    in_flight = {"now": 0, "max": 0}
+
+    def parse(url):
+        with lock:
+            in_flight["now"] += 1
+            in_flight["max"] = max(in_flight["max"], in_flight["now"])
+        time.sleep(0.05)
+        with lock:
+            in_flight["now"] -= 1
+        if url.endswith("missing"):
+            return None
+        return {"pdf_url": url + ".pdf"}
+
+    links = [{"title": str(i), "url": f"https://a.org/{i}"} for i in range(20)]
+    links.append({"title": "missing", "url": "https://a.org/missing"})
+    filepath = tmp_path / "articles.jsonl.tmp"
+    articles = resolve_articles(
+        links,
+        parse,
+        article_urls=["https://a.org/0"],
+        max_num_articles=None,
+        article_filepath=str(filepath),
+        max_concurrency=16,
+        max_concurrency_per_host=4,
+    )
+    assert len(articles) == 19
+    assert in_flight["max"] == 4
+    assert {a["url"] for a in HyFI.load_jsonl(str(filepath))} == {
+        a["url"] for a in articles
+    }
+    assert all(a["pdf_url"] == a["url"] + ".pdf" for a in articles)
+
+
+def test_resolve_articles_streams_batches():
+    read = []
+    batches = []
+
+    def links():
+        for i in range(25):
+            read.append(i)
+            yield {"title": str(i), "url": f"https://a.org/{i}"}
+
+    def parse(url):
+        time.sleep(1.0 if url.endswith("/0") else 0.01)
+        return {"pdf_url": url + ".pdf"}
+
+    def on_batch(articles):
+        batches.append((len(articles), len(read), time.perf_counter() - start))
+
+    start = time.perf_counter()
+    articles = resolve_articles(
+        links(),
+        parse,
+        max_num_articles=None,
+        max_concurrency=4,
+        on_batch=on_batch,
+        batch_size=10,
+    )
+    assert articles == []
+    assert [size for size, _, _ in batches] == [10, 10, 5]
+    # The slow article holds up neither the first batch nor the others in flight
+    assert batches[1][2] < 1.0
+    # Links are read as requests start, not all up front
+    assert batches[0][1] < 25
+
+
+def test_resolve_articles_timeout():
+    def parse(url):
+        time.sleep(5.0 if url.endswith("slow") else 0.01)
+        return {"pdf_url": url + ".pdf"}
+
+    metrics = get_metrics()
+    metrics.reset()
+    links = [{"title": str(i), "url": f"https://a.org/{i}"} for i in range(5)]
+    links.insert(2, {"title": "slow", "url": "https://a.org/slow"})
+    start = time.perf_counter()
+    articles = resolve_articles(
+        links, parse, max_num_articles=None, article_timeout=0.5
+    )
+    assert time.perf_counter() - start < 2.0
+    assert {a["url"] for a in articles} == {f"https://a.org/{i}" for i in range(5)}
+    assert metrics.counters["article_timeouts"] == 1
+    assert metrics.summary()["stages"]["article"]["count"] == 6
@@ -0,0 +1,243 @@
+import json
+import os
+import time
+from datetime import datetime
+
+from bis_fetcher.fetcher.base import BaseFetcher, crawl_links, parse_timestamp
+from bis_fetcher.fetcher.metrics import get_metrics
+
+
+class ListingFetcher(BaseFetcher):
+    search_url: str = "https://x/list?page={page}"
+    last_page: int = 7
+
+    def _parse_page_links(self, page_url, print_every=10, verbose=False):
+        page = int(page_url.rsplit("=", 1)[1])
+        if page > self.last_page:
+            return None
+        return [
+            {"title": "", "url": f"https://x/{page}/{i}", "timestamp": ""}
+            for i in range(3)
+        ]
+
+    def _parse_article_text(self, url):
+        if url.endswith("slow"):
+            time.sleep(30)
+        return {"pdf_url": url + ".pdf"}
+
+
+class FlakyListingFetcher(ListingFetcher):
+    def _parse_page_links(self, page_url, print_every=10, verbose=False):
+        if page_url.endswith("=2"):
+            raise TimeoutError("Read timed out")
+        return super()._parse_page_links(page_url, print_every, verbose)
+
+
+def _pages(num_pages, per_page=5):
+    return {
+        page: [{"url": f"https://x/{page}/{i}"} for i in range(per_page)]
+        for page in range(1, num_pages + 1)
+    }
+
+
+def _crawl(pages, link_urls, **kwargs):
+    visited = []
+
+    def parse_page(page):
+        visited.append(page)
+        return pages.get(page)
+
+    links = crawl_links(
+        "start",
+        parse_page_func=parse_page,
+        next_page_func=lambda start_url, page_url, page: page,
+        max_num_pages=None,
+        link_urls=link_urls,
+        **kwargs,
+    )
+    return links, visited
+
+
+def test_crawl_links_stops_on_known_links():
+    pages = _pages(10)
+    known = [link["url"] for page in range(2, 11) for link in pages[page]]
+    links, visited = _crawl(pages, known, max_known_links=3)
+    assert len(links) == 5
+    assert visited == [1, 2]
+
+    links, visited = _crawl(pages, known, max_known_pages=2)
+    assert visited == [1, 2, 3]
+
+    links, visited = _crawl(pages, known)
+    assert visited == list(range(1, 12))
+
+
+def test_parse_timestamp():
+    assert parse_timestamp("10 Nov 2023") == datetime(2023, 11, 10)
+    assert parse_timestamp(" 2023-11-10 ") == datetime(2023, 11, 10)
+    assert parse_timestamp("yesterday") is None
+    assert parse_timestamp(None) is None
+
+
+def test_save_link_state(tmp_path):
+    fetcher = BaseFetcher(output_dir=str(tmp_path))
+    assert fetcher.link_state == {}
+    fetcher.save_link_state(
+        [
+            {"url": "https://x/a", "timestamp": "09 Nov 2023"},
+            {"url": "https://x/b", "timestamp": "10 Nov 2023"},
+            {"url": "https://x/c", "timestamp": ""},
+        ]
+    )
+    assert fetcher.link_state["url"] == "https://x/b"
+    assert fetcher.link_state_filepath == str(tmp_path / "links.state.json")
+    fetcher.save_link_state([{"url": "https://x/old", "timestamp": "01 Jan 2020"}])
+    assert fetcher.link_state["url"] == "https://x/b"
+
+
+def test_page_partitions(tmp_path):
+    fetcher = ListingFetcher(
+        num_workers=3, max_num_pages=4, start_page=1, output_dir=str(tmp_path)
+    )
+    partitions = fetcher._page_partitions()
+    assert [(p.start_page, p.page_step, p.max_num_pages) for p in partitions] == [
+        (1, 3, 1),
+        (2, 3, 1),
+        (3, 3, 0),
+    ]
+    fetcher = ListingFetcher(
+        num_workers=3, page_partitioning=False, output_dir=str(tmp_path)
+    )
+    assert [p.page_step for p in fetcher._page_partitions()] == [1]
+
+
+def test_fetch_links_partitioned(tmp_path):
+    fetcher = ListingFetcher(num_workers=3, max_num_pages=None, output_dir=str(tmp_path))
+    fetcher.fetch_links()
+    pages = [link["page"] for link in fetcher.links]
+    assert pages == sorted(pages)
+    assert sorted(set(pages)) == list(range(1, 8))
+    assert len(fetcher.links) == 21
+    # The run finished, so nothing is left to resume
+    assert not os.path.exists(fetcher.link_filepath_tmp)
+
+
+def test_fetch_links_partitioned_skips_failed_pages(tmp_path):
+    fetcher = FlakyListingFetcher(
+        num_workers=4, max_num_pages=None, output_dir=str(tmp_path)
+    )
+    fetcher.fetch_links()
+    # A failed page does not stop the other partitions
+    assert {link["page"] for link in fetcher.links} == {1, 3, 4, 5, 6, 7}
+
+
+def test_fetch_articles_mp(tmp_path):
+    fetcher = ListingFetcher(
+        num_workers=3,
+        max_num_articles=12,
+        article_chunk_size=2,
+        article_timeout=0.5,
+        output_dir=str(tmp_path),
+    )
+    fetcher._links = [{"title": "", "url": f"https://x/{i}"} for i in range(20)]
+    fetcher._links.insert(3, {"title": "", "url": "https://x/slow"})
+    fetcher._articles = [{"url": f"https://x/{i}"} for i in range(5)]
+    start = time.perf_counter()
+    fetcher.fetch_articles()
+    assert time.perf_counter() - start < 10
+    urls = {article["url"] for article in fetcher.articles}
+    # The budget counts links without an article, across all chunks
+    assert urls == {f"https://x/{i}" for i in range(16)}
+    # Timeouts are counted apart from other errors
+    assert get_metrics().counters["article_timeouts"] == 1
+
+
+def test_fetch_articles_async(tmp_path):
+    fetcher = ListingFetcher(
+        article_engine="async",
+        max_num_articles=None,
+        article_batch_size=3,
+        output_dir=str(tmp_path),
+    )
+    fetcher.save_links([{"title": "", "url": f"https://x/{i}"} for i in range(10)])
+    fetcher.fetch_articles()
+    assert len(fetcher.article_store) == 10
+    assert not os.path.exists(fetcher.article_filepath_tmp)
+
+
+def test_resume_interrupted_fetch(tmp_path):
+    fetcher = ListingFetcher(num_workers=2, max_num_pages=None, output_dir=str(tmp_path))
+    start_url = fetcher.search_url
+    # A run that was killed after pages 1-3, and one article
+    with open(fetcher.link_filepath_tmp, "w") as f:
+        for page in range(1, 4):
+            for i in range(3):
+                link = {"title": "", "url": f"https://x/{page}/{i}", "page": page}
+                link["recovered"] = True
+                f.write(json.dumps(link) + "\n")
+        f.write('{"url": "https://x/4/0", "pa')
+    with open(fetcher.link_checkpoint_filepath, "w") as f:
+        for page in range(1, 4):
+            f.write(json.dumps({"start_url": start_url, "page": page}) + "\n")
+    with open(fetcher.article_filepath_tmp, "w") as f:
+        f.write(json.dumps({"title": "", "url": "https://x/1/0", "recovered": True}) + "\n")
+
+    assert fetcher.completed_pages == {start_url: {1, 2, 3}}
+    partitions = fetcher._resume_partitions(fetcher._page_partitions())
+    assert [p.start_page for p in partitions] == [5, 4]
+
+    fetcher.fetch_links()
+    assert len(fetcher.links) == 21
+    new_pages = {link["page"] for link in fetcher.links if not link.get("recovered")}
+    assert new_pages == {4, 5, 6, 7}
+    assert not os.path.exists(fetcher.link_filepath_tmp)
+    assert not os.path.exists(fetcher.link_checkpoint_filepath)
+
+    fetcher.max_num_articles = 2
+    fetcher.fetch_articles()
+    articles = {article["url"]: article for article in fetcher.articles}
+    assert articles["https://x/1/0"]["recovered"]
+    assert len(articles) == 3
+    assert not os.path.exists(fetcher.article_filepath_tmp)
+
+
+def test_resume_partitions_with_page_limit(tmp_path):
+    fetcher = ListingFetcher(num_workers=2, max_num_pages=3, output_dir=str(tmp_path))
+    with open(fetcher.link_checkpoint_filepath, "w") as f:
+        for page in (1, 2, 3):
+            f.write(json.dumps({"start_url": fetcher.search_url, "page": page}) + "\n")
+    # Pages 1-4 in two partitions: 1, 3 are done, 2 is done and 4 is left
+    partitions = fetcher._resume_partitions(fetcher._page_partitions())
+    assert [(p.start_page, p.max_num_pages) for p in partitions] == [(4, 0)]
+
+
+def test_iter_links_filters(tmp_path):
+    fetcher = BaseFetcher(output_dir=str(tmp_path))
+    fetcher.save_links(
+        [
+            {"url": f"https://x/{i}", "author": f"a{i % 2}", "timestamp": f"{i + 1} Nov 2023"}
+            for i in range(10)
+        ]
+    )
+    links = fetcher.iter_links(
+        columns=["url"], start=datetime(2023, 11, 3), end=datetime(2023, 11, 8), author="a0"
+    )
+    assert list(links) == [{"url": "https://x/2"}, {"url": "https://x/4"}, {"url": "https://x/6"}]
+    assert not fetcher._links
+
+
+def test_fetch_articles_streams_links(tmp_path):
+    fetcher = ListingFetcher(
+        num_workers=2,
+        max_num_articles=7,
+        article_chunk_size=2,
+        article_batch_size=3,
+        output_dir=str(tmp_path),
+    )
+    fetcher.save_links([{"title": "", "url": f"https://x/{i}"} for i in range(1000)])
+    fetcher.save_articles([{"url": "https://x/0"}])
+    fetcher.fetch_articles()
+    # Neither the links nor the articles were loaded into memory
+    assert not fetcher._links and not fetcher._articles
+    urls = {article["url"] for article in fetcher.iter_articles(columns=["url"])}
+    assert urls == {f"https://x/{i}" for i in range(8)}
@@ -1,10 +1,153 @@
+import pickle
+
+import pytest
+
+from bis_fetcher.fetcher.base import Response
 from bis_fetcher.fetcher.bis import BisFetcher
+from bis_fetcher.fetcher.parsing import (
+    PageParser,
+    available_backends,
+    benchmark_parsers,
+)
 
+LISTING_HTML = """
+<html><body><div id="cbspeeches_list"><div><table class="documentList"><tbody>
+<tr>
+  <td class="item_date">10 Nov 2023</td>
+  <td><div><div class="title"><a href="/review/r231110a.htm">A speech</a></div>
+  <a class="authorlnk dashed">Jane Doe</a></div></td>
+</tr>
+</tbody></table></div></div></body></html>
+"""
+EMPTY_HTML = "<html><body><div id='cbspeeches_list'></div></body></html>"
 
-def test_bisfetcher():
-    b = BisFetcher(start_page=1)
+
+def test_bisfetcher(tmp_path):
+    b = BisFetcher(start_page=1, output_dir=str(tmp_path))
     b.fetch()
 
 
+def _fake_request(http_text: str):
+    calls = []
+
+    def request(self, url, use_selenium=False, **kwargs):
+        calls.append("selenium" if use_selenium else "http")
+        if use_selenium:
+            return Response(text=LISTING_HTML, status_code=200, transport="selenium")
+        return Response(text=http_text, status_code=200, transport="http")
+
+    return request, calls
+
+
+def test_parse_page_links_http_fast_path(monkeypatch):
+    request, calls = _fake_request(LISTING_HTML)
+    monkeypatch.setattr(BisFetcher, "request", request)
+    links = BisFetcher()._parse_page_links("https://www.bis.org/cbspeeches/")
+    assert calls == ["http"]
+    assert links == [
+        {
+            "title": "A speech",
+            "author": "Jane Doe",
+            "timestamp": "10 Nov 2023",
+            "url": "https://www.bis.org/review/r231110a.htm",
+            "transport": "http",
+        }
+    ]
+
+
+def test_parse_page_links_selenium_fallback(monkeypatch):
+    request, calls = _fake_request(EMPTY_HTML)
+    monkeypatch.setattr(BisFetcher, "request", request)
+    links = BisFetcher()._parse_page_links("https://www.bis.org/cbspeeches/")
+    assert calls == ["http", "selenium"]
+    assert links[0]["transport"] == "selenium"
+
+    # No transport found the listing: an error, not the end of the listing
+    request, calls = _fake_request(EMPTY_HTML)
+    monkeypatch.setattr(BisFetcher, "request", request)
+    with pytest.raises(ValueError):
+        BisFetcher(transport="http")._parse_page_links("https://x")
+    assert calls == ["http"]
+
+
+SPEECH_HTML = """
+<html><body><div class="pdftxt">
+<a class="pdftitle_link" href="/review/r231110a_full.pdf">PDF</a>
+</div></body></html>
+"""
+
+
+def test_parse_article_text_predicts_pdf_url(monkeypatch):
+    heads = []
+
+    def head(self, url, **kwargs):
+        heads.append(url)
+        return Response(status_code=200 if url.endswith("r231110a.pdf") else 404)
+
+    def request(self, url, **kwargs):
+        return Response(text=SPEECH_HTML, status_code=200)
+
+    monkeypatch.setattr(BisFetcher, "head", head)
+    monkeypatch.setattr(BisFetcher, "request", request)
+    fetcher = BisFetcher()
+    assert fetcher._parse_article_text("https://www.bis.org/review/r231110a.htm") == {
+        "pdf_url": "https://www.bis.org/review/r231110a.pdf",
+        "pdf_url_source": "predicted",
+    }
+    assert fetcher._parse_article_text("https://www.bis.org/review/r231111b.htm") == {
+        "pdf_url": "https://www.bis.org/review/r231110a_full.pdf",
+        "pdf_url_source": "parsed",
+    }
+    assert heads == [
+        "https://www.bis.org/review/r231110a.pdf",
+        "https://www.bis.org/review/r231111b.pdf",
+    ]
+    fetcher = BisFetcher(verify_pdf_url=False)
+    assert fetcher._parse_article_text("https://www.bis.org/review/r1.htm")[
+        "pdf_url"
+    ] == "https://www.bis.org/review/r1.pdf"
+    assert len(heads) == 2
+
+
+def test_parser_backends_agree():
+    row = LISTING_HTML.split("<tbody>")[1].split("</tbody>")[0]
+    listing = LISTING_HTML.replace("<tbody>", "<tbody>" + row * 50)
+    timings = benchmark_parsers([listing], [SPEECH_HTML], repeat=1)
+    assert {"html.parser", "strainer"} <= set(timings)
+    for backend in available_backends():
+        parser = PageParser(
+            backend,
+            container_attrs={"class": "documentList"},
+            title_attrs={"class": "title"},
+        )
+        assert len(parser.parse_listing(listing)) == 51
+        assert parser.parse_listing(EMPTY_HTML) is None
+        assert parser.parse_pdf_href(SPEECH_HTML) == "/review/r231110a_full.pdf"
+        assert parser.parse_pdf_href(EMPTY_HTML) is None
+    with pytest.raises(ValueError):
+        PageParser("html5")
+
+
+def test_page_parser_is_pickled_with_the_fetcher(monkeypatch):
+    request, _ = _fake_request(LISTING_HTML)
+    monkeypatch.setattr(BisFetcher, "request", request)
+    fetcher = BisFetcher(parser_backend="html.parser")
+    assert fetcher.page_parser is fetcher.page_parser
+    fetcher = pickle.loads(pickle.dumps(fetcher))
+    assert fetcher.page_parser.backend == "html.parser"
+    assert fetcher._parse_page_links("https://x")[0]["author"] == "Jane Doe"
+
+
+def test_parse_article_text_raises_timeouts(monkeypatch):
+    def request(self, url, **kwargs):
+        raise TimeoutError("Timed out after 60.0 seconds")
+
+    monkeypatch.setattr(BisFetcher, "request", request)
+    fetcher = BisFetcher(predict_pdf_url=False)
+    # Other errors are logged and skipped, timeouts are left to the caller
+    with pytest.raises(TimeoutError):
+        fetcher._parse_article_text("https://www.bis.org/review/r1.htm")
+
+
 if __name__ == "__main__":
     test_bisfetcher()
@@ -0,0 +1,103 @@
+import os
+from http.server import BaseHTTPRequestHandler
+
+import pytest
+from bis_fetcher.fetcher.base import BaseFetcher
+from bis_fetcher.fetcher.cache import HttpCache
+
+PAGE = "<html><body>" + "<p>speech</p>" * 1000 + "</body></html>"
+
+
+class PageHandler(BaseHTTPRequestHandler):
+    etag = '"v1"'
+    requests_seen = []
+
+    def do_GET(self):
+        conditional = self.headers.get("If-None-Match")
+        self.requests_seen.append((self.path, conditional))
+        if conditional == self.etag:
+            self.send_response(304)
+            self.send_header("ETag", self.etag)
+            self.end_headers()
+            return
+        body = PAGE.encode()
+        self.send_response(200)
+        self.send_header("ETag", self.etag)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def handler():
+    PageHandler.requests_seen = []
+    PageHandler.etag = '"v1"'
+    return PageHandler
+
+
+def test_conditional_requests(server, tmp_path):
+    fetcher = BaseFetcher(output_dir=str(tmp_path), http_cache=True)
+    url = f"{server}/review/r1.htm"
+    response = fetcher.request(url)
+    assert response.text == PAGE and not response.from_cache
+    response = fetcher.request(url)
+    assert response.text == PAGE and response.from_cache
+    assert PageHandler.requests_seen == [
+        ("/review/r1.htm", None),
+        ("/review/r1.htm", '"v1"'),
+    ]
+
+    # A changed page is downloaded again and replaces the entry
+    PageHandler.etag = '"v2"'
+    assert not fetcher.request(url).from_cache
+    assert fetcher.response_cache.get(url)["etag"] == '"v2"'
+
+    # Query parameters are part of the key
+    fetcher.request(f"{server}/list", params={"page": 2})
+    assert fetcher.response_cache.get(f"{server}/list?page=2")["text"] == PAGE
+
+
+def test_ttl_and_replay(server, tmp_path):
+    fetcher = BaseFetcher(
+        output_dir=str(tmp_path), http_cache=True, http_cache_ttl=3600
+    )
+    url = f"{server}/review/r1.htm"
+    fetcher.request(url)
+    assert fetcher.request(url).from_cache
+    assert len(PageHandler.requests_seen) == 1
+
+    # With no TTL, cached pages are replayed without a server
+    replay = BaseFetcher(
+        output_dir=str(tmp_path), http_cache=True, http_cache_ttl=None
+    )
+    assert replay.request(url).text == PAGE
+    assert len(PageHandler.requests_seen) == 1
+
+    uncached = BaseFetcher(output_dir=str(tmp_path))
+    assert uncached.response_cache is None
+    uncached.request(url)
+    assert len(PageHandler.requests_seen) == 2
+
+
+def test_lru_eviction(tmp_path):
+    cache = HttpCache(str(tmp_path), ttl=None, max_bytes=None)
+    for i in range(10):
+        cache.put(f"https://x/{i}", os.urandom(500).hex())
+    entry_size = cache.num_bytes // 10
+    assert cache.num_bytes > 0
+
+    cache = HttpCache(str(tmp_path), ttl=None, max_bytes=entry_size * 10)
+    # Use the oldest entry, so the second oldest is evicted first
+    os.utime(cache._path("https://x/0"), (0, 1))
+    for i in range(1, 10):
+        os.utime(cache._path(f"https://x/{i}"), (0, 1 + i))
+    assert cache.get("https://x/0") is not None
+    cache.put("https://x/10", os.urandom(500).hex())
+    assert cache.num_bytes <= entry_size * 10 * 0.9
+    assert cache.get("https://x/0") is not None
+    assert cache.get("https://x/1") is None
+    assert cache.get("https://x/10") is not None
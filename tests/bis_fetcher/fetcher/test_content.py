@@ -0,0 +1,133 @@
+import json
+import os
+from http.server import BaseHTTPRequestHandler
+
+import pytest
+from bis_fetcher.fetcher.base import BaseFetcher
+from bis_fetcher.fetcher.content import ContentIndex, text_hash
+from bis_fetcher.fetcher.download import download_file
+from bis_fetcher.fetcher.replay import make_pdf
+
+
+class FileHandler(BaseHTTPRequestHandler):
+    """Serves `files` without ETags, like a server that replaces files in place."""
+
+    files = {}
+
+    def _send(self, body):
+        body, last_modified = self.files[self.path]
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Last-Modified", last_modified)
+        self.end_headers()
+        return body
+
+    def do_HEAD(self):
+        self._send(None)
+
+    def do_GET(self):
+        self.wfile.write(self._send(None))
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def handler():
+    FileHandler.files = {}
+    return FileHandler
+
+
+def test_content_index(tmp_path):
+    assert text_hash("Monetary  policy\n") == text_hash("monetary policy")
+    filepath = str(tmp_path / "articles.jsonl.content")
+    index = ContentIndex(filepath)
+    assert index.update("https://x/a.pdf", sha256="1")["canonical_url"] == "https://x/a.pdf"
+    assert index.update("https://x/b.pdf", sha256="1")["canonical_url"] == "https://x/a.pdf"
+    # Different bytes, same text
+    index.update("https://x/c.pdf", sha256="2")
+    index.update("https://x/a.pdf", text_sha256="t")
+    assert index.update("https://x/c.pdf", text_sha256="t")["canonical_url"] == "https://x/a.pdf"
+    index.update("https://x/a.pdf", aliases=["https://x/a.htm"])
+    # Updates are written once, on flush, with the last record of each url
+    assert not os.path.exists(filepath)
+    index.flush()
+    assert len(open(filepath).readlines()) == 3
+    index.update("https://x/a.pdf", sha256="1")
+    index.flush()
+    assert len(open(filepath).readlines()) == 3
+
+    index = ContentIndex(filepath)
+    assert index.canonical_url("https://x/b.pdf") == "https://x/a.pdf"
+    assert list(index.aliases) == ["https://x/a.htm"]
+    # The content of the canonical url changed
+    index.update("https://x/a.pdf", sha256="3")
+    assert index.update("https://x/d.pdf", sha256="1")["canonical_url"] == "https://x/d.pdf"
+
+
+def test_download_detects_replaced_content(server, http_request, tmp_path):
+    url = f"{server}/review/r1.pdf"
+    filepath = str(tmp_path / "r1.pdf")
+    FileHandler.files["/review/r1.pdf"] = (b"a" * 100, "Mon, 06 Nov 2023 10:00:00 GMT")
+    record = download_file(http_request, url, filepath)
+    mtime = os.stat(filepath).st_mtime_ns
+
+    # Touched on the server, same bytes: the file is fetched but left in place
+    FileHandler.files["/review/r1.pdf"] = (b"a" * 100, "Tue, 07 Nov 2023 10:00:00 GMT")
+    record = download_file(http_request, url, filepath, previous=record)
+    assert record["status"] == "unchanged"
+    assert record["bytes"] == 100
+    assert os.stat(filepath).st_mtime_ns == mtime
+    assert not os.path.exists(filepath + ".part")
+
+    # Replaced with content of the same size
+    FileHandler.files["/review/r1.pdf"] = (b"b" * 100, "Wed, 08 Nov 2023 10:00:00 GMT")
+    new_record = download_file(http_request, url, filepath, previous=record)
+    assert new_record["status"] == "downloaded"
+    assert new_record["sha256"] != record["sha256"]
+    assert open(filepath, "rb").read() == b"b" * 100
+
+
+def test_fetcher_collapses_duplicates(server, tmp_path):
+    last_modified = "Mon, 06 Nov 2023 10:00:00 GMT"
+    speech = make_pdf(["Monetary policy"])
+    FileHandler.files = {
+        "/review/r1.pdf": (speech, last_modified),
+        "/mirror/r1.pdf": (speech, last_modified),
+        "/review/r2.pdf": (make_pdf(["Monetary  policy"], padding=100), last_modified),
+        "/review/r3.pdf": (make_pdf(["Financial stability"]), last_modified),
+    }
+    fetcher = BaseFetcher(output_dir=str(tmp_path), download_workers=1, extract_workers=2)
+    fetcher.save_articles(
+        [
+            {"url": f"{server}/review/r1.htm", "pdf_url": f"{server}/review/r1.pdf"},
+            {"url": f"{server}/review/r1.pdf", "pdf_url": f"{server}/review/r1.pdf"},
+            {"url": f"{server}/mirror/r1.htm", "pdf_url": f"{server}/mirror/r1.pdf"},
+            {"url": f"{server}/review/r2.htm", "pdf_url": f"{server}/review/r2.pdf"},
+            {"url": f"{server}/review/r3.htm", "pdf_url": f"{server}/review/r3.pdf"},
+        ]
+    )
+    assert len(fetcher.article_store) == 4
+    assert list(fetcher.content_index.aliases) == [f"{server}/review/r1.pdf"]
+
+    records = {record["url"]: record for record in fetcher.fetch_pdfs()}
+    assert records[f"{server}/mirror/r1.pdf"]["canonical_url"] == f"{server}/review/r1.pdf"
+    assert "canonical_url" not in records[f"{server}/review/r2.pdf"]
+
+    assert fetcher.extract_texts() == {"extracted": 3, "skipped": 1, "failed": 0}
+    texts = {
+        record["url"]: record
+        for record in map(json.loads, open(fetcher.text_filepath))
+    }
+    assert texts[f"{server}/mirror/r1.pdf"]["skipped"]
+    # r2 has other bytes but the same text as r1
+    assert "text" not in texts[f"{server}/review/r2.pdf"]
+    assert texts[f"{server}/review/r2.pdf"]["duplicate_of"].endswith("/review/r1.pdf")
+    index = ContentIndex(fetcher.content_index_filepath)
+    assert index.canonical_url(f"{server}/review/r2.pdf") == f"{server}/review/r1.pdf"
+    assert index.canonical_url(f"{server}/review/r3.pdf") == f"{server}/review/r3.pdf"
+
+    # Nothing changed: nothing is downloaded or extracted again
+    statuses = {record["status"] for record in fetcher.fetch_pdfs()}
+    assert statuses == {"unchanged"}
+    assert fetcher.extract_texts() == {"extracted": 0, "skipped": 4, "failed": 0}
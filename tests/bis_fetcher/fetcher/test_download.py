@@ -0,0 +1,108 @@
+from http.server import BaseHTTPRequestHandler
+
+import pytest
+from bis_fetcher.fetcher.base import BaseFetcher
+from bis_fetcher.fetcher.download import download_file, download_files, url_to_filepath
+from bis_fetcher.fetcher.writer import read_jsonl
+from hyfi.main import HyFI
+
+CONTENT = bytes(range(256)) * 1000
+
+
+class PdfHandler(BaseHTTPRequestHandler):
+    etag = '"v1"'
+    requests_seen = []
+
+    def _send_headers(self, status, length, extra=None):
+        self.send_response(status)
+        self.send_header("ETag", self.etag)
+        self.send_header("Content-Length", str(length))
+        for key, value in (extra or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+
+    def do_HEAD(self):
+        self.requests_seen.append(("HEAD", None))
+        self._send_headers(200, len(CONTENT))
+
+    def do_GET(self):
+        range_ = self.headers.get("Range")
+        self.requests_seen.append(("GET", range_))
+        if range_ and self.headers.get("If-Range", self.etag) == self.etag:
+            start = int(range_.split("=")[1].rstrip("-"))
+            body = CONTENT[start:]
+            self._send_headers(206, len(body))
+        else:
+            body = CONTENT
+            self._send_headers(200, len(body))
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def handler():
+    PdfHandler.requests_seen = []
+    return PdfHandler
+
+
+def test_download_file(server, http_request, tmp_path):
+    url = f"{server}/review/r231110a.pdf"
+    filepath = url_to_filepath(url, str(tmp_path))
+    assert filepath == str(tmp_path / "review" / "r231110a.pdf")
+
+    record = download_file(http_request, url, filepath, chunk_size=1000)
+    assert record["status"] == "downloaded"
+    assert record["bytes"] == record["size"] == len(CONTENT)
+    assert record["etag"] == '"v1"'
+    assert open(filepath, "rb").read() == CONTENT
+
+    record = download_file(http_request, url, filepath, previous=record)
+    assert record["status"] == "unchanged"
+    assert record["bytes"] == 0
+    assert PdfHandler.requests_seen[-1] == ("HEAD", None)
+
+
+def test_download_file_resumes(server, http_request, tmp_path):
+    url = f"{server}/review/r231110a.pdf"
+    filepath = str(tmp_path / "r231110a.pdf")
+    with open(filepath + ".part", "wb") as f:
+        f.write(CONTENT[:1000])
+    record = download_file(http_request, url, filepath, previous={"etag": '"v1"'})
+    assert record["status"] == "resumed"
+    assert record["bytes"] == len(CONTENT) - 1000
+    assert record["size"] == len(CONTENT)
+    assert PdfHandler.requests_seen == [("GET", "bytes=1000-")]
+    assert open(filepath, "rb").read() == CONTENT
+
+
+def test_download_files(server, http_request, tmp_path):
+    jobs = [
+        (f"{server}/review/r{i}.pdf", str(tmp_path / f"r{i}.pdf")) for i in range(5)
+    ]
+    jobs.append(("http://127.0.0.1:1/missing.pdf", str(tmp_path / "missing.pdf")))
+    records = list(download_files(http_request, jobs, num_workers=3))
+    statuses = sorted(record["status"] for record in records)
+    assert statuses == ["downloaded"] * 5 + ["failed"]
+
+
+def test_fetch_pdfs(server, tmp_path):
+    fetcher = BaseFetcher(output_dir=str(tmp_path))
+    fetcher._articles = [
+        {"url": f"{server}/review/r{i}.htm", "pdf_url": f"{server}/review/r{i}.pdf"}
+        for i in range(3)
+    ]
+    records = fetcher.fetch_pdfs()
+    assert sorted(record["status"] for record in records) == ["downloaded"] * 3
+    assert (tmp_path / "pdfs" / "review" / "r0.pdf").read_bytes() == CONTENT
+    records = fetcher.fetch_pdfs()
+    assert sorted(record["status"] for record in records) == ["unchanged"] * 3
+    assert len(HyFI.load_jsonl(fetcher.pdf_manifest_filepath)) == 6
+
+    # A record cut short by an interrupted run
+    with open(fetcher.pdf_manifest_filepath, "a") as f:
+        f.write('{"url": "')
+    records = fetcher.fetch_pdfs()
+    assert len(records) == 3
+    assert len(list(read_jsonl(fetcher.pdf_manifest_filepath))) == 9
@@ -0,0 +1,39 @@
+import json
+
+from bis_fetcher.fetcher.extract import extract_pdf_text, extract_pdf_texts
+from bis_fetcher.fetcher.replay import make_pdf
+
+
+def test_extract_pdf_text(tmp_path):
+    filepath = tmp_path / "speech.pdf"
+    filepath.write_bytes(make_pdf(["Monetary policy", "Financial stability"]))
+    [record] = extract_pdf_text(str(filepath))
+    assert record["num_pages"] == 2
+    assert "Monetary policy" in record["text"]
+    assert "Financial stability" in record["text"]
+    pages = extract_pdf_text(str(filepath), per_page=True)
+    assert [page["page"] for page in pages] == [0, 1]
+    assert pages[0]["sha256"] == record["sha256"]
+
+
+def test_extract_pdf_texts_is_incremental(tmp_path):
+    pdfs = []
+    for i in range(3):
+        filepath = tmp_path / f"speech{i}.pdf"
+        filepath.write_bytes(make_pdf([f"Speech number {i}"]))
+        pdfs.append(str(filepath))
+    (tmp_path / "copy.pdf").write_bytes((tmp_path / "speech0.pdf").read_bytes())
+    (tmp_path / "broken.pdf").write_bytes(b"not a pdf")
+    text_filepath = str(tmp_path / "texts.jsonl")
+
+    counts = extract_pdf_texts(
+        pdfs, text_filepath, num_workers=2, urls={pdfs[0]: "https://x/0.pdf"}
+    )
+    assert counts == {"extracted": 3, "skipped": 0, "failed": 0}
+    records = [json.loads(line) for line in open(text_filepath)]
+    assert {r["path"]: r.get("url") for r in records}[pdfs[0]] == "https://x/0.pdf"
+
+    more = pdfs + [str(tmp_path / "copy.pdf"), str(tmp_path / "broken.pdf")]
+    counts = extract_pdf_texts(more, text_filepath, num_workers=2)
+    assert counts == {"extracted": 0, "skipped": 4, "failed": 1}
+    assert len(open(text_filepath).readlines()) == 4
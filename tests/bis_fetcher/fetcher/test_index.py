@@ -0,0 +1,52 @@
+from bis_fetcher.fetcher.base import crawl_links
+from bis_fetcher.fetcher.index import (
+    BloomFilter,
+    UrlIndex,
+    get_shared_index,
+    init_shared_indexes,
+    url_hash,
+)
+
+URLS = [f"https://www.bis.org/review/r{i:06d}a.htm" for i in range(5000)]
+
+
+def test_url_index():
+    index = UrlIndex(URLS[:100])
+    assert len(index) == 100
+    assert URLS[0] in index and URLS[99] in index
+    assert URLS[100] not in index
+    index.add(URLS[0])
+    assert len(index) == 100
+    assert url_hash(URLS[0]) == url_hash(URLS[0]) != url_hash(URLS[1])
+
+
+def test_bloom_index():
+    index = UrlIndex.build(URLS[:2500], bloom_threshold=1000, error_rate=0.01)
+    assert index.is_bloom
+    assert all(url in index for url in URLS[:2500])
+    false_positives = sum(url in index for url in URLS[2500:])
+    assert false_positives < 0.02 * 2500
+    assert not UrlIndex.build(URLS[:10], bloom_threshold=1000).is_bloom
+    # Streamed, with the size known up front
+    index = UrlIndex.build(
+        (url for url in URLS[:2500]), bloom_threshold=1000, size_hint=2500
+    )
+    assert index.is_bloom and all(url in index for url in URLS[:2500])
+
+    bloom = BloomFilter(capacity=10)
+    bloom.add(42)
+    assert 42 in bloom
+
+
+def test_crawl_links_uses_shared_index():
+    init_shared_indexes({"links": UrlIndex(URLS[:2])})
+    pages = {1: [{"url": URLS[0]}, {"url": URLS[2]}, {"url": URLS[2]}], 2: None}
+    links = crawl_links(
+        "start",
+        parse_page_func=lambda page_url: pages[page_url],
+        next_page_func=lambda start_url, page_url, page: page,
+        max_num_pages=5,
+    )
+    assert [link["url"] for link in links] == [URLS[2]]
+    assert URLS[2] in get_shared_index("links")
+    init_shared_indexes({})
@@ -0,0 +1,90 @@
+import json
+import logging
+import os
+
+from bis_fetcher.fetcher.base import scrape_article_text
+from bis_fetcher.fetcher.bis import BisFetcher
+from bis_fetcher.fetcher.metrics import Metrics
+from bis_fetcher.fetcher.replay import LISTING_URL, ReplayServer, build_synthetic_archive
+
+
+def test_histograms_and_merge():
+    metrics = Metrics(buckets=(0.1, 1.0))
+    for seconds in (0.05, 0.05, 0.5, 2.0):
+        metrics.observe("http_get", seconds)
+    metrics.inc("retries")
+    metrics.set_gauge("writer_queue_depth", 5)
+    metrics.set_gauge("writer_queue_depth", 2)
+    assert metrics.quantile("http_get", 0.5) == 0.1
+    assert metrics.quantile("http_get", 0.75) == 1.0
+    assert metrics.quantile("http_get", 1.0) == float("inf")
+
+    worker = Metrics(buckets=(0.1, 1.0))
+    worker.observe("http_get", 0.5)
+    worker.inc("retries", 2)
+    # Later snapshots of the same worker replace the earlier ones
+    metrics.merge([{**worker.snapshot(), "counters": {"retries": 100}}, worker.snapshot()])
+    summary = metrics.summary()
+    assert summary["counters"] == {"retries": 3}
+    assert summary["gauges"]["writer_queue_depth"] == {"last": 2, "max": 5}
+    assert summary["stages"]["http_get"]["count"] == 5
+    assert summary["stages"]["http_get"]["buckets"] == {"0.1": 2, "1.0": 2, "+Inf": 1}
+
+    text = metrics.to_prometheus(labels={"phase": "links"})
+    assert 'bis_fetcher_retries_total{phase="links"} 3' in text
+    assert 'bis_fetcher_stage_seconds_bucket{phase="links",stage="http_get",le="1.0"} 4' in text
+    assert 'bis_fetcher_stage_seconds_count{phase="links",stage="http_get"} 5' in text
+
+
+def test_fetcher_writes_phase_metrics(tmp_path):
+    archive_dir = str(tmp_path / "archive")
+    build_synthetic_archive(archive_dir, num_pages=2, per_page=5, pdf_size=1000)
+    output_dir = tmp_path / "out"
+    with ReplayServer(archive_dir) as server:
+        fetcher = BisFetcher(
+            base_url=server.url,
+            search_url=server.url + LISTING_URL.split("bis.org", 1)[1],
+            output_dir=str(output_dir),
+            transport="http",
+            http_cache=False,
+            max_num_pages=None,
+            max_num_articles=None,
+            num_workers=2,
+            article_chunk_size=2,
+            predict_pdf_url=False,
+            print_every=1,
+            metrics_format="json",
+            profiler="cprofile",
+        )
+        fetcher.fetch()
+        fetcher.metrics_format = "prometheus"
+        fetcher.fetch_pdfs()
+
+    links = json.loads((output_dir / "metrics.links.json").read_text())
+    assert links["phase"] == "links"
+    assert links["stages"]["parse_listing"]["count"] == 2
+    assert links["counters"]["jsonl_records"] >= 10
+    # Parsed in the workers, reported to the parent
+    articles = json.loads((output_dir / "metrics.articles.json").read_text())
+    assert articles["stages"]["parse_speech"]["count"] == 10
+    assert articles["counters"]["http_status_200"] == 10
+    assert articles["gauges"]["chunks_in_flight"]["max"] >= 1
+    pdfs = (output_dir / "metrics.pdfs.prom").read_text()
+    assert 'bis_fetcher_pdf_downloaded_total{phase="pdfs"} 10' in pdfs
+    assert (output_dir / "profile.articles.prof").exists()
+    assert not os.path.exists(fetcher.metrics_filepath_tmp)
+
+
+def test_scrape_progress_counts_articles(caplog):
+    links = [{"url": f"https://x/{i}", "title": str(i)} for i in range(10)]
+    with caplog.at_level(logging.INFO):
+        scrape_article_text(
+            links,
+            lambda url: None if url.endswith(("1", "2")) else {"text": url},
+            article_urls=[],
+            max_num_articles=None,
+            print_every=4,
+            verbose=True,
+        )
+    scraped = [r.getMessage() for r in caplog.records if r.getMessage().startswith("Scraped ")]
+    assert scraped == ["Scraped 4 articles, last: [5](https://x/5)", "Scraped 8 articles, last: [9](https://x/9)"]
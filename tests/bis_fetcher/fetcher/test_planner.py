@@ -0,0 +1,116 @@
+from datetime import date, timedelta
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+from bis_fetcher.fetcher.base import read_jsonl
+from bis_fetcher.fetcher.bis import BisFetcher
+from bis_fetcher.fetcher.planner import date_windows, parse_date, plan_crawl
+
+
+class ShardedFetcher(BisFetcher):
+    search_url: str = "https://x/list?page={page}"
+
+    def _parse_page_links(self, page_url, print_every=10, verbose=False):
+        query = parse_qs(urlsplit(page_url).query)
+        page = int(query["page"][0])
+        if page > 2:
+            return None
+        year = query["fromDate"][0][-4:]
+        return [
+            {"title": "", "url": f"https://x/{year}/{page}/{i}", "timestamp": ""}
+            for i in range(3)
+        ]
+
+
+class FlakyShardedFetcher(ShardedFetcher):
+    def _parse_page_links(self, page_url, print_every=10, verbose=False):
+        if "page=2&" in page_url:
+            raise TimeoutError("Read timed out")
+        return super()._parse_page_links(page_url, print_every, verbose)
+
+
+def test_date_windows():
+    assert date_windows(date(2023, 11, 15), date(2024, 2, 10), "quarter") == [
+        (date(2023, 11, 15), date(2023, 12, 31)),
+        (date(2024, 1, 1), date(2024, 2, 10)),
+    ]
+    assert [last for _, last in date_windows(date(2024, 1, 1), date(2024, 3, 5), "month")] == [
+        date(2024, 1, 31),
+        date(2024, 2, 29),
+        date(2024, 3, 5),
+    ]
+    # 2024-01-03 is a Wednesday
+    assert date_windows(date(2024, 1, 3), date(2024, 1, 10), "week")[0][1] == date(2024, 1, 7)
+    assert len(date_windows(date(2024, 1, 1), date(2024, 1, 10), "3d")) == 4
+    with pytest.raises(ValueError):
+        date_windows(date(2024, 1, 1), date(2024, 1, 10), "fortnight")
+    assert parse_date("2020", end=True) == date(2020, 12, 31)
+    assert parse_date("") is None
+
+
+def test_plan_crawl():
+    shards = plan_crawl(
+        "https://x/list?m=256&page={page}",
+        date(2022, 6, 1),
+        date(2023, 3, 1),
+        institutions=["ecb", "fed"],
+    )
+    assert [(s.start.year, s.institution) for s in shards] == [
+        (2023, "ecb"),
+        (2023, "fed"),
+        (2022, "ecb"),
+        (2022, "fed"),
+    ]
+    assert shards[-1].url == (
+        "https://x/list?m=256&page={page}"
+        "&fromDate=01%2F06%2F2022&tillDate=31%2F12%2F2022&institutions=fed"
+    )
+    assert len(plan_crawl("https://x/{page}", date(2022, 1, 1), date(2022, 1, 1))) == 1
+
+
+def test_completed_shards_are_skipped(tmp_path):
+    year = date.today().year
+    fetcher = ShardedFetcher(
+        output_dir=str(tmp_path),
+        crawl_start=str(year - 2),
+        num_workers=3,
+        max_num_pages=None,
+    )
+    fetcher.fetch_links()
+    assert len(fetcher.links) == 3 * 6
+    completed = fetcher.completed_shards
+    assert len(completed) == 3
+    # The current year can still get speeches
+    assert [record["final"] for record in read_jsonl(fetcher.shard_state_filepath)].count(True) == 2
+    assert {p.start_url for p in fetcher._page_partitions()} == {fetcher.crawl_plan[0].url}
+
+    # A crawl cut short by the page limit is not complete
+    past_year = {
+        "crawl_start": str(year - 2),
+        "crawl_end": (date(year, 1, 1) - timedelta(days=1)).isoformat(),
+    }
+    fetcher = ShardedFetcher(
+        output_dir=str(tmp_path / "limited"), num_workers=1, max_num_pages=1, **past_year
+    )
+    fetcher.fetch_links()
+    assert len(fetcher.links) == 2 * 6
+    assert not any(record["final"] for record in fetcher.completed_shards.values())
+
+    # One partition per shard, ending before the page limit
+    fetcher = ShardedFetcher(
+        output_dir=str(tmp_path / "unpartitioned"), num_workers=1, max_num_pages=10, **past_year
+    )
+    fetcher.fetch_links()
+    assert [record["final"] for record in fetcher.completed_shards.values()] == [True, True]
+
+    # A page that failed leaves its shard to be crawled again
+    fetcher = FlakyShardedFetcher(
+        output_dir=str(tmp_path / "flaky"), num_workers=3, max_num_pages=None, **past_year
+    )
+    fetcher.fetch_links()
+    assert len(fetcher.links) == 2 * 3
+    assert not any(record["final"] for record in fetcher.completed_shards.values())
+    assert {p.start_url for p in fetcher._page_partitions()} == {
+        shard.url for shard in fetcher.crawl_plan
+    }
@@ -0,0 +1,97 @@
+import multiprocessing as mp
+import time
+
+from bis_fetcher.fetcher.base import BaseFetcher
+from bis_fetcher.fetcher.ratelimit import (
+    RateLimiter,
+    get_shared_rate_limiter,
+    init_shared_rate_limiters,
+    shared_rate_limiters,
+)
+from bis_fetcher.fetcher.session import request_with_retries
+
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+class FakeSession:
+    def __init__(self, outcomes):
+        self.outcomes = list(outcomes)
+
+    def request(self, method, url, timeout=None, **kwargs):
+        return self.outcomes.pop(0)
+
+
+def _acquire(num_requests):
+    limiter = next(iter(shared_rate_limiters().values()))
+    for _ in range(num_requests):
+        limiter.acquire()
+
+
+def test_rate_is_shared_by_processes():
+    init_shared_rate_limiters({})
+    get_shared_rate_limiter(rate=40.0, adaptive=False)
+    start = time.perf_counter()
+    with mp.Pool(
+        4, initializer=init_shared_rate_limiters, initargs=(shared_rate_limiters(),)
+    ) as pool:
+        pool.map(_acquire, [10] * 4)
+        pool.close()
+        pool.join()
+    # 40 requests at 40/s, whatever the number of workers
+    assert time.perf_counter() - start >= 39 / 40
+
+
+def test_aimd():
+    limiter = RateLimiter(10.0, min_rate=2.0, max_rate=12.0, target_latency=1.0)
+    for _ in range(10):
+        limiter.record(0.1, 200)
+    assert 10.9 < limiter.rate <= 11.0
+    for _ in range(100):
+        limiter.record(0.1, 200)
+    assert limiter.rate == 12.0
+
+    limiter.record(0.1, 429)
+    assert limiter.rate == 6.0
+    # Responses to requests already in flight do not count again
+    limiter.record(2.0, 200)
+    limiter.record(0.1, None)
+    assert limiter.rate == 6.0
+
+    limiter.decrease_cooldown = 0.0
+    limiter.record(2.0, 200)
+    limiter.record(0.1, 503)
+    assert limiter.rate == 2.0
+
+
+def test_retry_after_holds_requests_back():
+    limiter = RateLimiter(100.0, adaptive=False)
+    limiter.record(0.1, 429, retry_after=0.3)
+    assert limiter.rate == 100.0
+    assert limiter.acquire() > 0.2
+
+
+def test_request_with_retries_reports_to_limiter(monkeypatch):
+    monkeypatch.setattr("bis_fetcher.fetcher.session.time.sleep", lambda delay: None)
+    limiter = RateLimiter(1000.0)
+    session = FakeSession([FakeResponse(429), FakeResponse(200)])
+    response = request_with_retries(session, "GET", "https://x", rate_limiter=limiter)
+    assert response.status_code == 200
+    assert 500.0 < limiter.rate < 501.0
+
+
+def test_fetcher_rate_limiter():
+    init_shared_rate_limiters({})
+    assert BaseFetcher().rate_limiter is None
+    limiter = BaseFetcher(delay_between_requests=0.5).rate_limiter
+    assert limiter.rate == 2.0
+    assert BaseFetcher(rate_limit=2.0).rate_limiter is limiter
+    assert BaseFetcher(rate_limit=3.0).rate_limiter is not limiter
+    # The configured rate is a ceiling unless a higher one is given
+    for _ in range(100):
+        limiter.record(0.1, 200)
+    assert limiter.rate == 2.0
+    assert BaseFetcher(rate_limit=2.0, rate_limit_max=4.0).rate_limiter.max_rate == 4.0
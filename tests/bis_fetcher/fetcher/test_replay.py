@@ -0,0 +1,98 @@
+import pytest
+import requests
+from bis_fetcher.fetcher.benchmark import run_benchmarks
+from bis_fetcher.fetcher.bis import BisFetcher
+from bis_fetcher.fetcher.replay import (
+    LISTING_URL,
+    FixtureArchive,
+    ReplayServer,
+    build_synthetic_archive,
+)
+from bis_fetcher.fetcher.session import get_session
+
+LISTING_PATH = LISTING_URL.split("bis.org", 1)[1]
+
+
+@pytest.fixture
+def archive_dir(tmp_path):
+    archive_dir = str(tmp_path / "archive")
+    build_synthetic_archive(archive_dir, num_pages=3, per_page=4, pdf_size=5000)
+    return archive_dir
+
+
+def _fetcher(server, output_dir, **kwargs):
+    return BisFetcher(
+        base_url=server.url,
+        search_url=server.url + LISTING_PATH,
+        output_dir=str(output_dir),
+        transport="http",
+        http_cache=False,
+        max_num_pages=None,
+        max_num_articles=None,
+        **kwargs,
+    )
+
+
+def test_replay_fetch(archive_dir, tmp_path):
+    with ReplayServer(archive_dir) as server:
+        fetcher = _fetcher(server, tmp_path / "out")
+        fetcher.fetch_links()
+        assert len(fetcher.links) == 12
+        assert server.stats["listing_requests"] == 3
+        assert server.stats["missing_requests"] == 1
+
+        fetcher.fetch_articles()
+        articles = fetcher.articles
+        assert len(articles) == 12
+        assert all(a["pdf_url_source"] == "predicted" for a in articles)
+
+        records = fetcher.fetch_pdfs()
+        assert [r["status"] for r in records] == ["downloaded"] * 12
+        assert server.stats["pdf_bytes"] == sum(r["bytes"] for r in records)
+
+
+def test_replay_server_responses(archive_dir):
+    url = LISTING_PATH.format(page=1)
+    with ReplayServer(archive_dir) as server:
+        response = requests.get(server.url + url)
+        etag = response.headers["ETag"]
+        assert response.status_code == 200 and "documentList" in response.text
+        assert requests.get(server.url + url, headers={"If-None-Match": etag}).status_code == 304
+        partial = requests.get(server.url + url, headers={"Range": "bytes=10-"})
+        assert partial.status_code == 206 and partial.content == response.content[10:]
+        assert requests.head(server.url + url).status_code == 200
+        assert requests.get(server.url + "/missing.htm").status_code == 404
+
+    with ReplayServer(archive_dir, error_rate=1.0) as server:
+        assert requests.get(server.url + url).status_code == 503
+        assert server.stats["error_requests"] == 1
+
+
+def test_record_and_replay(archive_dir, tmp_path):
+    record_dir = str(tmp_path / "recorded")
+    with ReplayServer(archive_dir) as server:
+        fetcher = _fetcher(server, tmp_path / "out", record_dir=record_dir)
+        fetcher.fetch_links()
+        fetcher.fetch_articles()
+        fetcher.fetch_pdfs()
+    get_session(fetcher.http_pool_size).hooks["response"].clear()
+
+    recorded = FixtureArchive(record_dir)
+    # Listing pages, the 404 after the last one and the PDFs, but no HEAD checks
+    assert sorted({method for method, _ in recorded.entries}) == ["GET"]
+    assert len(recorded.entries) == 3 + 1 + 12
+
+    with ReplayServer(record_dir) as server:
+        replayed = _fetcher(server, tmp_path / "replayed")
+        replayed.fetch_links()
+        replayed.fetch_articles()
+        assert [a["url"].split("/")[-1] for a in replayed.articles] == [
+            a["url"].split("/")[-1] for a in fetcher.articles
+        ]
+
+
+def test_run_benchmarks(archive_dir):
+    results = run_benchmarks(archive_dir, cases=["links-http"])
+    assert results[0]["links"] == 12
+    assert results[0]["pages_per_s"] > 0
+    assert results[0]["peak_rss_mb"] > 0
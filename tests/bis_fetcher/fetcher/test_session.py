@@ -0,0 +1,74 @@
+import pytest
+import requests
+from bis_fetcher.fetcher import session as session_module
+from bis_fetcher.fetcher.session import (
+    backoff_delay,
+    get_session,
+    get_with_retries,
+    retry_after_seconds,
+)
+
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+class FakeSession:
+    def __init__(self, outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    def request(self, method, url, timeout=None, **kwargs):
+        self.calls += 1
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    delays = []
+    monkeypatch.setattr(session_module.time, "sleep", delays.append)
+    return delays
+
+
+def test_get_session_is_reused():
+    assert get_session(4) is get_session(4)
+    assert get_session(4) is not get_session(8)
+
+
+def test_retry_after_and_backoff():
+    assert retry_after_seconds(FakeResponse(429, {"Retry-After": "7"})) == 7.0
+    assert retry_after_seconds(FakeResponse(429)) is None
+    assert retry_after_seconds(FakeResponse(429, {"Retry-After": "soon"})) is None
+    for attempt in range(5):
+        assert 0 <= backoff_delay(attempt, 0.5, 4.0) <= min(4.0, 0.5 * 2**attempt)
+    assert backoff_delay(0, 0.5, 4.0, retry_after=10.0) == 10.0
+
+
+def test_get_with_retries(sleeps):
+    session = FakeSession(
+        [
+            requests.ConnectionError("boom"),
+            FakeResponse(503, {"Retry-After": "2"}),
+            FakeResponse(200),
+        ]
+    )
+    response = get_with_retries(session, "https://x", max_retries=3)
+    assert response.status_code == 200
+    assert session.calls == 3
+    assert len(sleeps) == 2 and sleeps[1] >= 2.0
+
+    session = FakeSession([FakeResponse(500), FakeResponse(500)])
+    assert get_with_retries(session, "https://x", max_retries=1).status_code == 500
+    assert session.calls == 2
+
+    session = FakeSession([FakeResponse(404)])
+    assert get_with_retries(session, "https://x").status_code == 404
+
+    session = FakeSession([requests.Timeout(), requests.Timeout()])
+    with pytest.raises(requests.Timeout):
+        get_with_retries(session, "https://x", max_retries=1)
@@ -0,0 +1,124 @@
+import os
+from datetime import datetime
+
+from bis_fetcher.fetcher.base import BaseFetcher
+from bis_fetcher.fetcher.store import JsonlStore, ParquetStore
+from bis_fetcher.fetcher.writer import read_jsonl
+
+
+def _records(start, stop):
+    return [{"url": f"https://x/{i}", "i": i} for i in range(start, stop)]
+
+
+def test_store_appends_only_new_records(tmp_path):
+    filepath = str(tmp_path / "links.jsonl")
+    store = JsonlStore(filepath, compact_every=None)
+    assert store.append(_records(0, 5)) == _records(0, 5)
+    assert store.append(_records(3, 8)) == _records(5, 8)
+    assert [r["i"] for r in store] == list(range(8))
+
+    # A new store reads the keys file, not the data
+    store = JsonlStore(filepath, compact_every=None)
+    assert len(store) == 8
+    assert store._num_appended == 8
+    assert store.append(_records(7, 9)) == _records(8, 9)
+
+
+def test_store_recovers_from_partial_append(tmp_path):
+    filepath = str(tmp_path / "articles.jsonl")
+    store = JsonlStore(filepath, compact_every=100)
+    store.append(_records(0, 3))
+    # Killed while appending: a partial line and keys that lag behind the data
+    with open(filepath, "a") as f:
+        f.write('{"url": "https://x/3", "i": 3}\n{"url": "https://x/4", "i')
+
+    store = JsonlStore(filepath, compact_every=100)
+    assert len(store) == 4
+    assert store.append(_records(3, 6)) == _records(4, 6)
+    # The rebuilt store compacts on its first append
+    assert [r["i"] for r in read_jsonl(filepath)] == list(range(6))
+    with open(filepath) as f:
+        assert len(f.readlines()) == 6
+
+
+def test_store_compacts_periodically(tmp_path):
+    filepath = str(tmp_path / "links.jsonl")
+    with open(filepath, "w") as f:
+        f.write('{"url": "https://x/0", "i": 0}\n{"url": "https://x/0", "i": -1}\n')
+    store = JsonlStore(filepath, compact_every=3)
+    store.append(_records(1, 2))
+    assert [r["i"] for r in store] == [0, 1]
+    store.append(_records(2, 4))
+    assert store._num_appended == 2
+    store.append(_records(4, 5))
+    assert store._num_appended == 0
+    assert [r["i"] for r in store] == list(range(5))
+
+
+def test_save_links_appends(tmp_path):
+    fetcher = BaseFetcher(output_dir=str(tmp_path))
+    fetcher.save_links(_records(0, 3))
+    fetcher.save_links(_records(2, 5))
+    assert [link["i"] for link in fetcher.links] == list(range(5))
+    fetcher.save_links(_records(5, 6))
+    assert [link["i"] for link in fetcher.links] == list(range(6))
+    fetcher.compact()
+    assert len(BaseFetcher(output_dir=str(tmp_path)).links) == 6
+
+
+def _speeches(start, stop):
+    return [
+        {
+            "url": f"https://x/{i}",
+            "timestamp": f"{1 + i % 28} Nov {2019 + i % 4}",
+            "author": f"author {i % 3}",
+            "text": "speech " * 100,
+        }
+        for i in range(start, stop)
+    ]
+
+
+def test_parquet_store(tmp_path):
+    root = str(tmp_path / "articles")
+    store = ParquetStore(root)
+    assert list(store) == [] and len(store) == 0
+    assert store.append(_speeches(0, 10)) == _speeches(0, 10)
+    assert store.append(_speeches(5, 12)) == _speeches(10, 12)
+    # One file per year of each append
+    years = sorted({os.path.basename(os.path.dirname(path)) for path in store.files})
+    assert years == ["year=2019", "year=2020", "year=2021", "year=2022"]
+    assert len(store.files) == 4 + 2
+    assert sorted(r["url"] for r in store) == sorted(r["url"] for r in _speeches(0, 12))
+
+    records = list(
+        ParquetStore(root).read(
+            columns=["url", "author"],
+            start=datetime(2020, 1, 1),
+            end=datetime(2021, 1, 1),
+        )
+    )
+    expected = [r for r in _speeches(0, 12) if r["timestamp"].endswith("2020")]
+    assert sorted(records, key=lambda r: r["url"]) == sorted(
+        ({"url": r["url"], "author": r["author"]} for r in expected),
+        key=lambda r: r["url"],
+    )
+
+    store.compact()
+    assert len(store.files) == 4
+    assert len(list(ParquetStore(root))) == len(ParquetStore(root)) == 12
+
+
+def test_jsonl_store_read_date_range(tmp_path):
+    store = JsonlStore(str(tmp_path / "links.jsonl"))
+    store.append(_speeches(0, 8))
+    records = list(store.read(columns=["url"], start=datetime(2022, 1, 1)))
+    assert records == [{"url": "https://x/3"}, {"url": "https://x/7"}]
+
+
+def test_fetcher_parquet_storage(tmp_path):
+    fetcher = BaseFetcher(output_dir=str(tmp_path), storage="parquet")
+    fetcher.save_links(_records(0, 3))
+    fetcher.save_links(_records(2, 5))
+    assert fetcher.link_store.filepath == str(tmp_path / "links")
+    links = BaseFetcher(output_dir=str(tmp_path), storage="parquet").links
+    assert [link["i"] for link in links] == list(range(5))
@@ -1,5 +1,7 @@
+import json
+
 import pytest
-from bis_fetcher.fetcher.chromedriver import ChromeWebDriver
+from bis_fetcher.fetcher.chromedriver import ChromeWebDriver, ChromeWebDriverPool
 
 # Constants for tests
 VALID_URL = "https://www.python.org"
@@ -25,6 +27,95 @@ def test_chromedriver_invalid_url():
     assert driver.title == ""
 
 
+class FakeDriver:
+    def __init__(self):
+        self.page_count = 0
+        self.alive = True
+        self.closed = False
+
+    def get(self, url, wait_time=None, locator=None):
+        self.page_count += 1
+        return self
+
+    def is_alive(self):
+        return self.alive
+
+    def close(self):
+        self.closed = True
+
+
+def test_webdriver_pool_reuses_sessions():
+    pool = ChromeWebDriverPool(size=2, max_pages=10, driver_factory=FakeDriver)
+    with pool.session() as first:
+        first.get(VALID_URL)
+    with pool.session() as second:
+        second.get(VALID_URL)
+    assert first is second
+    assert pool.num_sessions == 1
+    pool.close()
+    assert first.closed
+
+
+def test_webdriver_pool_recycles_sessions():
+    pool = ChromeWebDriverPool(size=1, max_pages=2, driver_factory=FakeDriver)
+    with pool.session() as driver:
+        driver.get(VALID_URL)
+        driver.get(VALID_URL)
+    assert driver.closed
+    with pool.session() as unhealthy:
+        unhealthy.get(VALID_URL)
+        unhealthy.alive = False
+    assert unhealthy.closed
+    with pool.session() as fresh:
+        assert fresh is not driver and fresh is not unhealthy
+    assert pool.num_sessions == 1
+    pool.close()
+    with pytest.raises(RuntimeError):
+        pool.acquire()
+
+
+def test_webdriver_pool_frees_slot_of_failed_session():
+    failures = [RuntimeError("chromedriver failed to start")]
+
+    def factory():
+        if failures:
+            raise failures.pop()
+        return FakeDriver()
+
+    pool = ChromeWebDriverPool(size=1, driver_factory=factory)
+    with pytest.raises(RuntimeError):
+        pool.acquire()
+    assert pool.num_sessions == 0
+    with pool.session(timeout=1) as driver:
+        assert isinstance(driver, FakeDriver)
+    assert pool.num_sessions == 1
+    pool.close()
+
+
+def _log_entry(method, **params):
+    return {"message": json.dumps({"message": {"method": method, "params": params}})}
+
+
+def test_response_from_performance_log():
+    entries = [
+        _log_entry("Network.requestWillBeSent", type="Document"),
+        _log_entry(
+            "Network.responseReceived",
+            type="Document",
+            response={"url": VALID_URL, "status": 404},
+        ),
+        _log_entry(
+            "Network.responseReceived",
+            type="Document",
+            response={"url": VALID_URL + "/frame", "status": 200},
+        ),
+        {"message": "not json"},
+    ]
+    response = ChromeWebDriver._response_from_performance_log(entries)
+    assert response["status"] == 404
+    assert ChromeWebDriver._response_from_performance_log(entries[:1]) is None
+
+
 if __name__ == "__main__":
     test_chromedriver_valid_url()
     test_chromedriver_invalid_url()
@@ -0,0 +1,76 @@
+import json
+import multiprocessing as mp
+import time
+
+from bis_fetcher.fetcher.writer import (
+    JsonlWriter,
+    get_shared_sink,
+    init_shared_sinks,
+    read_jsonl,
+)
+
+
+def _write_records(worker):
+    sink = get_shared_sink("records")
+    for i in range(50):
+        sink.write({"worker": worker, "i": i, "text": "x" * 1000})
+    return worker
+
+
+def test_writer_from_processes(tmp_path):
+    filepath = str(tmp_path / "records.jsonl.tmp")
+    with JsonlWriter(batch_size=7, flush_interval=0.05) as writer:
+        with mp.Pool(
+            4,
+            initializer=init_shared_sinks,
+            initargs=({"records": writer.sink(filepath)},),
+        ) as pool:
+            assert sorted(pool.map(_write_records, range(4))) == [0, 1, 2, 3]
+            pool.close()
+            pool.join()
+    assert writer.num_records == 200
+    # Every line is a whole record, whatever the interleaving of the workers
+    with open(filepath) as f:
+        records = [json.loads(line) for line in f]
+    assert len(records) == 200
+    for worker in range(4):
+        numbers = [r["i"] for r in records if r["worker"] == worker]
+        assert numbers == list(range(50))
+
+
+def test_writer_flushes_on_interval(tmp_path):
+    filepath = str(tmp_path / "records.jsonl.tmp")
+    writer = JsonlWriter(batch_size=100, flush_interval=0.05).start()
+    writer.sink(filepath).write({"i": 0})
+    # The record reaches the file before the batch is full or the writer is closed
+    for _ in range(100):
+        if list(read_jsonl(filepath)):
+            break
+        time.sleep(0.02)
+    assert list(read_jsonl(filepath)) == [{"i": 0}]
+    writer.close()
+
+
+def test_read_jsonl_skips_partial_line(tmp_path):
+    filepath = tmp_path / "links.jsonl.tmp"
+    filepath.write_text('{"url": "a"}\n{"url": "b"}\n{"url": "c", "ti')
+    assert list(read_jsonl(str(filepath))) == [{"url": "a"}, {"url": "b"}]
+    assert list(read_jsonl(str(tmp_path / "missing.jsonl"))) == []
+
+
+def test_checkpoint_written_after_data(tmp_path):
+    data, checkpoint = str(tmp_path / "links.tmp"), str(tmp_path / "pages.tmp")
+    writer = JsonlWriter(batch_size=1, flush_interval=60)
+    checkpoint_sink = writer.sink(checkpoint, checkpoint=True)
+    data_sink = writer.sink(data)
+    order = []
+    write = writer._write
+    writer._write = lambda filepath: order.append(filepath) or write(filepath)
+    with writer:
+        checkpoint_sink.write({"page": 0})
+        data_sink.write({"page": 1})
+        checkpoint_sink.write({"page": 1})
+    # Data records are written as soon as a batch is full, checkpoints wait for a flush
+    assert order == [data, checkpoint]
+    assert list(read_jsonl(data)) == [{"page": 1}]
+    assert list(read_jsonl(checkpoint)) == [{"page": 0}, {"page": 1}]
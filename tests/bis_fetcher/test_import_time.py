@@ -0,0 +1,67 @@
+"""
+test import time
+"""
+import json
+import subprocess
+import sys
+
+HTTP_MODULES = [
+    "bis_fetcher.fetcher.cache",
+    "bis_fetcher.fetcher.content",
+    "bis_fetcher.fetcher.download",
+    "bis_fetcher.fetcher.metrics",
+    "bis_fetcher.fetcher.ratelimit",
+    "bis_fetcher.fetcher.replay",
+    "bis_fetcher.fetcher.session",
+    "bis_fetcher.fetcher.store",
+    "bis_fetcher.fetcher.writer",
+]
+HEAVY_MODULES = ["hyfi", "selenium", "bs4", "pyarrow", "pypdf"]
+
+
+def _import(modules):
+    """Imports the modules in a fresh interpreter, returning the seconds taken and the heavy modules loaded."""
+    code = (
+        "import importlib, json, sys, time\n"
+        "start = time.perf_counter()\n"
+        f"for name in {modules!r}:\n"
+        "    importlib.import_module(name)\n"
+        "print(json.dumps([time.perf_counter() - start,\n"
+        f"    [m for m in {HEAVY_MODULES!r} if m in sys.modules]]))\n"
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, check=True, text=True
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def test_http_modules_import_fast() -> None:
+    seconds, heavy = _import(["bis_fetcher"] + HTTP_MODULES)
+    assert heavy == []
+    assert seconds < 1.0
+
+
+def test_fetcher_does_not_import_selenium() -> None:
+    _, heavy = _import(["bis_fetcher.fetcher.bis"])
+    assert "hyfi" in heavy
+    assert "selenium" not in heavy
+
+
+def test_fetchers_initialize_hyfi_when_built() -> None:
+    code = (
+        "import bis_fetcher\n"
+        "from bis_fetcher.fetcher.bis import BisFetcher\n"
+        "print(bis_fetcher._hyfi_initialized)\n"
+        "BisFetcher()\n"
+        "print(bis_fetcher._hyfi_initialized)\n"
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, check=True, text=True
+    ).stdout
+    assert out.strip().splitlines()[-2:] == ["False", "True"]
+
+
+def test_hyfi_is_initialized_on_access() -> None:
+    import bis_fetcher
+
+    assert bis_fetcher.HyFI is bis_fetcher.initialize()